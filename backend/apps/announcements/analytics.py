@@ -0,0 +1,196 @@
+"""
+公告阅读分析
+
+每条公告在Redis中按“发布后第几小时”分桶维护HyperLogLog去重读者计数：
+    announcements:readers_hll:{announcement_id}         全部读者
+    announcements:readers_hll:{announcement_id}:{hour}  发布后第hour小时内首次阅读的读者（0 <= hour < CURVE_HOURS）
+已读回执写入缓冲区时在同一个Lua脚本中PFADD（见receipts）。每个HyperLogLog最多12KB，
+标准误差约0.81%，不随读者数增长，也不需要对AnnouncementRead做COUNT(DISTINCT user)。
+
+阅读率曲线第k个点为前k个分桶的并集基数，在一个流水线中依次PFMERGE到临时键并PFCOUNT，
+分母为发布时缓存在公告上的受众人数（audience_size）。“24小时阅读率”（get_read_stats）即曲线第24小时的点。
+reconcile_announcement_reads定期用数据库精确计数核对估算值，偏差超出阈值时可从数据库重建。
+缓存后端不是Redis或Redis不可用、全部读者的HyperLogLog不存在（早于该功能发布、已过期或Redis被清空），
+或发布时间早于ANALYTICS_TTL（早期分桶可能已过期）时按数据库精确计算。
+"""
+import logging
+import math
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.common.redis_client import get_redis_client
+from .models import AnnouncementRead, AnnouncementRecipient
+
+logger = logging.getLogger(__name__)
+
+HLL_KEY = 'announcements:readers_hll:{}'
+HLL_BUCKET_KEY = 'announcements:readers_hll:{}:{}'
+CURVE_TMP_KEY = 'announcements:readers_hll_tmp:{}'
+# 曲线覆盖发布后的小时数
+CURVE_HOURS = 72
+# “24小时阅读率”的统计窗口
+READ_WINDOW_HOURS = 24
+ANALYTICS_TTL = 30 * 86400
+REBUILD_BATCH = 5000
+
+
+def hour_bucket(published_at, read_at):
+    """阅读时间落在发布后的第几小时，超出曲线范围时返回None"""
+    if published_at is None:
+        return None
+    hour = math.floor((read_at - published_at).total_seconds() / 3600)
+    return hour if 0 <= hour < CURVE_HOURS else None
+
+
+def get_audience_size(announcement):
+    """发布时缓存的受众人数，早于该字段发布的公告按接收人表计数"""
+    if announcement.audience_size is not None:
+        return announcement.audience_size
+    return AnnouncementRecipient.objects.filter(announcement_id=announcement.id).count()
+
+
+def _exact_counts(announcement, hours):
+    """按数据库精确计算(全部读者数, 每小时累计读者数列表)"""
+    counts = [0] * hours
+    total = 0
+    reads = AnnouncementRead.objects.filter(announcement_id=announcement.id).values_list('read_at', flat=True)
+    for read_at in reads.iterator(chunk_size=REBUILD_BATCH):
+        total += 1
+        hour = hour_bucket(announcement.published_at, read_at)
+        if hour is not None and hour < hours:
+            counts[hour] += 1
+    for hour in range(1, hours):
+        counts[hour] += counts[hour - 1]
+    return total, counts
+
+
+def _estimated_counts(client, announcement, hours):
+    """按HyperLogLog估算(全部读者数, 每小时累计读者数列表)，HyperLogLog不存在时返回None"""
+    tmp_key = CURVE_TMP_KEY.format(uuid.uuid4().hex)
+    total_key = HLL_KEY.format(announcement.id)
+    pipe = client.pipeline(transaction=False)
+    pipe.exists(total_key)
+    pipe.pfcount(total_key)
+    for hour in range(hours):
+        pipe.pfmerge(tmp_key, HLL_BUCKET_KEY.format(announcement.id, hour))
+        pipe.pfcount(tmp_key)
+    pipe.delete(tmp_key)
+    results = pipe.execute()
+    if not results[0]:
+        return None
+    return results[1], results[3:-1:2]
+
+
+def _counters_expired(announcement):
+    """发布时间早于ANALYTICS_TTL时，早期的小时分桶可能已过期"""
+    published_at = announcement.published_at
+    return published_at is not None and timezone.now() - published_at > timedelta(seconds=ANALYTICS_TTL)
+
+
+def get_read_curve(announcement, hours=24, exact=False):
+    """
+    公告的阅读率曲线，返回
+    {'audience_size', 'readers', 'read_rate', 'points': [{'hour', 'readers', 'read_rate'}]}
+    第hour个点为发布后hour小时内阅读过的去重人数
+    """
+    hours = max(1, min(hours, CURVE_HOURS))
+    audience = get_audience_size(announcement)
+    estimated = None
+    client = None if exact or _counters_expired(announcement) else get_redis_client()
+    if client is not None:
+        try:
+            estimated = _estimated_counts(client, announcement, hours)
+        except Exception:
+            logger.warning('读取公告阅读曲线失败，回退到数据库', exc_info=True)
+    total, counts = estimated or _exact_counts(announcement, hours)
+
+    def rate(readers):
+        # 估算值可能略超受众人数
+        return round(min(1, readers / audience), 4) if audience else 0
+
+    return {
+        'audience_size': audience,
+        'readers': total,
+        'read_rate': rate(total),
+        'points': [{'hour': hour + 1, 'readers': readers, 'read_rate': rate(readers)}
+                   for hour, readers in enumerate(counts)],
+    }
+
+
+def get_read_stats(announcement):
+    """公告受众人数、发布后24小时内的阅读人数和阅读率"""
+    curve = get_read_curve(announcement, READ_WINDOW_HOURS)
+    point = curve['points'][-1]
+    return {
+        'audience': curve['audience_size'],
+        'read_24h': point['readers'],
+        'read_rate_24h': point['read_rate'],
+    }
+
+
+def rebuild_counters(announcement, client=None):
+    """从AnnouncementRead重建公告的HyperLogLog计数，返回重建的读者数"""
+    client = client or get_redis_client()
+    if client is None:
+        return 0
+    total_key = HLL_KEY.format(announcement.id)
+    client.delete(total_key, *[HLL_BUCKET_KEY.format(announcement.id, hour) for hour in range(CURVE_HOURS)])
+    reads = AnnouncementRead.objects.filter(announcement_id=announcement.id).values_list('user_id', 'read_at')
+    total = 0
+    batch = []
+    for user_id, read_at in reads.iterator(chunk_size=REBUILD_BATCH):
+        batch.append((user_id, read_at))
+        if len(batch) >= REBUILD_BATCH:
+            total += _add_readers(client, announcement, batch)
+            batch = []
+    total += _add_readers(client, announcement, batch)
+    return total
+
+
+def _add_readers(client, announcement, readers):
+    if not readers:
+        return 0
+    buckets = {}
+    for user_id, read_at in readers:
+        hour = hour_bucket(announcement.published_at, read_at)
+        if hour is not None:
+            buckets.setdefault(hour, []).append(user_id)
+    pipe = client.pipeline(transaction=False)
+    total_key = HLL_KEY.format(announcement.id)
+    pipe.pfadd(total_key, *[user_id for user_id, _ in readers])
+    pipe.expire(total_key, ANALYTICS_TTL)
+    for hour, user_ids in buckets.items():
+        key = HLL_BUCKET_KEY.format(announcement.id, hour)
+        pipe.pfadd(key, *user_ids)
+        pipe.expire(key, ANALYTICS_TTL)
+    pipe.execute()
+    return len(readers)
+
+
+def reconcile(announcement, hours=24):
+    """
+    用数据库精确计数核对HyperLogLog估算值和缓存的受众人数，
+    返回{'audience_size', 'exact_audience', 'readers', 'exact_readers', 'max_error'}，max_error为曲线各点的最大相对误差
+    """
+    exact_audience = AnnouncementRecipient.objects.filter(announcement_id=announcement.id).count()
+    estimated = get_read_curve(announcement, hours)
+    exact_total, exact_counts = _exact_counts(announcement, hours)
+    max_error = 0
+    pairs = [(estimated['readers'], exact_total)] + [
+        (point['readers'], count) for point, count in zip(estimated['points'], exact_counts)
+    ]
+    for value, exact in pairs:
+        if exact:
+            max_error = max(max_error, abs(value - exact) / exact)
+        elif value:
+            max_error = max(max_error, 1)
+    return {
+        'audience_size': announcement.audience_size,
+        'exact_audience': exact_audience,
+        'readers': estimated['readers'],
+        'exact_readers': exact_total,
+        'max_error': max_error,
+    }
+
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AnnouncementsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.announcements'
+
+    def ready(self):
+        # 注册信号处理器和系统检查
+        from . import checks, signals  # noqa: F401
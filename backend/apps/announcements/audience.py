@@ -0,0 +1,145 @@
+"""
+公告受众
+
+发布公告时将推送范围（全部居民/指定楼栋/指定房屋）展开为房屋集合和用户集合，分别写入
+AnnouncementHouse和AnnouncementRecipient两张附表：“用户X可见的公告”只需按
+(user_id, published_at)索引倒序扫描，不再逐行连接UserHouse→House→Building并判断
+target_ids的JSON成员关系，公告再多也不影响居民信息流。
+
+受众是发布时的快照：之后新增的房屋不会补入；房产绑定审核通过或解除时，
+按AnnouncementHouse中该房屋对应的公告补充或移除该用户的可见记录。
+Redis中的用户信息流（见feed）在发布时追加，受众变化时失效重建。
+"""
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.communities.models import House, UserHouse
+from .feed import fan_out, invalidate_feeds_on_commit
+from .models import Announcement, AnnouncementHouse, AnnouncementRecipient
+
+BATCH_SIZE = 2000
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def resolve_houses(announcement):
+    """按推送范围解析受众房屋，返回房屋查询集（始终限定在公告所属小区内）"""
+    houses = House.objects.filter(building__community_id=announcement.community_id)
+    target_ids = announcement.target_ids or []
+    if announcement.target_type == Announcement.TargetType.BUILDING:
+        return houses.filter(building_id__in=target_ids)
+    if announcement.target_type == Announcement.TargetType.HOUSE:
+        return houses.filter(id__in=target_ids)
+    return houses
+
+
+def build_audience(announcement, batch_size=BATCH_SIZE):
+    """重建公告的受众附表，返回(房屋数, 用户数)，需在事务中调用"""
+    AnnouncementHouse.objects.filter(announcement_id=announcement.id).delete()
+    previous = AnnouncementRecipient.objects.filter(announcement_id=announcement.id)
+    # 原接收人的信息流可能已包含该公告，重建受众后需要失效
+    invalidate_feeds_on_commit(previous.values_list('user_id', flat=True))
+    previous.delete()
+    houses = resolve_houses(announcement)
+
+    house_count = 0
+    house_ids = houses.values_list('id', flat=True).order_by('id').iterator(chunk_size=batch_size)
+    for batch in _batches(house_ids, batch_size):
+        AnnouncementHouse.objects.bulk_create(
+            [AnnouncementHouse(announcement_id=announcement.id, house_id=house_id) for house_id in batch]
+        )
+        house_count += len(batch)
+
+    user_count = 0
+    user_ids = UserHouse.objects.filter(
+        house_id__in=houses.values('id'), status=UserHouse.StatusType.APPROVED
+    ).values_list('user_id', flat=True).distinct().order_by('user_id').iterator(chunk_size=batch_size)
+    for batch in _batches(user_ids, batch_size):
+        AnnouncementRecipient.objects.bulk_create([
+            AnnouncementRecipient(announcement_id=announcement.id, user_id=user_id, published_at=announcement.published_at)
+            for user_id in batch
+        ])
+        user_count += len(batch)
+    # 受众人数作为阅读率的分母缓存在公告上
+    announcement.audience_size = user_count
+    Announcement.objects.filter(pk=announcement.pk).update(audience_size=user_count)
+    return house_count, user_count
+
+
+def publish_announcement(announcement):
+    """发布公告并展开受众，返回(房屋数, 用户数)"""
+    with transaction.atomic():
+        announcement.is_published = True
+        announcement.published_at = announcement.published_at or timezone.now()
+        announcement.save(update_fields=['is_published', 'published_at', 'updated_at'])
+        counts = build_audience(announcement)
+        transaction.on_commit(lambda: fan_out(announcement.id, announcement.published_at))
+        return counts
+
+
+def unpublish_announcement(announcement):
+    """撤回公告并清空受众"""
+    with transaction.atomic():
+        announcement.is_published = False
+        announcement.save(update_fields=['is_published', 'updated_at'])
+        AnnouncementHouse.objects.filter(announcement_id=announcement.id).delete()
+        recipients = AnnouncementRecipient.objects.filter(announcement_id=announcement.id)
+        invalidate_feeds_on_commit(recipients.values_list('user_id', flat=True))
+        recipients.delete()
+
+
+def add_bindings(bindings):
+    """房产绑定审核通过后，为用户补充其房屋可见的已发布公告，bindings为[(user_id, house_id)]"""
+    users_by_house = {}
+    for user_id, house_id in bindings:
+        users_by_house.setdefault(house_id, set()).add(user_id)
+    if not users_by_house:
+        return 0
+
+    rows = AnnouncementHouse.objects.filter(
+        house_id__in=users_by_house, announcement__is_published=True
+    ).values_list('house_id', 'announcement_id', 'announcement__published_at')
+    recipients = {}
+    for house_id, announcement_id, published_at in rows:
+        for user_id in users_by_house[house_id]:
+            recipients[announcement_id, user_id] = published_at
+    for batch in _batches(recipients.items(), BATCH_SIZE):
+        AnnouncementRecipient.objects.bulk_create([
+            AnnouncementRecipient(announcement_id=announcement_id, user_id=user_id, published_at=published_at)
+            for (announcement_id, user_id), published_at in batch
+        ], ignore_conflicts=True)
+    if recipients:
+        invalidate_feeds_on_commit({user_id for _, user_id in recipients})
+    return len(recipients)
+
+
+def remove_bindings(bindings):
+    """房产绑定解除后，移除用户仅经由该房屋可见的公告，bindings为[(user_id, house_id)]"""
+    removed = 0
+    for user_id, house_id in set(bindings):
+        remaining = UserHouse.objects.filter(user_id=user_id, status=UserHouse.StatusType.APPROVED).values('house_id')
+        still_visible = AnnouncementHouse.objects.filter(house_id__in=remaining).values('announcement_id')
+        removed += AnnouncementRecipient.objects.filter(
+            user_id=user_id,
+            announcement_id__in=AnnouncementHouse.objects.filter(house_id=house_id).values('announcement_id'),
+        ).exclude(announcement_id__in=still_visible).delete()[0]
+    invalidate_feeds_on_commit({user_id for user_id, _ in bindings})
+    return removed
+
+
+def visible_to_user(user_id):
+    """用户可见的公告接收记录，按发布时间倒序，走(user, published_at)索引"""
+    return AnnouncementRecipient.objects.filter(user_id=user_id).order_by('-published_at', '-id')
+
+
+def is_visible(announcement_id, user_id):
+    return AnnouncementRecipient.objects.filter(announcement_id=announcement_id, user_id=user_id).exists()
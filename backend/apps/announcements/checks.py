@@ -0,0 +1,10 @@
+from django.core import checks
+
+from apps.common.serializers import check_serializer_fields
+
+
+@checks.register()
+def check_announcements_serializers(app_configs=None, **kwargs):
+    """启动时核对announcements序列化器字段与模型是否一致"""
+    from .serializers import MODEL_SERIALIZERS
+    return check_serializer_fields(MODEL_SERIALIZERS, 'announcements')
@@ -0,0 +1,201 @@
+"""
+居民公告信息流与未读数
+
+每个用户在Redis中维护：
+    announcements:feed:{user_id}        有序集合，成员为可见公告id，分值为发布时间戳，只保留最近FEED_SIZE条
+    announcements:read:{user_id}        集合，已读公告id，始终是feed的子集
+    announcements:feed_ready:{user_id}  标记feed已从数据库构建
+
+维持“已读集合⊆feed”后，未读数 = ZCARD(feed) - SCARD(read)，为O(1)；
+首页为一次ZREVRANGE加一次流水线SISMEMBER，与公告总数无关。
+发布时向已构建feed的接收人追加公告，已读记录创建后加入已读集合；
+受众变化（撤回、修改推送范围、绑定变更）时只删除就绪标记，下次读取时从数据库重建。
+缓存后端不是Redis或Redis不可用时，直接查询数据库得到相同结果。
+"""
+import logging
+
+from django.db import transaction
+
+from apps.common.redis_client import get_redis_client
+from .models import AnnouncementRead, AnnouncementRecipient
+
+logger = logging.getLogger(__name__)
+
+FEED_KEY = 'announcements:feed:{}'
+READ_KEY = 'announcements:read:{}'
+READY_KEY = 'announcements:feed_ready:{}'
+# 每个用户保留的公告条数，未读数只统计这部分
+FEED_SIZE = 500
+FEED_TTL = 7 * 86400
+PAGE_SIZE = 20
+FAN_OUT_BATCH = 1000
+
+# KEYS: feed, read, ready  ARGV: 公告id, 发布时间戳, 保留条数, 过期秒数
+# feed未构建时不写入（等待读取时整体重建），超出保留条数时同时从已读集合移除被裁掉的公告；
+# 每次追加都刷新feed和已读集合的过期时间（以空feed构建时ZADD新建的键没有过期时间），不再访问的feed会过期
+ADD_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+local extra = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[3])
+if extra > 0 then
+    local trimmed = redis.call('ZRANGE', KEYS[1], 0, extra - 1)
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, extra - 1)
+    redis.call('SREM', KEYS[2], unpack(trimmed))
+end
+return 1
+"""
+
+# KEYS: feed, read  ARGV: 公告id；只有在feed中的公告才记为已读
+READ_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return redis.call('SADD', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+_scripts = {}
+
+
+def _script(client, name, source):
+    if name not in _scripts:
+        # register_script使用EVALSHA，脚本未加载时自动回退到EVAL
+        _scripts[name] = client.register_script(source)
+    return _scripts[name]
+
+
+def _keys(user_id):
+    return FEED_KEY.format(user_id), READ_KEY.format(user_id), READY_KEY.format(user_id)
+
+
+def _load_from_db(user_id):
+    """从数据库读取最近FEED_SIZE条可见公告[(公告id, 发布时间)]及其中已读的公告id"""
+    rows = list(AnnouncementRecipient.objects.filter(user_id=user_id).order_by('-published_at', '-id')
+                .values_list('announcement_id', 'published_at')[:FEED_SIZE])
+    read = set(AnnouncementRead.objects.filter(
+        user_id=user_id, announcement_id__in=[announcement_id for announcement_id, _ in rows]
+    ).values_list('announcement_id', flat=True))
+    return rows, read
+
+
+def rebuild_feed(user_id, client=None):
+    """从数据库重建用户的feed和已读集合，返回(rows, read)"""
+    rows, read = _load_from_db(user_id)
+    client = client or get_redis_client()
+    if client is None:
+        return rows, read
+    feed_key, read_key, ready_key = _keys(user_id)
+    pipe = client.pipeline(transaction=True)
+    pipe.delete(feed_key, read_key)
+    if rows:
+        pipe.zadd(feed_key, {announcement_id: published_at.timestamp() for announcement_id, published_at in rows})
+        pipe.expire(feed_key, FEED_TTL)
+    if read:
+        pipe.sadd(read_key, *read)
+        pipe.expire(read_key, FEED_TTL)
+    pipe.set(ready_key, 1, ex=FEED_TTL)
+    pipe.execute()
+    return rows, read
+
+
+def _ensure_feed(client, user_id):
+    if not client.exists(READY_KEY.format(user_id)):
+        rebuild_feed(user_id, client)
+
+
+def get_unread_count(user_id):
+    """最近FEED_SIZE条可见公告中的未读数"""
+    client = get_redis_client()
+    if client is not None:
+        try:
+            _ensure_feed(client, user_id)
+            feed_key, read_key, _ = _keys(user_id)
+            pipe = client.pipeline(transaction=False)
+            pipe.zcard(feed_key)
+            pipe.scard(read_key)
+            total, read = pipe.execute()
+            return max(0, total - read)
+        except Exception:
+            logger.warning('读取公告未读数失败，回退到数据库', exc_info=True)
+    rows, read = _load_from_db(user_id)
+    return len(rows) - len(read)
+
+
+def get_feed_page(user_id, limit=PAGE_SIZE):
+    """信息流首页，返回[(公告id, 是否已读)]，按发布时间倒序"""
+    client = get_redis_client()
+    if client is not None:
+        try:
+            _ensure_feed(client, user_id)
+            feed_key, read_key, _ = _keys(user_id)
+            ids = [int(member) for member in client.zrevrange(feed_key, 0, limit - 1)]
+            pipe = client.pipeline(transaction=False)
+            for announcement_id in ids:
+                pipe.sismember(read_key, announcement_id)
+            flags = pipe.execute()
+            return [(announcement_id, bool(flag)) for announcement_id, flag in zip(ids, flags)]
+        except Exception:
+            logger.warning('读取公告信息流失败，回退到数据库', exc_info=True)
+    rows = list(AnnouncementRecipient.objects.filter(user_id=user_id).order_by('-published_at', '-id')
+                .values_list('announcement_id', flat=True)[:limit])
+    read = set(AnnouncementRead.objects.filter(user_id=user_id, announcement_id__in=rows)
+               .values_list('announcement_id', flat=True))
+    return [(announcement_id, announcement_id in read) for announcement_id in rows]
+
+
+def fan_out(announcement_id, published_at):
+    """公告发布后追加到各接收人的feed，按批流水线执行"""
+    client = get_redis_client()
+    if client is None:
+        return
+    add = _script(client, 'add', ADD_SCRIPT)
+    score = published_at.timestamp()
+    user_ids = AnnouncementRecipient.objects.filter(announcement_id=announcement_id).values_list(
+        'user_id', flat=True).order_by('user_id').iterator(chunk_size=FAN_OUT_BATCH)
+    try:
+        pipe = client.pipeline(transaction=False)
+        for count, user_id in enumerate(user_ids, start=1):
+            add(keys=_keys(user_id), args=[announcement_id, score, FEED_SIZE, FEED_TTL], client=pipe)
+            if count % FAN_OUT_BATCH == 0:
+                pipe.execute()
+        pipe.execute()
+    except Exception:
+        logger.warning('公告%s推送到信息流失败', announcement_id, exc_info=True)
+
+
+def mark_read(user_id, announcement_ids):
+    """已读记录写入数据库后加入已读集合"""
+    client = get_redis_client()
+    if client is None or not announcement_ids:
+        return
+    read = _script(client, 'read', READ_SCRIPT)
+    feed_key, read_key, _ = _keys(user_id)
+    try:
+        pipe = client.pipeline(transaction=False)
+        for announcement_id in announcement_ids:
+            read(keys=[feed_key, read_key], args=[announcement_id], client=pipe)
+        pipe.execute()
+    except Exception:
+        logger.warning('更新用户%s公告已读状态失败', user_id, exc_info=True)
+
+
+def invalidate_feeds(user_ids):
+    """受众变化后删除就绪标记，下次读取时从数据库重建"""
+    client = get_redis_client()
+    user_ids = list(user_ids)
+    if client is None or not user_ids:
+        return
+    try:
+        for start in range(0, len(user_ids), FAN_OUT_BATCH):
+            client.delete(*[READY_KEY.format(user_id) for user_id in user_ids[start:start + FAN_OUT_BATCH]])
+    except Exception:
+        logger.warning('使公告信息流失效失败', exc_info=True)
+
+
+def invalidate_feeds_on_commit(user_ids):
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_feeds(user_ids))
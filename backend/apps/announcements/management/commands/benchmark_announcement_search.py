@@ -0,0 +1,112 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.announcements.models import Announcement
+from apps.announcements.search import index_many, refresh_doc_counts, search
+from apps.communities.models import Community
+
+WORDS = [
+    '停水', '停电', '通知', '电梯', '维修', '保养', '物业费', '缴纳', '提醒', '小区', '业主', '居民', '活动', '报名',
+    '端午节', '中秋节', '春节', '联欢', '消防', '演练', '安全', '检查', '垃圾分类', '宣传', '绿化', '修剪', '停车场',
+    '车位', '管理', '规定', '门禁', '升级', '快递', '驿站', '装修', '施工', '噪音', '投诉', '燃气', '管道', '排查',
+    '供暖', '开始', '结束', '时间', '地点', '会议', '业委会', '选举', '公示', '疫苗', '接种', '体检', '义诊', '老人',
+    '儿童', '游乐', '设施', '更换', '路灯', '照明', '监控', '巡逻', '防盗', '台风', '暴雨', '预警', '积水', '清理',
+    '外墙', '清洗', '高空', '抛物', '宠物', '文明', '饲养', '充电桩', '安装', '申请', '水费', '电费', '账单', '线上',
+    '支付', '临时', '调整', '恢复', '正常', '感谢', '配合', '理解', '紧急', '重要', '明天', '本周', '下周', '上午', '下午',
+]
+QUERIES = ['停水', '电梯维修', '物业费', '消防演练', '垃圾分类', '充电桩', '台风预警', '门禁升级', '水', '业委会选举']
+
+
+class Command(BaseCommand):
+    """
+    公告全文检索基准测试
+
+    在事务中生成合成公告并建立索引（结束后回滚，--keep时保留），按小区限定和全库两种方式
+    重复执行检索，报告平均、P50、P99耗时。
+    """
+    help = '报告公告全文检索在大量公告上的查询耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000000, help='合成公告数量')
+        parser.add_argument('--communities', type=int, default=1000, help='合成小区数量')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每批写入的公告数')
+        parser.add_argument('--queries', type=int, default=500, help='每种方式的检索次数')
+        parser.add_argument('--seed', type=int, default=0, help='随机数种子')
+        parser.add_argument('--keep', action='store_true', help='保留生成的数据')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            community_ids = self.create_communities(options['communities'])
+            self.generate(rng, community_ids, options['count'], options['batch_size'])
+
+            types = [choice for choice, _ in Announcement.AnnouncementType.choices]
+            scenarios = [
+                ('小区内', lambda q: search(q, community_ids=[rng.choice(community_ids)])),
+                ('小区内+类型', lambda q: search(q, community_ids=[rng.choice(community_ids)],
+                                              announcement_type=rng.choice(types))),
+                ('全库', lambda q: search(q)),
+            ]
+            for name, run in scenarios:
+                self.measure(name, run, rng, options['queries'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def create_communities(self, count):
+        communities = Community.objects.bulk_create([
+            Community(name=f'压测小区{i}', address='压测地址', property_phone='000', fee_standard=1)
+            for i in range(count)
+        ])
+        if communities[0].pk is None:
+            # 数据库不支持返回自增主键时重新查询
+            return list(Community.objects.filter(name__startswith='压测小区').values_list('id', flat=True))
+        return [community.pk for community in communities]
+
+    def generate(self, rng, community_ids, count, batch_size):
+        start = time.perf_counter()
+        next_id = (Announcement.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        now = timezone.now()
+        types = [choice for choice, _ in Announcement.AnnouncementType.choices]
+        postings = 0
+        for offset in range(0, count, batch_size):
+            batch = [
+                Announcement(
+                    id=next_id + offset + i,
+                    community_id=rng.choice(community_ids),
+                    title=''.join(rng.sample(WORDS, 3)),
+                    content='，'.join(''.join(rng.sample(WORDS, 3)) for _ in range(3)) + '。',
+                    type=rng.choice(types),
+                    is_published=True,
+                    published_at=now,
+                )
+                for i in range(min(batch_size, count - offset))
+            ]
+            # 直接批量写入，不触发逐条索引的信号
+            Announcement.objects.bulk_create(batch)
+            postings += index_many(batch)
+            done = offset + len(batch)
+            if done % (batch_size * 20) == 0 or done == count:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'已生成{done}条公告，{postings}条倒排记录，{done / elapsed:.0f}条/秒')
+        refresh_doc_counts()
+        self.stdout.write(f'生成完成，耗时{time.perf_counter() - start:.1f}秒')
+
+    def measure(self, name, run, rng, queries):
+        timings = []
+        hits = 0
+        for _ in range(queries):
+            query = rng.choice(QUERIES)
+            start = time.perf_counter()
+            hits += len(run(query))
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        mean = sum(timings) / len(timings) * 1000
+        p50 = timings[len(timings) // 2] * 1000
+        p99 = timings[max(0, int(len(timings) * 0.99) - 1)] * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {queries}次检索，平均{mean:.2f}ms，P50 {p50:.2f}ms，P99 {p99:.2f}ms，平均命中{hits / queries:.1f}条'
+        ))
@@ -0,0 +1,61 @@
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from apps.announcements.receipts import flush_read_receipts
+from apps.common.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    将Redis回执流中缓冲的公告已读回执批量写入数据库
+
+    默认写完当前积压后退出；--loop时作为常驻进程阻塞等待新回执，
+    收到SIGTERM/SIGINT后在当前一批写完后退出。可在多个节点上同时运行（消费组内各自领取）。
+    """
+    help = '批量写入缓冲的公告已读回执'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写入的回执数')
+        parser.add_argument('--loop', action='store_true', help='常驻运行，持续写入新回执')
+        parser.add_argument('--block', type=int, default=1000, help='常驻模式下等待新回执的毫秒数')
+        parser.add_argument('--consumer', help='消费者名称，默认使用主机名')
+
+    def handle(self, *args, **options):
+        if get_redis_client() is None:
+            raise CommandError('缓存后端不是Redis，已读回执直接写入数据库，无需批量写入')
+        self.stopping = False
+        if options['loop']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        if not options['loop']:
+            self.run_once(options)
+            return
+        while not self.stopping:
+            try:
+                self.run_once(options, block=options['block'], max_batches=10)
+            except Exception:
+                # 常驻模式下单轮失败（如数据库短暂不可用）不退出，回执未确认，下一轮重试
+                logger.exception('已读回执写入失败')
+                time.sleep(1)
+            # 常驻进程中及时释放超时的数据库连接
+            close_old_connections()
+
+    def run_once(self, options, block=None, max_batches=None):
+        start = time.perf_counter()
+        received, saved = flush_read_receipts(
+            batch_size=options['batch_size'], block_ms=block, consumer=options['consumer'], max_batches=max_batches
+        )
+        if received or not options['loop']:
+            self.stdout.write(self.style.SUCCESS(
+                f'读取回执{received}条，写入{saved}条，耗时{time.perf_counter() - start:.2f}秒'
+            ))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.announcements.audience import build_audience
+from apps.announcements.models import Announcement
+
+
+class Command(BaseCommand):
+    """为已发布公告重建受众附表（上线受众附表前发布的公告、或房屋数据修正后使用）"""
+    help = '重建已发布公告的受众房屋和接收人'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--announcement', type=int, action='append', help='只重建指定公告，可重复')
+        parser.add_argument('--community', type=int, help='只重建指定小区的公告')
+
+    def handle(self, *args, **options):
+        queryset = Announcement.objects.filter(is_published=True).order_by('id')
+        if options['announcement']:
+            queryset = queryset.filter(id__in=options['announcement'])
+        if options['community']:
+            queryset = queryset.filter(community_id=options['community'])
+
+        total = 0
+        for announcement in queryset.iterator():
+            # 每条公告独立事务，中断后重新执行即可
+            with transaction.atomic():
+                houses, recipients = build_audience(announcement)
+            total += 1
+            self.stdout.write(f'公告{announcement.id}: 房屋{houses}户，接收人{recipients}人')
+        self.stdout.write(self.style.SUCCESS(f'重建完成：共{total}条公告'))
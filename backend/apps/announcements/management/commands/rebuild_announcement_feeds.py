@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.announcements.feed import rebuild_feed
+from apps.announcements.models import AnnouncementRecipient
+from apps.common.redis_client import get_redis_client
+
+
+class Command(BaseCommand):
+    """从数据库重建居民的公告信息流和已读集合（Redis数据丢失或怀疑不一致时使用）"""
+    help = '从数据库重建Redis中的公告信息流'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='只重建指定用户，可重复')
+
+    def handle(self, *args, **options):
+        client = get_redis_client()
+        if client is None:
+            raise CommandError('缓存后端不是Redis，信息流直接从数据库读取，无需重建')
+
+        user_ids = options['user'] or AnnouncementRecipient.objects.values_list(
+            'user_id', flat=True).distinct().order_by('user_id').iterator()
+        total = 0
+        for user_id in user_ids:
+            rebuild_feed(user_id, client)
+            total += 1
+            if total % 1000 == 0:
+                self.stdout.write(f'已重建{total}个用户')
+        self.stdout.write(self.style.SUCCESS(f'重建完成：共{total}个用户'))
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.announcements.analytics import rebuild_counters, reconcile
+from apps.announcements.models import Announcement
+from apps.announcements.receipts import flush_read_receipts
+
+
+class Command(BaseCommand):
+    """
+    用数据库精确计数核对近期公告的阅读分析数据
+
+    先写入缓冲中的已读回执，再逐条比较HyperLogLog估算的读者数、阅读曲线与AnnouncementRead的精确计数，
+    以及缓存的受众人数与接收人表（发布后房产绑定变化会使两者不一致）。
+    --repair时更新受众人数，并为偏差超过阈值的公告从数据库重建HyperLogLog计数。
+    """
+    help = '核对公告阅读分析的估算值与精确计数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='核对最近多少天发布的公告')
+        parser.add_argument('--hours', type=int, default=24, help='核对的曲线小时数')
+        parser.add_argument('--threshold', type=float, default=0.02, help='允许的最大相对误差')
+        parser.add_argument('--repair', action='store_true', help='修正受众人数并重建偏差过大的计数')
+
+    def handle(self, *args, **options):
+        flush_read_receipts()
+        since = timezone.now() - timedelta(days=options['days'])
+        announcements = Announcement.objects.filter(is_published=True, published_at__gte=since).order_by('id')
+
+        checked = drifted = repaired = 0
+        for announcement in announcements.iterator():
+            result = reconcile(announcement, options['hours'])
+            checked += 1
+            audience_drift = result['audience_size'] != result['exact_audience']
+            counter_drift = result['max_error'] > options['threshold']
+            if not audience_drift and not counter_drift:
+                continue
+            drifted += 1
+            self.stdout.write(self.style.WARNING(
+                f'公告{announcement.id}: 受众{result["audience_size"]}/{result["exact_audience"]}，'
+                f'读者{result["readers"]}/{result["exact_readers"]}，最大误差{result["max_error"]:.2%}'
+            ))
+            if options['repair']:
+                if audience_drift:
+                    Announcement.objects.filter(pk=announcement.pk).update(audience_size=result['exact_audience'])
+                if counter_drift:
+                    rebuild_counters(announcement)
+                repaired += 1
+
+        self.stdout.write(self.style.SUCCESS(f'核对{checked}条公告，偏差{drifted}条，修复{repaired}条'))
@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-17 12:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0009_gate_scan_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('announcements', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnouncementRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published_at', models.DateTimeField(help_text='冗余公告的发布时间，用于信息流排序', verbose_name='发布时间')),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='announcements.announcement', verbose_name='公告')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '公告接收人',
+                'verbose_name_plural': '公告接收人',
+            },
+        ),
+        migrations.CreateModel(
+            name='AnnouncementHouse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audience_houses', to='announcements.announcement', verbose_name='公告')),
+                ('house', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='communities.house', verbose_name='房屋')),
+            ],
+            options={
+                'verbose_name': '公告受众房屋',
+                'verbose_name_plural': '公告受众房屋',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='announcementrecipient',
+            index=models.Index(fields=['user', 'published_at'], name='announcement_feed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='announcementrecipient',
+            unique_together={('announcement', 'user')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='announcementhouse',
+            unique_together={('house', 'announcement')},
+        ),
+    ]
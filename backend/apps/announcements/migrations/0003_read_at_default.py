@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 12:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0002_announcement_audience'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='announcementread',
+            name='read_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='阅读时间'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0003_read_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='audience_size',
+            field=models.PositiveIntegerField(blank=True, help_text='发布时展开受众得到的接收人数', null=True, verbose_name='受众人数'),
+        ),
+    ]
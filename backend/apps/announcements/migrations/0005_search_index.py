@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-17 12:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0004_audience_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=32, unique=True, verbose_name='搜索词')),
+                ('last_char', models.CharField(blank=True, db_index=True, help_text='中文搜索词的最后一个字，英文/数字单词为空', max_length=1, null=True, verbose_name='末字')),
+                ('doc_count', models.PositiveIntegerField(default=0, verbose_name='包含该词的公告数')),
+            ],
+            options={
+                'verbose_name': '公告搜索词',
+                'verbose_name_plural': '公告搜索词',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('community_id', models.BigIntegerField(verbose_name='小区ID')),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='announcements.announcement', verbose_name='公告')),
+                ('term', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='announcements.searchterm', verbose_name='搜索词')),
+            ],
+            options={
+                'verbose_name': '公告倒排索引',
+                'verbose_name_plural': '公告倒排索引',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', 'community_id', 'announcement'], name='search_posting_community_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchposting',
+            unique_together={('term', 'announcement')},
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from apps.users.models import User
 from apps.communities.models import Community, Building, House
@@ -35,6 +36,7 @@ class Announcement(models.Model):
     publisher = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='published_announcements', verbose_name=_('发布人'))
     is_published = models.BooleanField(_('是否发布'), default=False)
     published_at = models.DateTimeField(_('发布时间'), null=True, blank=True)
+    audience_size = models.PositiveIntegerField(_('受众人数'), null=True, blank=True, help_text='发布时展开受众得到的接收人数')
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
     updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
     
@@ -51,7 +53,8 @@ class AnnouncementRead(models.Model):
     """公告已读表"""
     announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='reads', verbose_name=_('公告'))
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='read_announcements', verbose_name=_('用户'))
-    read_at = models.DateTimeField(_('阅读时间'), auto_now_add=True)
+    # 已读回执先进入缓冲区再批量写入，保留实际阅读时间
+    read_at = models.DateTimeField(_('阅读时间'), default=timezone.now)
     
     class Meta:
         verbose_name = _('公告已读')
@@ -60,3 +63,67 @@ class AnnouncementRead(models.Model):
     
     def __str__(self):
         return f'{self.user.username} - {self.announcement.title}'
+
+
+class AnnouncementHouse(models.Model):
+    """公告受众房屋表，发布时由推送范围展开，房产绑定审核通过时据此补充可见记录"""
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='audience_houses', verbose_name=_('公告'))
+    house = models.ForeignKey(House, on_delete=models.CASCADE, related_name='+', verbose_name=_('房屋'))
+    
+    class Meta:
+        verbose_name = _('公告受众房屋')
+        verbose_name_plural = _('公告受众房屋')
+        # 房屋在前：按房屋查找其可见的公告
+        unique_together = ('house', 'announcement')
+
+
+class AnnouncementRecipient(models.Model):
+    """公告接收人表，居民信息流按(user, published_at)索引倒序读取"""
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='recipients', verbose_name=_('公告'))
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name=_('用户'))
+    published_at = models.DateTimeField(_('发布时间'), help_text='冗余公告的发布时间，用于信息流排序')
+    
+    class Meta:
+        verbose_name = _('公告接收人')
+        verbose_name_plural = _('公告接收人')
+        unique_together = ('announcement', 'user')
+        indexes = [
+            models.Index(fields=['user', 'published_at'], name='announcement_feed_idx'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """
+    公告搜索词表（中文二元组或英文/数字单词）
+
+    单个汉字的查询需要找出以该字开头或结尾的二元组：开头按term的唯一索引区间查询，
+    结尾按冗余的末字（last_char）索引查询，避免LIKE '%字'扫描整个词表
+    """
+    term = models.CharField(_('搜索词'), max_length=32, unique=True)
+    last_char = models.CharField(_('末字'), max_length=1, blank=True, null=True, db_index=True,
+                                 help_text='中文搜索词的最后一个字，英文/数字单词为空')
+    doc_count = models.PositiveIntegerField(_('包含该词的公告数'), default=0)
+    
+    class Meta:
+        verbose_name = _('公告搜索词')
+        verbose_name_plural = _('公告搜索词')
+
+
+class SearchPosting(models.Model):
+    """
+    公告倒排索引
+
+    (搜索词, 公告)唯一，全库检索时按公告id倒序扫描即可提前结束；
+    冗余小区id建立(搜索词, 小区, 公告)索引，限定小区时只扫描一个索引区间
+    """
+    term = models.ForeignKey(SearchTerm, on_delete=models.CASCADE, related_name='+', db_index=False, verbose_name=_('搜索词'))
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='+', verbose_name=_('公告'))
+    community_id = models.BigIntegerField(_('小区ID'))
+    
+    class Meta:
+        verbose_name = _('公告倒排索引')
+        verbose_name_plural = _('公告倒排索引')
+        unique_together = ('term', 'announcement')
+        indexes = [
+            models.Index(fields=['term', 'community_id', 'announcement'], name='search_posting_community_idx'),
+        ]
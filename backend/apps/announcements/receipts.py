@@ -0,0 +1,155 @@
+"""
+公告已读回执
+
+紧急公告（停水停电）发布后几分钟内几乎所有居民都会打开，每次打开都INSERT一行AnnouncementRead，
+在(announcement, user)唯一索引上争用。这里把回执先写入Redis：一个Lua脚本在一次往返中完成
+    1. 更新用户信息流的已读集合（见feed）。重复打开同样执行：回执尚未落库时feed可能已从数据库重建，
+       去重之后再更新会使公告一直显示为未读
+    2. SADD announcements:readers:{announcement_id}：首次阅读才继续，重复打开直接返回
+    3. XADD到回执流 announcements:read_receipts
+    4. PFADD到阅读分析的HyperLogLog计数（见analytics），“24小时阅读率”由发布后前24个小时分桶得出，无需等待回执落库
+接口随即返回；flush_read_receipts以消费组方式批量读取回执流，bulk_create(ignore_conflicts)
+写入后再确认，进程崩溃未确认的回执由其他消费者认领重写，重复写入被唯一索引忽略。
+缓存后端不是Redis或Redis不可用时回执直接写入数据库。
+"""
+import logging
+import socket
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import IntegrityError
+from redis.exceptions import ResponseError
+
+from apps.common.redis_client import get_redis_client
+from apps.users.models import User
+from .analytics import ANALYTICS_TTL, HLL_BUCKET_KEY, HLL_KEY, hour_bucket
+from .feed import FEED_KEY, READ_KEY
+from .models import Announcement, AnnouncementRead
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'announcements:read_receipts'
+GROUP = 'flusher'
+READERS_KEY = 'announcements:readers:{}'
+# 去重集合的保留时间
+READERS_TTL = 2 * 86400
+# 回执流的近似长度上限，防止flusher长时间停止时占满内存
+STREAM_MAXLEN = 1000000
+# 未确认超过该时长的回执视为消费者已崩溃，由其他消费者认领
+CLAIM_IDLE_MS = 60000
+
+# KEYS: readers, feed, read, stream, hll, hll_bucket
+# ARGV: user_id, announcement_id, now, ttl, maxlen, analytics_ttl, 是否计入分桶(1/0)
+RECORD_SCRIPT = """
+if redis.call('ZSCORE', KEYS[2], ARGV[2]) then
+    redis.call('SADD', KEYS[3], ARGV[2])
+end
+if redis.call('SADD', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('XADD', KEYS[4], 'MAXLEN', '~', ARGV[5], '*', 'a', ARGV[2], 'u', ARGV[1], 't', ARGV[3])
+redis.call('PFADD', KEYS[5], ARGV[1])
+redis.call('EXPIRE', KEYS[5], ARGV[6])
+if ARGV[7] == '1' then
+    redis.call('PFADD', KEYS[6], ARGV[1])
+    redis.call('EXPIRE', KEYS[6], ARGV[6])
+end
+return 1
+"""
+
+_script = None
+
+
+def record_read(announcement, user_id, now=None):
+    """记录已读回执，返回是否为首次阅读（Redis缓冲时按去重集合判断）"""
+    global _script
+    now = now or datetime.now(dt_timezone.utc)
+    client = get_redis_client()
+    if client is not None:
+        try:
+            if _script is None:
+                _script = client.register_script(RECORD_SCRIPT)
+            published = announcement.published_at or now
+            hour = hour_bucket(published, now)
+            keys = [READERS_KEY.format(announcement.id), FEED_KEY.format(user_id), READ_KEY.format(user_id),
+                    STREAM_KEY, HLL_KEY.format(announcement.id), HLL_BUCKET_KEY.format(announcement.id, hour or 0)]
+            args = [user_id, announcement.id, now.timestamp(),
+                    READERS_TTL, STREAM_MAXLEN, ANALYTICS_TTL, int(hour is not None)]
+            return bool(_script(keys=keys, args=args, client=client))
+        except Exception:
+            logger.warning('已读回执写入Redis失败，直接写入数据库', exc_info=True)
+    try:
+        _, created = AnnouncementRead.objects.get_or_create(
+            announcement_id=announcement.id, user_id=user_id, defaults={'read_at': now}
+        )
+    except IntegrityError:
+        # 并发重复回执
+        created = False
+    return created
+
+
+def _ensure_group(client):
+    try:
+        client.xgroup_create(STREAM_KEY, GROUP, id='0', mkstream=True)
+    except ResponseError as exc:
+        if 'BUSYGROUP' not in str(exc):
+            raise
+
+
+def save_receipts(entries):
+    """写入一批回执，忽略已删除的公告和用户，返回写入的行数"""
+    receipts = {}
+    for _, fields in entries:
+        try:
+            key = int(fields[b'a']), int(fields[b'u'])
+            read_at = datetime.fromtimestamp(float(fields[b't']), tz=dt_timezone.utc)
+        except (KeyError, ValueError):
+            continue
+        receipts.setdefault(key, read_at)
+    if not receipts:
+        return 0
+    announcement_ids = set(Announcement.objects.filter(id__in={a for a, _ in receipts}).values_list('id', flat=True))
+    user_ids = set(User.all_with_deleted.filter(id__in={u for _, u in receipts}).values_list('id', flat=True))
+    reads = [
+        AnnouncementRead(announcement_id=a, user_id=u, read_at=read_at)
+        for (a, u), read_at in receipts.items() if a in announcement_ids and u in user_ids
+    ]
+    AnnouncementRead.objects.bulk_create(reads, ignore_conflicts=True)
+    return len(reads)
+
+
+def flush_read_receipts(batch_size=1000, block_ms=None, consumer=None, max_batches=None):
+    """
+    从回执流批量写入数据库，返回(读取的回执数, 写入的行数)
+    先认领崩溃消费者遗留的回执，再读取新回执，直到流中没有待处理的回执或达到max_batches
+    """
+    client = get_redis_client()
+    if client is None:
+        return 0, 0
+    consumer = consumer or socket.gethostname()
+    _ensure_group(client)
+
+    received = saved = batches = 0
+    claim_from = '0-0'
+    while max_batches is None or batches < max_batches:
+        entries = []
+        if claim_from is not None:
+            claim_from, entries = client.xautoclaim(
+                STREAM_KEY, GROUP, consumer, CLAIM_IDLE_MS, start_id=claim_from, count=batch_size
+            )[:2]
+            if claim_from in (b'0-0', '0-0'):
+                claim_from = None
+        if not entries:
+            response = client.xreadgroup(GROUP, consumer, {STREAM_KEY: '>'}, count=batch_size, block=block_ms)
+            entries = response[0][1] if response else []
+        if not entries:
+            break
+        # 已被裁剪的回执认领时内容为空，一并确认
+        saved += save_receipts([(entry_id, fields) for entry_id, fields in entries if fields])
+        ids = [entry_id for entry_id, _ in entries]
+        client.xack(STREAM_KEY, GROUP, *ids)
+        client.xdel(STREAM_KEY, *ids)
+        received += len(entries)
+        batches += 1
+    return received, saved
+
@@ -0,0 +1,232 @@
+"""
+公告全文检索
+
+标题和正文规范化（NFKC、小写）后切分为搜索词：连续的汉字按相邻两字切分为二元组（单个汉字保留原字），
+连续的英文字母和数字作为一个单词。倒排索引存放在本地两张表中：
+    SearchTerm     搜索词及包含它的公告数（doc_count），另存末字（last_char）索引
+    SearchPosting  (搜索词, 公告)唯一，另有(搜索词, 小区, 公告)索引，限定小区时只扫描一个索引区间
+
+查询同样切分为搜索词，以doc_count最小的词驱动，其余词用EXISTS逐条核对，按公告id倒序（新公告在前）分页。
+三个字以上的连续汉字还需核对标题/正文中连续出现（二元组全部出现不代表连续出现），
+核对前按切分时的规则规范化，去掉标点等非搜索字符。
+单个汉字的关键词匹配以该字开头（term索引区间）或结尾（last_char索引）的二元组；
+不限小区且这些二元组的doc_count合计较大时，改为按id倒序扫描公告表逐条核对，避免合并排序全部倒排记录。
+
+公告保存时只对比增删的搜索词更新索引，删除时同时移除；rebuild_announcement_search可整体重建。
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Announcement, AnnouncementRecipient, SearchPosting, SearchTerm
+
+MAX_TERM_LENGTH = 32
+# IN查询每批的参数个数
+CHUNK_SIZE = 500
+MAX_LIMIT = 50
+# 驱动词组的doc_count合计超过该值时改为扫描公告表
+SCAN_THRESHOLD = 5000
+
+_CJK = r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_CJK_RE = re.compile(f'[{_CJK}]')
+_RUN_RE = re.compile(f'[{_CJK}]+|[0-9a-z]+')
+
+# 影响搜索词的字段，只修改其他字段（如发布状态）时不重建索引
+INDEXED_FIELDS = {'title', 'content', 'community', 'community_id'}
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _runs(text):
+    """规范化（NFKC、小写）后的连续汉字串和英文/数字串"""
+    return _RUN_RE.findall(unicodedata.normalize('NFKC', text or '').lower())
+
+
+def tokenize(text):
+    """切分搜索词，返回集合"""
+    terms = set()
+    for run in _runs(text):
+        if not _CJK_RE.match(run):
+            terms.add(run[:MAX_TERM_LENGTH])
+        elif len(run) == 1:
+            terms.add(run)
+        else:
+            terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def term_last_char(term):
+    """中文搜索词的末字，英文/数字单词返回None"""
+    return term[-1] if _CJK_RE.match(term) else None
+
+
+def _phrases(query):
+    """需要在标题/正文中核对连续出现的关键词：三个字以上的汉字串，以及超过搜索词长度被截断的单词"""
+    return [run for run in _runs(query)
+            if len(run) > MAX_TERM_LENGTH or (len(run) > 2 and _CJK_RE.match(run))]
+
+
+def document_terms(announcement):
+    # 标题和正文之间换行分隔，避免产生跨越两者的二元组
+    return tokenize(f'{announcement.title}\n{announcement.content}')
+
+
+def _term_ids(terms):
+    """返回{搜索词: id}，词表中没有的词先批量插入"""
+    ids = {}
+    for chunk in _chunks(terms):
+        ids.update(SearchTerm.objects.filter(term__in=chunk).values_list('term', 'id'))
+    missing = [term for term in terms if term not in ids]
+    if missing:
+        SearchTerm.objects.bulk_create([SearchTerm(term=term, last_char=term_last_char(term)) for term in missing],
+                                      ignore_conflicts=True)
+        for chunk in _chunks(missing):
+            ids.update(SearchTerm.objects.filter(term__in=chunk).values_list('term', 'id'))
+    return ids
+
+
+def _adjust_doc_counts(term_ids, delta):
+    for chunk in _chunks(term_ids):
+        SearchTerm.objects.filter(id__in=chunk).update(doc_count=F('doc_count') + delta)
+
+
+def index_announcement(announcement):
+    """增量更新单条公告的索引：只插入新增的搜索词、删除不再出现的搜索词"""
+    with transaction.atomic():
+        postings = SearchPosting.objects.filter(announcement_id=announcement.id)
+        existing = {}
+        moved = False
+        for term, term_id, community_id in postings.values_list('term__term', 'term_id', 'community_id'):
+            existing[term] = term_id
+            moved = moved or community_id != announcement.community_id
+        if moved:
+            # 公告改到其他小区时整体重建
+            remove_announcement(announcement.id)
+            existing = {}
+
+        terms = document_terms(announcement)
+        removed = [term_id for term, term_id in existing.items() if term not in terms]
+        if removed:
+            for chunk in _chunks(removed):
+                postings.filter(term_id__in=chunk).delete()
+            _adjust_doc_counts(removed, -1)
+
+        added = _term_ids([term for term in terms if term not in existing])
+        if added:
+            SearchPosting.objects.bulk_create([
+                SearchPosting(term_id=term_id, announcement_id=announcement.id, community_id=announcement.community_id)
+                for term_id in added.values()
+            ], ignore_conflicts=True)
+            _adjust_doc_counts(added.values(), 1)
+
+
+def remove_announcement(announcement_id):
+    """移除公告的索引（需在删除公告之前调用，以便更新doc_count）"""
+    postings = SearchPosting.objects.filter(announcement_id=announcement_id)
+    term_ids = list(postings.values_list('term_id', flat=True))
+    if term_ids:
+        postings.delete()
+        _adjust_doc_counts(term_ids, -1)
+
+
+def index_many(announcements, batch_size=5000):
+    """为尚无索引的公告批量建立索引（重建和基准测试使用），不更新doc_count，返回写入的倒排记录数"""
+    documents = [(announcement.id, announcement.community_id, document_terms(announcement))
+                 for announcement in announcements]
+    ids = _term_ids(set().union(*(terms for _, _, terms in documents)))
+    postings = [
+        SearchPosting(term_id=ids[term], announcement_id=announcement_id, community_id=community_id)
+        for announcement_id, community_id, terms in documents for term in terms
+    ]
+    SearchPosting.objects.bulk_create(postings, batch_size=batch_size)
+    return len(postings)
+
+
+def refresh_doc_counts():
+    """按倒排表重新统计所有搜索词的doc_count"""
+    counts = SearchPosting.objects.filter(term_id=OuterRef('pk')).values('term_id').annotate(n=Count('*')).values('n')
+    SearchTerm.objects.update(doc_count=Coalesce(Subquery(counts), 0))
+
+
+def _term_groups(query):
+    """
+    将查询切分为搜索词组，每组为[(词id, doc_count)]，公告需匹配每一组中的任意一个词；
+    一次查询取出所有词组，有任一组在词表中不存在时返回None（不可能有结果）
+    """
+    terms = tokenize(query)
+    if not terms:
+        return None
+    # 单个汉字匹配以其开头或结尾的二元组：开头按term索引区间，结尾按last_char索引
+    chars = {term for term in terms if len(term) == 1 and _CJK_RE.match(term)}
+    condition = Q(term__in=terms - chars)
+    for char in chars:
+        condition |= Q(term__gte=char, term__lt=chr(ord(char) + 1)) | Q(last_char=char)
+    rows = list(SearchTerm.objects.filter(condition, doc_count__gt=0).values_list('term', 'id', 'doc_count'))
+
+    groups = []
+    for term in terms:
+        if term in chars:
+            group = [(term_id, doc_count) for value, term_id, doc_count in rows if term in (value[0], value[-1])]
+        else:
+            group = [(term_id, doc_count) for value, term_id, doc_count in rows if value == term]
+        if not group:
+            return None
+        groups.append(group)
+    return groups
+
+
+def search(query, community_ids=None, announcement_type=None, user_id=None, limit=20, offset=0):
+    """
+    检索公告，返回匹配的公告id列表（新公告在前）
+    community_ids限定小区；user_id不为空时只返回已发布且该用户可见的公告
+    """
+    groups = _term_groups(query)
+    if not groups:
+        return []
+    # doc_count最小的词组驱动，其余词组逐条核对
+    groups.sort(key=lambda group: sum(doc_count for _, doc_count in group))
+    driving, others = groups[0], groups[1:]
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    if community_ids is None and len(driving) > 1 and sum(doc_count for _, doc_count in driving) > SCAN_THRESHOLD:
+        # 常见单字对应大量二元组，合并排序需取出全部倒排记录；改为按id倒序扫描公告并逐条核对，取够即停
+        results = Announcement.objects.all()
+        announcement_ref = OuterRef('pk')
+        for group in groups:
+            results = results.filter(Exists(SearchPosting.objects.filter(
+                term_id__in=[term_id for term_id, _ in group], announcement_id=announcement_ref,
+            )))
+        prefix = ''
+        ids = results.order_by('-id').values_list('id', flat=True)
+    else:
+        results = SearchPosting.objects.filter(term_id__in=[term_id for term_id, _ in driving])
+        if community_ids is not None:
+            results = results.filter(community_id__in=community_ids)
+        for group in others:
+            results = results.filter(Exists(SearchPosting.objects.filter(
+                term_id__in=[term_id for term_id, _ in group],
+                community_id=OuterRef('community_id'),
+                announcement_id=OuterRef('announcement_id'),
+            )))
+        announcement_ref = OuterRef('announcement_id')
+        prefix = 'announcement__'
+        ids = results.order_by('-announcement_id').values_list('announcement_id', flat=True)
+        if len(driving) > 1:
+            ids = ids.distinct()
+
+    if announcement_type:
+        ids = ids.filter(**{f'{prefix}type': announcement_type})
+    if user_id is not None:
+        ids = ids.filter(**{f'{prefix}is_published': True}).filter(Exists(
+            AnnouncementRecipient.objects.filter(user_id=user_id, announcement_id=announcement_ref)
+        ))
+    for phrase in _phrases(query):
+        ids = ids.filter(Q(**{f'{prefix}title__icontains': phrase}) | Q(**{f'{prefix}content__icontains': phrase}))
+    return list(ids[offset:offset + limit])
@@ -1,20 +1,50 @@
 from rest_framework import serializers
 from .models import Announcement, AnnouncementRead
 
+# 字段列表显式声明，并在系统检查中与模型核对（见checks.py）
+
 
 class AnnouncementSerializer(serializers.ModelSerializer):
-    """公告序列化器"""
+    """公告序列化器（管理员），推送范围和受众人数只返回给管理员"""
+    class Meta:
+        model = Announcement
+        fields = ['id', 'community', 'title', 'content', 'type', 'target_type', 'target_ids', 'publisher',
+                  'is_published', 'published_at', 'audience_size', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'publisher', 'is_published', 'published_at', 'audience_size', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        target_type = attrs.get('target_type', getattr(self.instance, 'target_type', Announcement.TargetType.ALL))
+        target_ids = attrs.get('target_ids', getattr(self.instance, 'target_ids', None))
+        if target_type == Announcement.TargetType.ALL:
+            return attrs
+        if not isinstance(target_ids, list) or not target_ids or not all(isinstance(i, int) for i in target_ids):
+            raise serializers.ValidationError({'target_ids': '指定楼栋或房屋时必须提供ID列表'})
+        return attrs
+
+
+class AnnouncementFeedSerializer(serializers.ModelSerializer):
+    """居民公告信息流序列化器"""
     class Meta:
         model = Announcement
-        fields = ['id', 'title', 'content', 'announcer', 'announcer_type',
-                  'target_community', 'is_top', 'publish_status',
-                  'publish_time', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'publish_time', 'created_at', 'updated_at']
+        fields = ['id', 'community', 'title', 'content', 'type', 'published_at']
+        read_only_fields = fields
+
+
+class AnnouncementSearchSerializer(serializers.Serializer):
+    """公告检索参数序列化器"""
+    q = serializers.CharField(max_length=100)
+    community = serializers.IntegerField(required=False)
+    type = serializers.ChoiceField(choices=Announcement.AnnouncementType.choices, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+    offset = serializers.IntegerField(min_value=0, max_value=1000, default=0)
 
 
 class AnnouncementReadSerializer(serializers.ModelSerializer):
     """公告已读序列化器"""
     class Meta:
         model = AnnouncementRead
-        fields = ['id', 'announcement', 'user', 'read_time']
-        read_only_fields = ['id', 'read_time']
\ No newline at end of file
+        fields = ['id', 'announcement', 'user', 'read_at']
+        read_only_fields = ['id', 'user', 'read_at']
+
+
+MODEL_SERIALIZERS = [AnnouncementSerializer, AnnouncementFeedSerializer, AnnouncementReadSerializer]
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.communities.models import UserHouse
+from apps.communities.signals import bindings_reviewed
+from .audience import add_bindings, remove_bindings
+from .feed import mark_read
+from .models import Announcement, AnnouncementRead
+from .search import INDEXED_FIELDS, index_announcement, remove_announcement
+
+
+@receiver(post_save, sender=UserHouse)
+def sync_binding_audience(sender, instance, created, **kwargs):
+    """单个房产绑定通过或被撤销后，补充或移除该用户可见的公告"""
+    if instance.status == UserHouse.StatusType.APPROVED:
+        add_bindings([(instance.user_id, instance.house_id)])
+    elif not created:
+        remove_bindings([(instance.user_id, instance.house_id)])
+
+
+@receiver(post_delete, sender=UserHouse)
+def remove_binding_audience(sender, instance, **kwargs):
+    remove_bindings([(instance.user_id, instance.house_id)])
+
+
+@receiver(bindings_reviewed)
+def sync_reviewed_audience(sender, bindings, approved, **kwargs):
+    """批量审核通过后补充可见公告（拒绝的绑定此前不可见，无需处理）"""
+    if approved:
+        add_bindings(bindings)
+
+
+@receiver(post_save, sender=AnnouncementRead)
+def sync_read_state(sender, instance, created, **kwargs):
+    """已读记录提交后加入用户信息流的已读集合"""
+    if created:
+        transaction.on_commit(lambda: mark_read(instance.user_id, [instance.announcement_id]))
+
+
+@receiver(post_save, sender=Announcement)
+def index_saved_announcement(sender, instance, update_fields=None, **kwargs):
+    """公告保存后增量更新检索索引，只修改了不参与检索的字段时跳过"""
+    if update_fields is not None and not INDEXED_FIELDS & set(update_fields):
+        return
+    index_announcement(instance)
+
+
+@receiver(pre_delete, sender=Announcement)
+def remove_deleted_announcement(sender, instance, **kwargs):
+    """公告删除前移除检索索引"""
+    remove_announcement(instance.id)
@@ -1,3 +1,362 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.communities.models import Building, Community, House, UserHouse
+from apps.users.models import User
+from apps.users.serializers import CustomTokenObtainPairSerializer
+from .analytics import ANALYTICS_TTL, HLL_KEY, get_read_curve, get_read_stats, reconcile
+from .audience import publish_announcement, unpublish_announcement, visible_to_user
+from .feed import FEED_TTL, fan_out, get_feed_page, get_unread_count
+from .models import Announcement, AnnouncementRead, AnnouncementRecipient, SearchPosting, SearchTerm
+from .receipts import save_receipts, record_read
+from .search import search, tokenize
+
+
+class AnnouncementTestCase(TestCase):
+    """公告测试基类：两个小区、三个楼栋，每户一个已审核的居民"""
+
+    def setUp(self):
+        self.community = Community.objects.create(
+            name='阳光小区', address='幸福路1号', property_phone='010-12345678', fee_standard=Decimal('2.00')
+        )
+        other = Community.objects.create(
+            name='月亮小区', address='幸福路2号', property_phone='010-12345679', fee_standard=Decimal('2.00')
+        )
+        self.building1 = Building.objects.create(community=self.community, name='1号楼')
+        self.building2 = Building.objects.create(community=self.community, name='2号楼')
+        other_building = Building.objects.create(community=other, name='1号楼')
+        self.residents = []
+        for i, building in enumerate([self.building1, self.building1, self.building2, other_building], start=1):
+            House.objects.create(id=i, building=building, unit='1', number=f'10{i}', area=Decimal('50'))
+            user = User.objects.create_user(username=f'resident{i}', phone=f'1390000200{i}', password=None)
+            UserHouse.objects.create(id=i, user=user, house_id=i, status=UserHouse.StatusType.APPROVED)
+            self.residents.append(user)
+        self.admin = User.objects.create_user(username='admin', phone='13900002000', password=None, is_staff=True)
+
+    def announce(self, target_type=Announcement.TargetType.ALL, target_ids=None):
+        announcement = Announcement.objects.create(
+            community=self.community, title='停水通知', content='明日停水', target_type=target_type, target_ids=target_ids
+        )
+        publish_announcement(announcement)
+        return announcement
+
+    def recipients(self, announcement):
+        return set(announcement.recipients.values_list('user_id', flat=True))
+
+
+class AudienceTests(AnnouncementTestCase):
+    """公告受众测试类"""
+
+    def test_expand_targets(self):
+        """测试各推送范围展开为小区内的接收人"""
+        everyone = self.announce()
+        self.assertEqual(self.recipients(everyone), {u.id for u in self.residents[:3]})
+        building = self.announce(Announcement.TargetType.BUILDING, [self.building2.id])
+        self.assertEqual(self.recipients(building), {self.residents[2].id})
+        # 其他小区的房屋不会被包含
+        house = self.announce(Announcement.TargetType.HOUSE, [1, 4])
+        self.assertEqual(self.recipients(house), {self.residents[0].id})
+        self.assertEqual(house.audience_houses.count(), 1)
+
+    def test_binding_changes(self):
+        """测试绑定审核通过后补充可见公告，解除后移除"""
+        announcement = self.announce(Announcement.TargetType.BUILDING, [self.building1.id])
+        newcomer = User.objects.create_user(username='newcomer', phone='13900002009', password=None)
+        binding = UserHouse.objects.create(id=9, user=newcomer, house_id=2)
+        self.assertNotIn(newcomer.id, self.recipients(announcement))
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        client.post(reverse('binding-review'), {'ids': [9], 'action': 'approve'}, format='json')
+        self.assertIn(newcomer.id, self.recipients(announcement))
+        binding.delete()
+        self.assertNotIn(newcomer.id, self.recipients(announcement))
+
+    def test_feed_query_count(self):
+        """测试居民信息流的查询次数与公告数量无关，只返回可见公告"""
+        for _ in range(5):
+            self.announce(Announcement.TargetType.BUILDING, [self.building2.id])
+        visible = self.announce()
+        client = APIClient()
+        client.force_authenticate(user=self.residents[0])
+        with self.assertNumQueries(3):
+            response = client.get(reverse('announcement-feed'))
+        self.assertEqual([item['id'] for item in response.data['results']], [visible.id])
+
+        hidden = Announcement.objects.exclude(id=visible.id).first()
+        self.assertEqual(client.get(reverse('announcement-detail', args=[hidden.id])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        response = client.get(reverse('announcement-detail', args=[visible.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # 居民看不到推送范围和受众人数
+        self.assertNotIn('target_ids', response.data)
+        self.assertNotIn('audience_size', response.data)
+
+    def test_publish_endpoint_and_rebuild_command(self):
+        """测试管理员发布接口和重建命令（经真实JWT认证）"""
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(self.admin).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = client.post(reverse('announcement-list'), {
+            'community': self.community.id, 'title': '活动', 'content': '周末活动',
+            'target_type': 'building', 'target_ids': [self.building1.id],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Announcement.objects.get(pk=response.data['id']).publisher_id, self.admin.id)
+        response = client.post(reverse('announcement-publish', args=[response.data['id']]))
+        self.assertEqual(response.data, {'houses': 2, 'recipients': 2})
+
+        AnnouncementRecipient.objects.all().delete()
+        call_command('rebuild_announcement_audience', stdout=StringIO())
+        self.assertEqual(visible_to_user(self.residents[0].id).count(), 1)
+
+    def test_update_rebuilds_audience_only_when_targets_change(self):
+        """测试修改已发布公告的内容不重建受众，修改推送范围时重建"""
+        announcement = self.announce(Announcement.TargetType.BUILDING, [self.building1.id])
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        url = reverse('announcement-detail', args=[announcement.id])
+        recipient_ids = set(announcement.recipients.values_list('id', flat=True))
+        with mock.patch('apps.announcements.views.build_audience') as build:
+            client.patch(url, {'content': '明日8点停水'}, format='json')
+        build.assert_not_called()
+        self.assertEqual(set(announcement.recipients.values_list('id', flat=True)), recipient_ids)
+
+        client.patch(url, {'target_ids': [self.building2.id]}, format='json')
+        self.assertEqual(self.recipients(announcement), {self.residents[2].id})
+
+
+class FeedTests(AnnouncementTestCase):
+    """居民信息流与未读数测试类"""
+
+    def test_fan_out_refreshes_ttl(self):
+        """测试推送时把过期时间传给追加脚本，feed和已读集合不会永久保留"""
+        announcement = self.announce()
+        client = mock.MagicMock()
+        with mock.patch('apps.announcements.feed.get_redis_client', return_value=client), \
+                mock.patch.dict('apps.announcements.feed._scripts', clear=True):
+            fan_out(announcement.id, announcement.published_at)
+        script = client.register_script.return_value
+        self.assertEqual(script.call_count, 3)
+        self.assertEqual(script.call_args.kwargs['args'][3], FEED_TTL)
+        self.assertIn("'EXPIRE', KEYS[1], ARGV[4]", client.register_script.call_args.args[0])
+
+    def test_unread_count_and_read(self):
+        """测试未读数、首页已读标记随已读记录更新"""
+        first = self.announce()
+        second = self.announce(Announcement.TargetType.BUILDING, [self.building1.id])
+        self.announce(Announcement.TargetType.BUILDING, [self.building2.id])
+        resident = self.residents[0]
+        self.assertEqual(get_unread_count(resident.id), 2)
+
+        client = APIClient()
+        client.force_authenticate(user=resident)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('announcement-read', args=[first.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        client.post(reverse('announcement-read', args=[first.id]))
+        self.assertEqual(client.get(reverse('announcement-unread-count')).data, {'unread_count': 1})
+
+        response = client.get(reverse('announcement-inbox'))
+        self.assertEqual(response.data['unread_count'], 1)
+        self.assertEqual([(item['id'], item['is_read']) for item in response.data['results']],
+                         [(second.id, False), (first.id, True)])
+        self.assertEqual(get_feed_page(resident.id, limit=1), [(second.id, False)])
+
+    def test_read_with_jwt(self):
+        """测试经JWT认证（request.user为令牌用户而非User实例）标记已读"""
+        announcement = self.announce()
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(self.residents[0]).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('announcement-read', args=[announcement.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_unread_count(self.residents[0].id), 0)
+
+    def test_unpublish_hides_from_feed(self):
+        """测试撤回公告后从信息流和未读数中移除"""
+        announcement = self.announce()
+        unpublish_announcement(announcement)
+        self.assertEqual(get_unread_count(self.residents[0].id), 0)
+        self.assertEqual(get_feed_page(self.residents[0].id), [])
+
+
+class ReadReceiptTests(AnnouncementTestCase):
+    """已读回执测试类"""
+
+    def test_record_read_without_buffer(self):
+        """测试无Redis时回执直接写入数据库并去重"""
+        announcement = self.announce()
+        read_at = announcement.published_at + timedelta(minutes=5)
+        self.assertTrue(record_read(announcement, self.residents[0].id, now=read_at))
+        self.assertFalse(record_read(announcement, self.residents[0].id))
+        self.assertEqual(AnnouncementRead.objects.get().read_at, read_at)
+
+    def test_save_buffered_batch(self):
+        """测试批量写入回执：保留阅读时间，忽略重复回执和已删除的公告"""
+        announcement = self.announce()
+        deleted = self.announce()
+        user_id = self.residents[0].id
+        read_at = announcement.published_at.timestamp() + 60
+        entries = [
+            (b'1-0', {b'a': str(announcement.id).encode(), b'u': str(user_id).encode(), b't': str(read_at).encode()}),
+            (b'2-0', {b'a': str(announcement.id).encode(), b'u': str(user_id).encode(), b't': b'0'}),
+            (b'3-0', {b'a': str(deleted.id).encode(), b'u': str(user_id).encode(), b't': str(read_at).encode()}),
+        ]
+        deleted.delete()
+        self.assertEqual(save_receipts(entries), 1)
+        self.assertEqual(save_receipts(entries), 1)
+        read = AnnouncementRead.objects.get()
+        self.assertEqual(read.read_at.timestamp(), read_at)
+
+    def test_read_rate_stats(self):
+        """测试24小时阅读率只统计发布后24小时内的阅读"""
+        announcement = self.announce()
+        record_read(announcement, self.residents[0].id, now=announcement.published_at + timedelta(hours=1))
+        record_read(announcement, self.residents[1].id, now=announcement.published_at + timedelta(hours=30))
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        response = client.get(reverse('announcement-stats', args=[announcement.id]))
+        self.assertEqual(response.data, {'audience': 3, 'read_24h': 1, 'read_rate_24h': 0.3333})
+        # 与阅读率曲线第24小时的点一致
+        point = client.get(reverse('announcement-read-curve', args=[announcement.id]), {'hours': 24}).data['points'][-1]
+        self.assertEqual((point['readers'], point['read_rate']), (1, 0.3333))
+
+        with self.assertRaises(CommandError):
+            call_command('flush_read_receipts', stdout=StringIO())
+
+
+class ReadAnalyticsTests(AnnouncementTestCase):
+    """公告阅读分析测试类"""
+
+    def test_read_curve(self):
+        """测试阅读曲线为逐小时累计的去重读者数，分母为发布时缓存的受众人数"""
+        announcement = self.announce()
+        self.assertEqual(announcement.audience_size, 3)
+        published = announcement.published_at
+        record_read(announcement, self.residents[0].id, now=published + timedelta(minutes=10))
+        record_read(announcement, self.residents[1].id, now=published + timedelta(hours=2, minutes=5))
+        record_read(announcement, self.residents[2].id, now=published + timedelta(hours=40))
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        response = client.get(reverse('announcement-read-curve', args=[announcement.id]), {'hours': 3})
+        self.assertEqual((response.data['readers'], response.data['read_rate']), (3, 1))
+        self.assertEqual([(p['hour'], p['readers']) for p in response.data['points']], [(1, 1), (2, 1), (3, 2)])
+        self.assertEqual(response.data['points'][2]['read_rate'], 0.6667)
+
+    def test_missing_counters_fall_back(self):
+        """测试HyperLogLog不存在（过期、清空或早于该功能发布）或发布超过保留期时按数据库计算"""
+        announcement = self.announce()
+        record_read(announcement, self.residents[0].id, now=announcement.published_at + timedelta(minutes=10))
+        client = mock.MagicMock()
+        client.pipeline.return_value.execute.return_value = [0, 0] + [1, 0] * 24 + [1]
+        with mock.patch('apps.announcements.analytics.get_redis_client', return_value=client):
+            self.assertEqual(get_read_stats(announcement), {'audience': 3, 'read_24h': 1, 'read_rate_24h': 0.3333})
+            client.pipeline.return_value.exists.assert_called_once_with(HLL_KEY.format(announcement.id))
+
+            client.reset_mock()
+            Announcement.objects.filter(pk=announcement.pk).update(
+                published_at=announcement.published_at - timedelta(seconds=ANALYTICS_TTL + 1)
+            )
+            announcement.refresh_from_db()
+            self.assertEqual(get_read_curve(announcement, 3)['readers'], 1)
+            client.pipeline.assert_not_called()
+
+    def test_reconcile_command(self):
+        """测试核对命令修正发布后变化的受众人数"""
+        announcement = self.announce()
+        newcomer = User.objects.create_user(username='newcomer', phone='13900002009', password=None)
+        UserHouse.objects.create(id=9, user=newcomer, house_id=1, status=UserHouse.StatusType.APPROVED)
+        self.assertEqual(reconcile(announcement)['exact_audience'], 4)
+
+        out = StringIO()
+        call_command('reconcile_announcement_reads', '--repair', stdout=out)
+        self.assertIn('偏差1条，修复1条', out.getvalue())
+        announcement.refresh_from_db()
+        self.assertEqual(announcement.audience_size, 4)
+
+
+class SearchTests(AnnouncementTestCase):
+    """公告全文检索测试类"""
+
+    def test_tokenize(self):
+        """测试汉字切分为二元组，英文数字按单词切分"""
+        self.assertEqual(tokenize('停水通知'), {'停水', '水通', '通知'})
+        self.assertEqual(tokenize('WiFi 密码 2024'), {'wifi', '密码', '2024'})
+        self.assertEqual(tokenize('水'), {'水'})
+
+    def test_incremental_index(self):
+        """测试保存、修改、删除公告时增量更新索引和词频"""
+        announcement = Announcement.objects.create(community=self.community, title='停水通知', content='明日停水')
+        self.assertEqual(search('停水'), [announcement.id])
+        self.assertEqual(SearchTerm.objects.get(term='停水').doc_count, 1)
+
+        announcement.title = '停电通知'
+        announcement.content = '明日停电'
+        announcement.save()
+        self.assertEqual(search('停水'), [])
+        self.assertEqual(search('停电'), [announcement.id])
+        self.assertEqual(SearchTerm.objects.get(term='停水').doc_count, 0)
+
+        announcement.delete()
+        self.assertEqual(search('停电'), [])
+        self.assertFalse(SearchPosting.objects.exists())
+
+    def test_search_filters(self):
+        """测试关键词需连续出现，按小区和类型过滤，单个汉字可检索"""
+        water = self.announce()
+        Announcement.objects.filter(pk=water.pk).update(type=Announcement.AnnouncementType.EMERGENCY)
+        other = Announcement.objects.create(community=self.community, title='水费账单', content='请缴纳水费，费用明细见附件')
+        self.assertEqual(search('停水'), [water.id])
+        self.assertEqual(search('水'), [other.id, water.id])
+        self.assertEqual(search('水', announcement_type='emergency'), [water.id])
+        self.assertEqual(search('停水', community_ids=[self.community.id + 1]), [])
+        # “水费”“费用”两个二元组都出现，但“水费用”不连续出现
+        self.assertEqual(search('费用'), [other.id])
+        self.assertEqual(search('水费用'), [])
+        # 查询中的标点、全角字符按切分规则规范化后再核对
+        self.assertEqual(search('停水！'), [water.id])
+        self.assertEqual(search('缴纳水费。'), [other.id])
+        self.assertEqual(search('ｗｉｆｉ'), [])
+        # 单个汉字的结尾匹配走last_char索引
+        self.assertEqual(SearchTerm.objects.get(term='停水').last_char, '水')
+        self.assertEqual(search('账'), [other.id])
+        # 常见单字改为扫描公告表时结果相同
+        with mock.patch('apps.announcements.search.SCAN_THRESHOLD', 0):
+            self.assertEqual(search('水'), [other.id, water.id])
+            self.assertEqual(search('水', announcement_type='emergency'), [water.id])
+            self.assertEqual(search('水', limit=1, offset=1), [water.id])
+
+    def test_search_endpoint_visibility(self):
+        """测试居民只能检索到发布给自己的公告"""
+        visible = self.announce()
+        self.announce(Announcement.TargetType.BUILDING, [self.building2.id])
+        Announcement.objects.create(community=self.community, title='停水草稿', content='明日停水')
+        client = APIClient()
+        client.force_authenticate(user=self.residents[0])
+        response = client.get(reverse('announcement-search'), {'q': '停水'})
+        self.assertEqual([item['id'] for item in response.data['results']], [visible.id])
+        self.assertIsNone(response.data['next_offset'])
+
+        client.force_authenticate(user=self.admin)
+        response = client.get(reverse('announcement-search'), {'q': '停水', 'limit': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['next_offset'], 2)
 
-# Create your tests here.
+    def test_rebuild_command(self):
+        """测试重建索引命令"""
+        announcement = self.announce()
+        SearchPosting.objects.all().delete()
+        call_command('rebuild_announcement_search', stdout=StringIO())
+        self.assertEqual(search('停水'), [announcement.id])
+        self.assertEqual(SearchTerm.objects.get(term='停水').doc_count, 1)
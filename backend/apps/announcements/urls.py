@@ -1,5 +1,11 @@
-from django.urls import path
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from .views import AnnouncementViewSet
+
+router = DefaultRouter()
+router.register('', AnnouncementViewSet, basename='announcement')
 
 urlpatterns = [
-    # 视图将在后续开发中添加
-]
\ No newline at end of file
+    path('', include(router.urls)),
+]
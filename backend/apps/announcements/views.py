@@ -1,3 +1,159 @@
-from django.shortcuts import render
+from django.db import transaction
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
-# Create your views here.
+from apps.common.pagination import KeysetPagination
+from apps.communities.models import Building, UserHouse
+from .analytics import get_read_curve, get_read_stats
+from .audience import build_audience, publish_announcement, unpublish_announcement, visible_to_user
+from .feed import get_feed_page, get_unread_count
+from .models import Announcement, AnnouncementRead
+from .receipts import record_read
+from .search import search
+from .serializers import AnnouncementFeedSerializer, AnnouncementSearchSerializer, AnnouncementSerializer
+
+
+class FeedPagination(KeysetPagination):
+    """信息流按发布时间倒序的键集分页"""
+    ordering_field = 'published_at'
+
+
+class AnnouncementViewSet(viewsets.ModelViewSet):
+    """
+    公告视图集
+
+    管理员管理和发布公告；居民通过feed读取自己可见的公告，可见性由发布时展开的受众附表决定。
+    """
+    serializer_class = AnnouncementSerializer
+    
+    def get_permissions(self):
+        if self.action in ['retrieve', 'feed', 'inbox', 'unread_count', 'read', 'search']:
+            return [permissions.IsAuthenticated()]
+        return [permissions.IsAdminUser()]
+    
+    def get_serializer_class(self):
+        # 居民查看单条公告时与信息流返回相同的字段
+        if self.request.user.is_staff:
+            return self.serializer_class
+        return AnnouncementFeedSerializer
+    
+    def get_queryset(self):
+        queryset = Announcement.objects.all()
+        if self.request.user.is_staff:
+            return queryset
+        # 居民只能查看发布给自己的公告，(announcement, user)唯一索引点查
+        return queryset.filter(is_published=True, recipients__user_id=self.request.user.id)
+    
+    def perform_create(self, serializer):
+        serializer.save(publisher_id=self.request.user.id)
+    
+    def perform_update(self, serializer):
+        # 已发布公告只在推送范围变化时重建受众，修改标题、内容不影响接收人和信息流
+        def audience_key(announcement):
+            return announcement.community_id, announcement.target_type, announcement.target_ids
+        
+        previous = audience_key(serializer.instance)
+        with transaction.atomic():
+            announcement = serializer.save()
+            if announcement.is_published and audience_key(announcement) != previous:
+                build_audience(announcement)
+    
+    @action(detail=True, methods=['post'])
+    def publish(self, request, pk=None):
+        """发布公告并展开受众"""
+        houses, recipients = publish_announcement(self.get_object())
+        return Response({'houses': houses, 'recipients': recipients})
+    
+    @action(detail=True, methods=['post'])
+    def unpublish(self, request, pk=None):
+        """撤回公告"""
+        unpublish_announcement(self.get_object())
+        return Response({'is_published': False})
+    
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """当前用户可见的公告，按发布时间倒序键集分页"""
+        paginator = FeedPagination()
+        rows = paginator.paginate_queryset(
+            visible_to_user(request.user.id).values('id', 'published_at', 'announcement_id'), request, view=self
+        )
+        ids = [row['announcement_id'] for row in rows]
+        read = set(AnnouncementRead.objects.filter(user_id=request.user.id, announcement_id__in=ids)
+                   .values_list('announcement_id', flat=True))
+        return paginator.get_paginated_response(self.feed_items([(i, i in read) for i in ids]))
+    
+    @action(detail=False, methods=['get'])
+    def inbox(self, request):
+        """信息流首页及未读数，均从Redis中的用户信息流读取"""
+        return Response({
+            'unread_count': get_unread_count(request.user.id),
+            'results': self.feed_items(get_feed_page(request.user.id)),
+        })
+    
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """未读公告数（角标）"""
+        return Response({'unread_count': get_unread_count(request.user.id)})
+    
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """标记公告已读，回执先写入缓冲区，由flush_read_receipts批量落库"""
+        record_read(self.get_object(), request.user.id)
+        return Response({'is_read': True})
+    
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """受众人数和发布后24小时阅读率（管理员）"""
+        return Response(get_read_stats(self.get_object()))
+    
+    @action(detail=True, methods=['get'], url_path='read-curve')
+    def read_curve(self, request, pk=None):
+        """发布后逐小时的累计去重读者数和阅读率（管理员），?hours=曲线小时数，默认24"""
+        try:
+            hours = int(request.query_params.get('hours', 24))
+        except ValueError:
+            return Response({'detail': 'hours必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_read_curve(self.get_object(), hours))
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        全文检索历史公告，?q=关键词，可选?community=、?type=、?limit=、?offset=
+        居民只能检索自己房屋所在小区中发布给自己的公告
+        """
+        serializer = AnnouncementSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        community = params.get('community')
+        user_id = None
+        community_ids = [community] if community else None
+        if not request.user.is_staff:
+            user_id = request.user.id
+            community_ids = list(Building.objects.filter(houses__user_houses__user_id=user_id,
+                                                         houses__user_houses__status=UserHouse.StatusType.APPROVED)
+                                 .values_list('community_id', flat=True).distinct())
+            if community:
+                community_ids = [community] if community in community_ids else []
+            if not community_ids:
+                return Response({'results': [], 'next_offset': None})
+        
+        ids = search(params['q'], community_ids=community_ids, announcement_type=params.get('type'),
+                     user_id=user_id, limit=params['limit'], offset=params['offset'])
+        announcements = Announcement.objects.in_bulk(ids)
+        return Response({
+            'results': AnnouncementFeedSerializer([announcements[i] for i in ids if i in announcements], many=True).data,
+            'next_offset': params['offset'] + len(ids) if len(ids) == params['limit'] else None,
+        })
+    
+    @staticmethod
+    def feed_items(entries):
+        """entries为[(公告id, 是否已读)]，按原顺序返回公告及已读标记"""
+        announcements = Announcement.objects.in_bulk([announcement_id for announcement_id, _ in entries])
+        items = []
+        for announcement_id, is_read in entries:
+            if announcement_id in announcements:
+                item = AnnouncementFeedSerializer(announcements[announcement_id]).data
+                item['is_read'] = is_read
+                items.append(item)
+        return items
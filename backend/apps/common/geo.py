@@ -0,0 +1,119 @@
+"""
+地理位置工具：geohash编码、邻近格子、球面距离
+
+geohash把经纬度编码为字符串，前缀相同的点落在同一个矩形格子中，前缀越长格子越小，
+因此“附近”的查询可以转化为对geohash列的若干个前缀区间查询，直接利用普通B树索引。
+"""
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {char: index for index, char in enumerate(BASE32)}
+
+# 地球平均半径（米）
+EARTH_RADIUS = 6371008.8
+
+# geohash的存储精度，9位约为4.8米×4.8米
+GEOHASH_PRECISION = 9
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """将经纬度编码为geohash"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        target, current = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (target[0] + target[1]) / 2
+        value <<= 1
+        if current >= mid:
+            value |= 1
+            target[0] = mid
+        else:
+            target[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def encode_point(latitude, longitude):
+    """经纬度任一为空时返回None，否则返回geohash"""
+    if latitude is None or longitude is None:
+        return None
+    return encode(latitude, longitude)
+
+
+def decode_bounds(geohash):
+    """返回geohash格子的边界(最小纬度, 最大纬度, 最小经度, 最大经度)"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if value >> shift & 1:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def neighbors(geohash):
+    """返回geohash本身及周围8个格子（跨越经度180°时环绕，极地处去重）"""
+    min_lat, max_lat, min_lng, max_lng = decode_bounds(geohash)
+    height = max_lat - min_lat
+    width = max_lng - min_lng
+    center_lat = (min_lat + max_lat) / 2
+    center_lng = (min_lng + max_lng) / 2
+    cells = []
+    for dlat in (-1, 0, 1):
+        lat = center_lat + dlat * height
+        if lat < -90 or lat > 90:
+            continue
+        for dlng in (-1, 0, 1):
+            lng = (center_lng + dlng * width + 180) % 360 - 180
+            cell = encode(lat, lng, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def cell_radius(geohash):
+    """
+    以格子内任意一点为中心、保证被“本格+8邻格”完全覆盖的半径（米），即格子较短边的实际长度
+    """
+    min_lat, max_lat, min_lng, max_lng = decode_bounds(geohash)
+    height = distance(min_lat, min_lng, max_lat, min_lng)
+    # 纬度越高，经度方向的格子越窄，取离赤道较远的一边
+    lat = max(abs(min_lat), abs(max_lat))
+    width = distance(lat, min_lng, lat, max_lng)
+    return min(height, width)
+
+
+def distance(lat1, lng1, lat2, lng2):
+    """两点间的球面距离（米，haversine公式）"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def prefix_range(prefix):
+    """
+    geohash前缀对应的字符串区间[start, end)，用于索引范围查询（比LIKE更容易走索引）
+    end取按BASE32顺序的下一个前缀（末位进位），只用到数字和小写字母，在二进制和MySQL默认的
+    不区分大小写排序规则下顺序一致；前缀全为最后一个字符时没有上界，end为None
+    """
+    stem = prefix.rstrip(BASE32[-1])
+    if not stem:
+        return prefix, None
+    return prefix, stem[:-1] + BASE32[_DECODE[stem[-1]] + 1]
@@ -0,0 +1,26 @@
+"""
+主键号段分配
+
+House、PropertyFeeBill等模型使用手动指定的BigInteger主键，批量写入前需要先拿到一段id。
+每次分配在一个短事务中锁住序列行并推进next_value，一次分配count个，
+批量导入时每批只需一次分配；并发的导入进程各自拿到不重叠的号段。
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from .models import IdSequence
+
+
+def allocate_ids(model, count):
+    """为model分配count个连续的主键，返回range"""
+    if count <= 0:
+        return range(0)
+    name = model._meta.label_lower
+    with transaction.atomic():
+        sequence, _ = IdSequence.objects.select_for_update().get_or_create(name=name)
+        # 兼容不经过号段分配直接写入的数据：号段起点不小于当前最大主键+1
+        max_id = model._base_manager.aggregate(max_id=Max('pk'))['max_id'] or 0
+        start = max(sequence.next_value, max_id + 1)
+        sequence.next_value = start + count
+        sequence.save(update_fields=['next_value', 'updated_at'])
+    return range(start, start + count)
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-17 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(help_text='app_label.model', max_length=100, primary_key=True, serialize=False, verbose_name='序列名称')),
+                ('next_value', models.BigIntegerField(default=1, verbose_name='下一个可分配的id')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '主键号段',
+                'verbose_name_plural': '主键号段',
+            },
+        ),
+    ]
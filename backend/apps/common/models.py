@@ -1,3 +1,16 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class IdSequence(models.Model):
+    """主键号段表，为手动指定BigInteger主键的模型分配id"""
+    name = models.CharField(_('序列名称'), max_length=100, primary_key=True, help_text='app_label.model')
+    next_value = models.BigIntegerField(_('下一个可分配的id'), default=1)
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('主键号段')
+        verbose_name_plural = _('主键号段')
+    
+    def __str__(self):
+        return f'{self.name}: {self.next_value}'
@@ -0,0 +1,118 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    键集（游标）分页
+
+    按(ordering_field, id)降序排列，下一页条件为 (field, id) < 游标位置，可直接利用
+    (field, id)联合索引定位，不需要COUNT(*)，也不会像OFFSET那样越往后翻越慢。
+    数据可以是模型实例，也可以是values()返回的字典行（需包含ordering_field和id）。
+    """
+    ordering_field = 'created_at'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = '无效的游标'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        position, reverse = self.decode_cursor(request)
+        field = queryset.model._meta.get_field(self.ordering_field)
+        if position is not None:
+            try:
+                value = field.to_python(position[0])
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            if reverse:
+                condition = Q(**{f'{self.ordering_field}__gt': value}) | Q(**{self.ordering_field: value, 'id__gt': position[1]})
+            else:
+                condition = Q(**{f'{self.ordering_field}__lt': value}) | Q(**{self.ordering_field: value, 'id__lt': position[1]})
+            queryset = queryset.filter(condition)
+
+        if reverse:
+            queryset = queryset.order_by(self.ordering_field, 'id')
+        else:
+            queryset = queryset.order_by(f'-{self.ordering_field}', '-id')
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # 向前翻页时一定存在下一页；向后翻页时只要不是第一页就存在上一页
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else position is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, row, reverse):
+        value = row[self.ordering_field] if isinstance(row, dict) else getattr(row, self.ordering_field)
+        pk = row['id'] if isinstance(row, dict) else row.id
+        payload = {'p': [value.isoformat() if hasattr(value, 'isoformat') else value, pk], 'r': int(reverse)}
+        cursor = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position = payload['p']
+            if len(position) != 2 or not isinstance(position[1], int):
+                raise ValueError
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
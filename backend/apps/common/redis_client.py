@@ -0,0 +1,46 @@
+"""
+原生Redis连接
+
+CACHES['default']只提供get/set等通用缓存接口，限流、排行、计数等功能需要直接使用
+Lua脚本、有序集合、HyperLogLog等Redis数据结构。这里从django-redis取出底层连接；
+缓存后端不是Redis（如测试使用的locmem）时返回None，调用方应回退到数据库或进程内实现。
+"""
+import logging
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+_client = _UNSET
+
+
+def get_redis_client(alias='default'):
+    """返回default缓存对应的redis-py客户端，非Redis缓存后端返回None"""
+    global _client
+    if alias != 'default':
+        return _connect(alias)
+    if _client is _UNSET:
+        _client = _connect(alias)
+    return _client
+
+
+def _connect(alias):
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    if not backend.startswith('django_redis.'):
+        return None
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection(alias)
+    except Exception as exc:
+        logger.warning('获取Redis连接失败: %s', exc)
+        return None
+
+
+@receiver(setting_changed)
+def _reset_client(*, setting, **kwargs):
+    global _client
+    if setting == 'CACHES':
+        _client = _UNSET
@@ -1,3 +1,5 @@
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
 from rest_framework import serializers
 # common应用通常包含共享模型或实用功能
 # 如果有共享模型，可以在这里定义相应的序列化器
@@ -6,4 +8,105 @@ class ResponseSerializer(serializers.Serializer):
     """通用响应序列化器"""
     code = serializers.IntegerField(default=200, help_text="状态码")
     message = serializers.CharField(default="success", help_text="响应消息")
-    data = serializers.JSONField(help_text="响应数据")
\ No newline at end of file
+    data = serializers.JSONField(help_text="响应数据")
+
+
+def get_requested_fields(request, param='fields'):
+    """解析?fields=id,name形式的稀疏字段参数，未指定时返回None"""
+    if request is None:
+        return None
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """读取请求支持通过?fields=id,name只返回部分字段"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        requested = get_requested_fields(request)
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+def check_serializer_fields(serializer_classes, app_label):
+    """
+    检查ModelSerializer的Meta.fields是显式列出的字段名列表（不使用__all__或exclude，新增的模型字段
+    不会自动出现在接口中），且fields、read_only_fields、extra_kwargs中的字段都能在模型上找到，
+    在系统检查（runserver、migrate、test启动时）中调用，字段与模型不一致时直接报错
+    """
+    errors = []
+    for serializer_class in serializer_classes:
+        meta = serializer_class.Meta
+        if not isinstance(getattr(meta, 'fields', None), (list, tuple)) or hasattr(meta, 'exclude'):
+            errors.append(checks.Error(
+                f'{serializer_class.__name__}必须在Meta.fields中显式列出字段',
+                obj=serializer_class,
+                id=f'{app_label}.E001',
+            ))
+            continue
+        declared = set(serializer_class._declared_fields)
+        names = list(meta.fields)
+        names.extend(getattr(meta, 'read_only_fields', ()))
+        names.extend(getattr(meta, 'extra_kwargs', {}))
+        for name in dict.fromkeys(names):
+            if name in declared:
+                continue
+            try:
+                meta.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                if not hasattr(meta.model, name):
+                    errors.append(checks.Error(
+                        f'{serializer_class.__name__}引用了{meta.model.__name__}上不存在的字段"{name}"',
+                        obj=serializer_class,
+                        id=f'{app_label}.E001',
+                    ))
+    return errors
+
+
+class ValuesSerializer:
+    """
+    只读快速序列化器
+
+    直接把QuerySet.values()返回的字典行转换为响应数据，跳过模型实例化。
+    复用serializer_class中字段的to_representation，输出与原序列化器一致；
+    只支持直接对应模型字段的简单字段，外键（PrimaryKeyRelatedField）直接输出values()中的主键值。
+    fields为需要返回的字段（None表示全部），exclude中的字段始终不返回。
+    """
+
+    def __init__(self, serializer_class, fields=None, exclude=()):
+        declared = serializer_class().fields
+        self.fields = []
+        for name, field in declared.items():
+            if field.write_only or (fields and name not in fields) or name in exclude:
+                continue
+            if '.' in field.source or field.source == '*':
+                raise ImproperlyConfigured(f'{serializer_class.__name__}.{name}不是简单模型字段，不能用于ValuesSerializer')
+            self.fields.append((name, field.source, self.compile_field(field)))
+
+    @staticmethod
+    def compile_field(field):
+        """预先确定每个字段的转换函数"""
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return field.pk_field.to_representation if field.pk_field else None
+        return field.to_representation
+
+    @property
+    def value_names(self):
+        """需要传给values()的字段名"""
+        return [source for _, source, _ in self.fields]
+
+    def to_representation(self, row):
+        return {
+            name: row[source] if row[source] is None or convert is None else convert(row[source])
+            for name, source, convert in self.fields
+        }
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
@@ -0,0 +1,114 @@
+"""
+房屋欠费汇总
+
+居民首页按绑定房屋展示欠费状态（欠费金额、最早未支付账期、逾期账单数）。
+汇总保存在HouseArrears表中，并以房屋为单位缓存到Redis：首页一次MGET即可取得全部房屋的汇总，
+无需按house_id聚合账单表。
+
+账单生成、支付、逾期扫描后只对涉及的房屋重新汇总（一次按house_id分组的聚合查询 + 一次批量upsert），
+Redis不可用或缓存缺失时回退到汇总表，汇总表也没有的房屋现场计算并补齐。
+"""
+import logging
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q, Sum
+
+from .models import House, HouseArrears, PropertyFeeBill
+
+logger = logging.getLogger(__name__)
+
+ARREARS_CACHE_KEY = 'communities:arrears:{}'
+ARREARS_CACHE_TIMEOUT = 24 * 60 * 60
+
+CENT = Decimal('0.01')
+
+UNPAID_STATUSES = [PropertyFeeBill.BillStatus.PENDING, PropertyFeeBill.BillStatus.OVERDUE]
+
+
+def serialize_arrears(summary):
+    return {
+        'house_id': summary.house_id,
+        'outstanding_amount': str(summary.outstanding_amount),
+        'unpaid_count': summary.unpaid_count,
+        'overdue_count': summary.overdue_count,
+        'oldest_unpaid_period': summary.oldest_unpaid_period,
+    }
+
+
+def compute_arrears(house_ids):
+    """按账单表计算房屋欠费汇总，返回未保存的HouseArrears列表（没有欠费的房屋汇总为0）"""
+    summaries = {house_id: HouseArrears(house_id=house_id) for house_id in house_ids}
+    rows = PropertyFeeBill.objects.filter(house_id__in=summaries, status__in=UNPAID_STATUSES).values('house_id').annotate(
+        outstanding=Sum('amount'),
+        unpaid=Count('id'),
+        overdue=Count('id', filter=Q(status=PropertyFeeBill.BillStatus.OVERDUE)),
+        oldest=Min('billing_period'),
+    ).order_by()
+    for row in rows:
+        summary = summaries[row['house_id']]
+        summary.outstanding_amount = (row['outstanding'] or Decimal('0')).quantize(CENT)
+        summary.unpaid_count = row['unpaid']
+        summary.overdue_count = row['overdue']
+        summary.oldest_unpaid_period = row['oldest']
+    return list(summaries.values())
+
+
+def refresh_house_arrears(house_ids):
+    """重新汇总指定房屋的欠费并写入汇总表和缓存，在事务中调用时缓存于提交后更新"""
+    # 账单的house_id不是外键，只汇总实际存在的房屋
+    house_ids = set(House.objects.filter(id__in=set(house_ids)).values_list('id', flat=True))
+    if not house_ids:
+        return []
+    summaries = compute_arrears(house_ids)
+    # MySQL的ON DUPLICATE KEY UPDATE不能指定冲突字段
+    kwargs = {'unique_fields': ['house']} if connection.features.supports_update_conflicts_with_target else {}
+    HouseArrears.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        update_fields=['outstanding_amount', 'unpaid_count', 'overdue_count', 'oldest_unpaid_period', 'updated_at'],
+        **kwargs,
+    )
+    data = {ARREARS_CACHE_KEY.format(summary.house_id): serialize_arrears(summary) for summary in summaries}
+    transaction.on_commit(lambda: _cache_set_many(data))
+    return summaries
+
+
+def _cache_set_many(data):
+    try:
+        cache.set_many(data, ARREARS_CACHE_TIMEOUT)
+    except Exception:
+        logger.warning('写入欠费汇总缓存失败', exc_info=True)
+
+
+def get_house_arrears(house_ids):
+    """获取房屋欠费汇总，返回{house_id: 汇总字典}"""
+    house_ids = list(dict.fromkeys(house_ids))
+    if not house_ids:
+        return {}
+    try:
+        cached = cache.get_many([ARREARS_CACHE_KEY.format(house_id) for house_id in house_ids])
+    except Exception:
+        logger.warning('读取欠费汇总缓存失败，回退到数据库', exc_info=True)
+        cached = {}
+    result = {}
+    for house_id in house_ids:
+        value = cached.get(ARREARS_CACHE_KEY.format(house_id))
+        if value is not None:
+            result[house_id] = value
+
+    missing = [house_id for house_id in house_ids if house_id not in result]
+    if missing:
+        summaries = list(HouseArrears.objects.filter(house_id__in=missing))
+        found = {summary.house_id for summary in summaries}
+        # 汇总表中没有的房屋（例如上线前生成的账单）现场计算并补齐
+        absent = [house_id for house_id in missing if house_id not in found]
+        if absent:
+            summaries.extend(refresh_house_arrears(absent))
+        data = {}
+        for summary in summaries:
+            result[summary.house_id] = serialize_arrears(summary)
+            data[ARREARS_CACHE_KEY.format(summary.house_id)] = result[summary.house_id]
+        _cache_set_many(data)
+    return result
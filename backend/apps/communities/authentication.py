@@ -0,0 +1,50 @@
+"""
+门禁设备认证
+
+门禁设备不使用员工账号，而是各自持有一个随机令牌，请求时放在请求头中：
+    Authorization: Gate <令牌>
+数据库中只保存令牌的SHA-256摘要。认证通过后request.auth为GateDevice，request.user为匿名用户，
+因此设备令牌只能调用声明了IsGateDevice权限的门禁接口，无法访问其他需要登录的接口。
+"""
+import hashlib
+import secrets
+
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import authentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import GateDevice
+
+
+def hash_device_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_device_token(device):
+    """为设备生成新令牌（旧令牌随即失效），返回令牌明文，只在生成时可见"""
+    token = secrets.token_urlsafe(32)
+    device.token_hash = hash_device_token(token)
+    return token
+
+
+class GateDeviceAuthentication(authentication.BaseAuthentication):
+    """按Authorization: Gate <令牌>认证门禁设备"""
+    keyword = 'Gate'
+
+    def authenticate(self, request):
+        parts = authentication.get_authorization_header(request).split()
+        if not parts or parts[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(parts) != 2:
+            raise AuthenticationFailed('门禁设备令牌格式错误')
+        try:
+            token = parts[1].decode()
+        except UnicodeDecodeError:
+            raise AuthenticationFailed('门禁设备令牌格式错误')
+        device = GateDevice.objects.filter(token_hash=hash_device_token(token), is_active=True).first()
+        if device is None:
+            raise AuthenticationFailed('门禁设备令牌无效或已停用')
+        return AnonymousUser(), device
+
+    def authenticate_header(self, request):
+        return self.keyword
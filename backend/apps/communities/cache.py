@@ -0,0 +1,119 @@
+"""
+小区楼栋房屋树缓存
+
+居民绑定房产时依次选择小区、楼栋、单元、房号，需要整个小区的层级数据。
+这里为每个小区预先生成一份紧凑的JSON（房屋以[id, 房号]表示），连同ETag保存在Redis中，
+客户端携带If-None-Match时只需读取版本和ETag即可返回304，不读取整棵树。
+
+小区、楼栋、房屋保存或删除时（事务提交后）递增对应小区的版本号，只有该小区的树会在下次读取时重建；
+缓存中树的版本低于当前版本即视为过期，避免重建过程中发生的修改被旧数据覆盖。
+"""
+import hashlib
+import json
+import logging
+
+from django.core.cache import cache
+
+from .models import Building, Community, House
+
+logger = logging.getLogger(__name__)
+
+# 小区树版本号，修改时递增
+TREE_VERSION_KEY = 'communities:tree_version:{}'
+# (版本号, ETag)
+TREE_ETAG_KEY = 'communities:tree_etag:{}'
+# 序列化后的树
+TREE_CACHE_KEY = 'communities:tree:{}'
+# 树缓存的过期时间（秒），版本号不过期
+TREE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def build_tree(community_id):
+    """从数据库生成小区树，返回JSON字节串，小区不存在时返回None"""
+    community = Community.objects.filter(pk=community_id).values('id', 'name').first()
+    if community is None:
+        return None
+
+    buildings = []
+    building_map = {}
+    for building in Building.objects.filter(community_id=community_id).order_by('name', 'id').values('id', 'name'):
+        node = {'id': building['id'], 'name': building['name'], 'units': []}
+        building_map[building['id']] = (node, {})
+        buildings.append(node)
+
+    houses = House.objects.filter(building__community_id=community_id).order_by(
+        'building_id', 'unit', 'number').values_list('id', 'building_id', 'unit', 'number')
+    for house_id, building_id, unit, number in houses.iterator(chunk_size=5000):
+        node, units = building_map[building_id]
+        unit_node = units.get(unit)
+        if unit_node is None:
+            unit_node = units[unit] = {'unit': unit, 'houses': []}
+            node['units'].append(unit_node)
+        unit_node['houses'].append([house_id, number])
+
+    community['buildings'] = buildings
+    return json.dumps(community, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def make_etag(data):
+    return '"{}"'.format(hashlib.sha1(data).hexdigest()[:20])
+
+
+def _get_version(community_id):
+    return cache.get(TREE_VERSION_KEY.format(community_id)) or 0
+
+
+def get_tree_etag(community_id):
+    """读取当前有效的ETag（一次Redis往返），缓存过期或不存在时返回None"""
+    try:
+        values = cache.get_many([TREE_VERSION_KEY.format(community_id), TREE_ETAG_KEY.format(community_id)])
+    except Exception:
+        logger.warning('读取小区树缓存失败', exc_info=True)
+        return None
+    version = values.get(TREE_VERSION_KEY.format(community_id)) or 0
+    cached = values.get(TREE_ETAG_KEY.format(community_id))
+    if cached is None or cached[0] != version:
+        return None
+    return cached[1]
+
+
+def get_tree(community_id):
+    """获取小区树，返回(JSON字节串, ETag)，小区不存在时返回(None, None)"""
+    try:
+        version = _get_version(community_id)
+        values = cache.get_many([TREE_ETAG_KEY.format(community_id), TREE_CACHE_KEY.format(community_id)])
+    except Exception:
+        logger.warning('读取小区树缓存失败，回退到数据库', exc_info=True)
+        data = build_tree(community_id)
+        return data, data and make_etag(data)
+
+    cached = values.get(TREE_ETAG_KEY.format(community_id))
+    data = values.get(TREE_CACHE_KEY.format(community_id))
+    if cached is not None and data is not None and cached[0] == version:
+        return data, cached[1]
+
+    data = build_tree(community_id)
+    if data is None:
+        return None, None
+    etag = make_etag(data)
+    try:
+        cache.set_many({
+            TREE_ETAG_KEY.format(community_id): (version, etag),
+            TREE_CACHE_KEY.format(community_id): data,
+        }, TREE_CACHE_TIMEOUT)
+    except Exception:
+        logger.warning('写入小区树缓存失败', exc_info=True)
+    return data, etag
+
+
+def invalidate_tree(community_id):
+    """递增小区树版本号，使已缓存的树和ETag失效"""
+    key = TREE_VERSION_KEY.format(community_id)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # 版本号不存在（首次修改或缓存被清空）
+            cache.set(key, 1, None)
+    except Exception:
+        logger.warning('更新小区树版本失败', exc_info=True)
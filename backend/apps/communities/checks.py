@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core import checks
+
+from apps.common.serializers import check_serializer_fields
+
+
+@checks.register()
+def check_communities_serializers(app_configs=None, **kwargs):
+    """启动时核对communities序列化器字段与模型是否一致"""
+    from .serializers import MODEL_SERIALIZERS
+    return check_serializer_fields(MODEL_SERIALIZERS, 'communities')
+
+
+@checks.register(checks.Tags.security)
+def check_visitor_pass_keys(app_configs=None, **kwargs):
+    """离线通行证签名密钥会下发到门禁设备，不能与SECRET_KEY相同"""
+    keys = settings.VISITOR_PASS_KEYS
+    if settings.SECRET_KEY in keys.values():
+        return [checks.Error(
+            'VISITOR_PASS_KEYS中的签名密钥与SECRET_KEY相同',
+            hint='门禁设备持有签名密钥，请通过VISITOR_PASS_KEY配置独立的密钥',
+            id='communities.E002',
+        )]
+    if not keys.get(settings.VISITOR_PASS_KEY_ID):
+        return [checks.Warning(
+            '未配置VISITOR_PASS_KEY，离线通行证令牌已停用',
+            id='communities.W001',
+        )]
+    return []
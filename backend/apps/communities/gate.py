@@ -0,0 +1,200 @@
+"""
+门禁核验访客通行证
+
+当前有效（active且未过期）的通行证以通行码为键缓存在Redis中，过期时间与通行证的结束时间一致，
+构成“有效通行证热集合”：扫码时先从热集合取得通行证，再用一条带条件的UPDATE
+（status='active'且在有效期内）原子地标记为已使用，并发扫同一个码只有一次成功。
+热集合未命中时回退到pass_code唯一索引查询。
+
+门禁设备只能核验所属小区的通行证：热集合中同时缓存通行证房屋所在的小区，其他小区的通行码按无效处理。
+另外为离线门禁设备签发签名令牌（见offline_pass），并按小区提供吊销列表和扫码记录批量上传。
+"""
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from . import offline_pass
+from .models import GateScanLog, House, VisitorPass
+
+logger = logging.getLogger(__name__)
+
+PASS_CACHE_KEY = 'communities:visitor_pass:{}'
+
+# 核验结果
+RESULT_OK = 'ok'
+RESULT_NOT_FOUND = 'not_found'
+RESULT_NOT_STARTED = 'not_started'
+RESULT_EXPIRED = 'expired'
+RESULT_UNAVAILABLE = 'unavailable'
+
+RESULT_MESSAGES = {
+    RESULT_OK: '核验通过',
+    RESULT_NOT_FOUND: '通行码无效',
+    RESULT_NOT_STARTED: '通行证尚未生效',
+    RESULT_EXPIRED: '通行证已过期',
+    RESULT_UNAVAILABLE: '通行证已使用或已取消',
+}
+
+
+def serialize_pass(visitor_pass):
+    return {
+        'id': visitor_pass['id'],
+        'house_id': visitor_pass['house_id'],
+        'community_id': visitor_pass['community_id'],
+        'visitor_name': visitor_pass['visitor_name'],
+        'valid_from': visitor_pass['valid_from'].timestamp(),
+        'valid_to': visitor_pass['valid_to'].timestamp(),
+    }
+
+
+def _pass_values(queryset, *fields):
+    """通行证字典行，附带房屋所在的小区id（house_id不是外键，用子查询取得）"""
+    community = House.objects.filter(pk=OuterRef('house_id')).values('building__community_id')[:1]
+    return queryset.annotate(community_id=Subquery(community)).values(
+        'id', 'house_id', 'community_id', 'visitor_name', 'valid_from', 'valid_to', *fields)
+
+
+def _community_houses(community_id):
+    return House.objects.filter(building__community_id=community_id).values('id')
+
+
+def publish_pass(visitor_pass):
+    """通行证有效时加入热集合，否则移出"""
+    key = PASS_CACHE_KEY.format(visitor_pass.pass_code)
+    timeout = int((visitor_pass.valid_to - timezone.now()).total_seconds()) + 1
+    try:
+        if visitor_pass.status == VisitorPass.PassStatus.ACTIVE and timeout > 0:
+            cache.set(key, serialize_pass({
+                'id': visitor_pass.id,
+                'house_id': visitor_pass.house_id,
+                'community_id': House.objects.filter(pk=visitor_pass.house_id).values_list(
+                    'building__community_id', flat=True).first(),
+                'visitor_name': visitor_pass.visitor_name,
+                'valid_from': visitor_pass.valid_from,
+                'valid_to': visitor_pass.valid_to,
+            }), timeout)
+        else:
+            cache.delete(key)
+    except Exception:
+        logger.warning('更新通行证热集合失败', exc_info=True)
+
+
+def _load_pass(pass_code):
+    key = PASS_CACHE_KEY.format(pass_code)
+    try:
+        data = cache.get(key)
+    except Exception:
+        logger.warning('读取通行证热集合失败，回退到数据库', exc_info=True)
+        data = None
+    if data is not None:
+        return data
+    row = _pass_values(VisitorPass.objects.filter(pass_code=pass_code)).first()
+    return serialize_pass(row) if row else None
+
+
+def verify_pass(pass_code, now=None, community_id=None):
+    """核验并使用通行证，返回(结果, 通行证字典或None)，指定community_id时只接受该小区的通行证"""
+    now = now or timezone.now()
+    data = _load_pass(pass_code)
+    if data is None or (community_id is not None and data['community_id'] != community_id):
+        return RESULT_NOT_FOUND, None
+
+    timestamp = now.timestamp()
+    if timestamp < data['valid_from']:
+        return RESULT_NOT_STARTED, data
+    if timestamp > data['valid_to']:
+        return RESULT_EXPIRED, data
+
+    used = VisitorPass.objects.filter(
+        pk=data['id'], status=VisitorPass.PassStatus.ACTIVE, valid_from__lte=now, valid_to__gte=now,
+    ).update(status=VisitorPass.PassStatus.USED)
+    try:
+        cache.delete(PASS_CACHE_KEY.format(pass_code))
+    except Exception:
+        logger.warning('移出通行证热集合失败', exc_info=True)
+    return (RESULT_OK if used else RESULT_UNAVAILABLE), data
+
+
+def warm_passes(batch_size=1000):
+    """将当前有效的通行证全部载入热集合（Redis清空或部署后执行），返回载入数量"""
+    now = timezone.now()
+    count = 0
+    batch = {}
+    passes = _pass_values(VisitorPass.objects.filter(status=VisitorPass.PassStatus.ACTIVE, valid_to__gt=now),
+                          'pass_code')
+    for row in passes.iterator(chunk_size=batch_size):
+        batch[row['pass_code']] = row
+        if len(batch) >= batch_size:
+            count += _publish_many(batch, now)
+            batch = {}
+    if batch:
+        count += _publish_many(batch, now)
+    return count
+
+
+def _publish_many(rows, now):
+    # 按剩余有效期（向上取整到分钟）分组，每组一次set_many写入；多保留的几十秒由核验时的有效期检查兜底
+    groups = {}
+    for pass_code, row in rows.items():
+        timeout = (int((row['valid_to'] - now).total_seconds()) // 60 + 1) * 60
+        groups.setdefault(timeout, {})[PASS_CACHE_KEY.format(pass_code)] = serialize_pass(row)
+    for timeout, data in groups.items():
+        cache.set_many(data, timeout)
+    return len(rows)
+
+
+def offline_pass_enabled():
+    """是否配置了离线通行证签名密钥"""
+    return bool(settings.VISITOR_PASS_KEYS.get(settings.VISITOR_PASS_KEY_ID))
+
+
+def sign_pass(visitor_pass):
+    """为通行证签发离线核验令牌（二维码内容），未配置签名密钥时抛出ImproperlyConfigured"""
+    if not offline_pass_enabled():
+        raise ImproperlyConfigured('未配置VISITOR_PASS_KEY，离线通行证令牌已停用')
+    key_id = settings.VISITOR_PASS_KEY_ID
+    return offline_pass.encode_token(
+        key_id, settings.VISITOR_PASS_KEYS[key_id], visitor_pass.id, visitor_pass.house_id,
+        visitor_pass.valid_from.timestamp(), visitor_pass.valid_to.timestamp(),
+    )
+
+
+def get_revoked_pass_ids(community_id, now=None):
+    """门禁设备的吊销列表：设备所在小区已使用或已取消、且尚未过期的通行证id"""
+    now = now or timezone.now()
+    return list(VisitorPass.objects.filter(
+        status__in=[VisitorPass.PassStatus.USED, VisitorPass.PassStatus.CANCELLED], valid_to__gt=now,
+        house_id__in=_community_houses(community_id),
+    ).values_list('id', flat=True))
+
+
+def record_scans(gate_id, community_id, scans):
+    """
+    保存门禁设备批量上传的扫码记录，本地核验通过的通行证一次UPDATE标记为已使用（只限设备所在小区），
+    scans为[{'pass_id', 'scanned_at'(Unix秒), 'result'}]，返回新标记为已使用的通行证数
+    """
+    if not scans:
+        return 0
+    with transaction.atomic():
+        GateScanLog.objects.bulk_create([
+            GateScanLog(pass_id=scan['pass_id'], gate_id=gate_id, result=scan['result'],
+                        scanned_at=datetime.fromtimestamp(scan['scanned_at'], tz=dt_timezone.utc))
+            for scan in scans
+        ], ignore_conflicts=True)
+        pass_ids = {scan['pass_id'] for scan in scans if scan['result'] == offline_pass.RESULT_OK}
+        passes = VisitorPass.objects.filter(id__in=pass_ids, house_id__in=_community_houses(community_id))
+        used = passes.filter(status=VisitorPass.PassStatus.ACTIVE).update(status=VisitorPass.PassStatus.USED)
+        codes = passes.values_list('pass_code', flat=True)
+        keys = [PASS_CACHE_KEY.format(code) for code in codes]
+    # 在线核验的热集合中同样移出
+    try:
+        cache.delete_many(keys)
+    except Exception:
+        logger.warning('移出通行证热集合失败', exc_info=True)
+    return used
@@ -0,0 +1,219 @@
+"""
+小区楼栋房屋批量导入
+
+逐行流式读取CSV/Excel文件，按批处理：
+- 小区、楼栋在进程内以字典缓存，每批只对新出现的名称各查询一次，缺失的楼栋批量创建；
+- 房屋主键按批一次性分配号段；
+- 房屋以bulk_create(ignore_conflicts=True)写入，(楼栋, 单元, 房号)已存在的行直接跳过，
+  因此同一文件可以重复导入；
+- 导入结束后按房屋表统计涉及楼栋的单元数，楼栋的新单元可能出现在后续批次或之后的导入中。
+内存占用只与批大小和楼栋数量有关，与文件行数无关。
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count
+
+from apps.common.ids import allocate_ids
+from .cache import invalidate_tree
+from .models import Building, Community, House
+
+# 表头别名 -> 字段名
+HEADER_ALIASES = {
+    'community': 'community', '小区': 'community', '小区名称': 'community',
+    'building': 'building', '楼栋': 'building', '楼栋名称': 'building',
+    'unit': 'unit', '单元': 'unit', '单元号': 'unit',
+    'number': 'number', '房号': 'number',
+    'area': 'area', '面积': 'area', '建筑面积': 'area',
+    'owner_name': 'owner_name', '业主': 'owner_name', '业主姓名': 'owner_name',
+}
+REQUIRED_COLUMNS = ('building', 'unit', 'number', 'area')
+
+
+class LayoutImportError(Exception):
+    """文件格式错误，无法继续导入"""
+
+
+class RowError(Exception):
+    """单行数据校验失败"""
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Excel中的纯数字单元格读出来是浮点数
+        value = int(value)
+    return str(value).strip()
+
+
+def read_rows(f, file_format):
+    """逐行读取文件，返回(行号, {字段: 值})的迭代器"""
+    if file_format == 'xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise LayoutImportError('导入Excel文件需要安装openpyxl')
+        workbook = load_workbook(f, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    else:
+        if isinstance(f.read(0), bytes):
+            f = io.TextIOWrapper(f, encoding='utf-8-sig', newline='')
+        rows = csv.reader(f)
+
+    header = next(rows, None)
+    if not header:
+        raise LayoutImportError('文件为空')
+    columns = [HEADER_ALIASES.get(_clean(name).lower()) for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise LayoutImportError(f'缺少列: {", ".join(missing)}')
+
+    for line_no, values in enumerate(rows, start=2):
+        row = {column: _clean(value) for column, value in zip(columns, values) if column}
+        if any(row.values()):
+            yield line_no, row
+
+
+class LayoutImporter:
+    """小区楼栋房屋导入器，供管理命令和上传接口共用"""
+
+    def __init__(self, community=None, batch_size=1000, dry_run=False):
+        # 指定community时文件中可以没有小区列
+        self.default_community = community
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.communities = {}
+        self.buildings = {}
+        self.total = 0
+        self.valid = 0
+        self.created = 0
+        self.errors = []
+
+    def run(self, rows, progress=None):
+        """导入read_rows返回的行，progress为每批完成后的回调"""
+        if self.default_community is not None:
+            self.communities[self.default_community.name] = self.default_community.id
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.total += len(batch)
+            self.import_batch(batch)
+            if progress:
+                progress(self)
+        if not self.dry_run:
+            self.update_unit_counts()
+        # bulk_create不触发信号，导入结束后统一使涉及小区的房屋树失效
+        for community_id in {community_id for community_id, _ in self.buildings}:
+            invalidate_tree(community_id)
+        return self
+
+    @property
+    def skipped(self):
+        """已存在而跳过的房屋数"""
+        return self.valid - self.created
+
+    def import_batch(self, batch):
+        self.resolve_communities({row.get('community') for _, row in batch if row.get('community')})
+
+        parsed = []
+        for line_no, row in batch:
+            try:
+                parsed.append(self.validate_row(row))
+            except RowError as exc:
+                self.errors.append((line_no, row, str(exc)))
+        if not parsed:
+            return
+
+        # 同一楼栋+单元+房号在文件中重复时以首次出现的为准
+        houses = {}
+        for community_id, building_name, unit, number, area, owner_name in parsed:
+            houses.setdefault((community_id, building_name, unit, number), (area, owner_name))
+        self.valid += len(houses)
+        if self.dry_run:
+            return
+
+        with transaction.atomic():
+            self.resolve_buildings(houses)
+            building_ids = {self.buildings[(key[0], key[1])] for key in houses}
+            before = House.objects.filter(building_id__in=building_ids).count()
+            ids = iter(allocate_ids(House, len(houses)))
+            House.objects.bulk_create([
+                House(id=next(ids), building_id=self.buildings[(community_id, building_name)],
+                      unit=unit, number=number, area=area, owner_name=owner_name)
+                for (community_id, building_name, unit, number), (area, owner_name) in houses.items()
+            ], ignore_conflicts=True)
+            self.created += House.objects.filter(building_id__in=building_ids).count() - before
+
+    def update_unit_counts(self, chunk_size=1000):
+        """按房屋表中的不同单元数更新涉及楼栋的unit_count，只增不减（楼栋可能有尚未录入房屋的单元）"""
+        building_ids = list(self.buildings.values())
+        for start in range(0, len(building_ids), chunk_size):
+            counts = {}
+            rows = (House.objects.filter(building_id__in=building_ids[start:start + chunk_size])
+                    .values('building_id').annotate(units=Count('unit', distinct=True))
+                    .values_list('building_id', 'units'))
+            for building_id, units in rows:
+                counts.setdefault(units, []).append(building_id)
+            # 单元数相同的楼栋一次UPDATE
+            for units, ids in counts.items():
+                Building.objects.filter(id__in=ids, unit_count__lt=units).update(unit_count=units)
+
+    def resolve_communities(self, names):
+        """小区只查找不创建（创建小区需要地址、收费标准等信息）"""
+        missing = names - self.communities.keys()
+        if missing:
+            self.communities.update(Community.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    def resolve_buildings(self, houses):
+        """查找本批涉及的楼栋，不存在的批量创建"""
+        units = {}
+        for community_id, building_name, unit, _ in houses:
+            units.setdefault((community_id, building_name), set()).add(unit)
+        missing = units.keys() - self.buildings.keys()
+        if not missing:
+            return
+
+        community_ids = {community_id for community_id, _ in missing}
+        names = {name for _, name in missing}
+        Building.objects.bulk_create([
+            Building(community_id=community_id, name=name, unit_count=len(units[(community_id, name)]))
+            for community_id, name in missing
+        ], ignore_conflicts=True)
+        for building_id, community_id, name in Building.objects.filter(
+                community_id__in=community_ids, name__in=names).values_list('id', 'community_id', 'name'):
+            if (community_id, name) in missing:
+                self.buildings[(community_id, name)] = building_id
+
+    def validate_row(self, row):
+        community_name = row.get('community')
+        if community_name:
+            community_id = self.communities.get(community_name)
+            if community_id is None:
+                raise RowError(f'小区不存在: {community_name}')
+        elif self.default_community is not None:
+            community_id = self.default_community.id
+        else:
+            raise RowError('缺少小区名称')
+
+        building_name, unit, number = row.get('building'), row.get('unit'), row.get('number')
+        if not building_name or not unit or not number:
+            raise RowError('楼栋、单元、房号不能为空')
+        if len(building_name) > 32 or len(unit) > 10 or len(number) > 10:
+            raise RowError('楼栋名称不超过32个字符，单元号、房号不超过10个字符')
+
+        try:
+            area = Decimal(row.get('area')).quantize(Decimal('0.01'))
+        except (InvalidOperation, TypeError):
+            raise RowError(f'面积格式错误: {row.get("area")}')
+        if area <= 0 or area >= Decimal('1000000'):
+            raise RowError(f'面积超出范围: {area}')
+
+        owner_name = row.get('owner_name') or None
+        if owner_name and len(owner_name) > 64:
+            raise RowError('业主姓名不超过64个字符')
+        return community_id, building_name, unit, number, area, owner_name
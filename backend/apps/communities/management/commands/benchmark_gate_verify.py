@@ -0,0 +1,55 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.common.ids import allocate_ids
+from apps.common.redis_client import get_redis_client
+from apps.communities.gate import RESULT_OK, verify_pass, warm_passes
+from apps.communities.models import VisitorPass
+
+
+class Command(BaseCommand):
+    """测量门禁核验的单次耗时（在事务中生成测试通行证，结束后回滚）"""
+    help = '报告门禁核验访客通行证的平均及P99耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--passes', type=int, default=2000, help='核验的通行证数量')
+        parser.add_argument('--threshold-ms', type=float, default=5.0, help='允许的P99耗时（毫秒）')
+
+    def handle(self, *args, **options):
+        count = options['passes']
+        now = timezone.now()
+        with transaction.atomic():
+            ids = allocate_ids(VisitorPass, count)
+            passes = [
+                VisitorPass(id=pass_id, user_id=0, house_id=0, visitor_name='压测访客', visitor_phone='',
+                            pass_code=uuid.uuid4().hex, valid_from=now - timedelta(hours=1),
+                            valid_to=now + timedelta(hours=1))
+                for pass_id in ids
+            ]
+            VisitorPass.objects.bulk_create(passes, batch_size=500)
+            warm_passes()
+
+            timings = []
+            failed = 0
+            for visitor_pass in passes:
+                start = time.perf_counter()
+                result, _ = verify_pass(visitor_pass.pass_code)
+                timings.append(time.perf_counter() - start)
+                failed += result != RESULT_OK
+            transaction.set_rollback(True)
+
+        timings.sort()
+        mean = sum(timings) / len(timings) * 1000
+        p99 = timings[int(len(timings) * 0.99) - 1] * 1000
+        backend = 'redis' if get_redis_client() is not None else 'local'
+        self.stdout.write(f'缓存后端: {backend}，核验: {count}次，失败: {failed}，吞吐: {count / sum(timings):.0f}次/秒')
+        self.stdout.write(f'平均: {mean:.3f}ms，P50: {timings[len(timings) // 2] * 1000:.3f}ms，P99: {p99:.3f}ms')
+        if p99 < options['threshold_ms']:
+            self.stdout.write(self.style.SUCCESS(f'P99低于{options["threshold_ms"]}ms'))
+        else:
+            self.stdout.write(self.style.WARNING(f'P99超过{options["threshold_ms"]}ms'))
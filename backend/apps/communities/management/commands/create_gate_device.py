@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.communities.authentication import issue_device_token
+from apps.communities.models import Community, GateDevice
+
+
+class Command(BaseCommand):
+    """
+    登记门禁设备并生成设备令牌，设备已存在时重新生成令牌（旧令牌随即失效）
+
+    令牌只在生成时输出一次，配置到设备后通过Authorization: Gate <令牌>调用门禁接口。
+    """
+    help = '登记门禁设备并生成设备令牌'
+
+    def add_arguments(self, parser):
+        parser.add_argument('gate_id', help='门禁设备编号')
+        parser.add_argument('community_id', type=int, help='设备所属小区id')
+
+    def handle(self, *args, **options):
+        community = Community.objects.filter(pk=options['community_id']).first()
+        if community is None:
+            raise CommandError(f'小区不存在: {options["community_id"]}')
+        device = GateDevice.objects.filter(gate_id=options['gate_id']).first()
+        if device is None:
+            device = GateDevice(gate_id=options['gate_id'])
+        device.community = community
+        device.is_active = True
+        token = issue_device_token(device)
+        device.save()
+        self.stdout.write(token)
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from apps.communities.billing import BillingError, generate_bills, validate_period
+from apps.communities.models import Community
+
+
+class Command(BaseCommand):
+    """按账期批量生成物业费账单，已生成的账单跳过，可重复执行"""
+    help = '为小区生成指定账期的物业费账单'
+
+    def add_arguments(self, parser):
+        parser.add_argument('period', help='账期，格式YYYY-MM')
+        parser.add_argument('--community', action='append', help='小区id或名称，可指定多次，默认全部小区')
+        parser.add_argument('--due-date', type=date.fromisoformat, help='缴费截止日期（YYYY-MM-DD），默认账期最后一天')
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批处理的房屋数')
+
+    def handle(self, *args, **options):
+        try:
+            period = validate_period(options['period'])
+        except BillingError as exc:
+            raise CommandError(str(exc))
+
+        communities = Community.objects.order_by('id')
+        if options['community']:
+            ids = [value for value in options['community'] if value.isdigit()]
+            names = [value for value in options['community'] if not value.isdigit()]
+            communities = list(communities.filter(Q(pk__in=ids) | Q(name__in=names)))
+            if len(communities) < len(set(options['community'])):
+                raise CommandError('部分小区不存在')
+
+        for community in communities:
+            run = generate_bills(community, period, due_date=options['due_date'], batch_size=options['batch_size'])
+            self.stdout.write(
+                f'{community.name}: 房屋{run.house_count}户，新生成{run.created_count}张，'
+                f'已存在{run.skipped_count}张，金额{run.total_amount}元，耗时{run.duration:.2f}秒'
+            )
+        self.stdout.write(self.style.SUCCESS(f'{period}账单生成完成'))
@@ -0,0 +1,73 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.communities.importers import LayoutImportError, LayoutImporter, read_rows
+from apps.communities.models import Community
+
+
+class Command(BaseCommand):
+    """
+    批量导入小区的楼栋、单元、房屋
+
+    列：community（小区名称，指定--community时可省略）, building, unit, number, area, owner_name，
+    也支持中文表头（小区、楼栋、单元、房号、面积、业主）。
+    小区需预先创建，楼栋不存在时自动创建，已存在的房屋跳过，可重复执行。
+    """
+    help = '从CSV或Excel文件导入小区楼栋房屋'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV或xlsx文件路径')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], help='文件格式，默认按扩展名判断')
+        parser.add_argument('--community', help='文件中未指定小区时导入到该小区（id或名称）')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批处理的行数')
+        parser.add_argument('--errors-file', help='将出错行写入该CSV文件')
+        parser.add_argument('--dry-run', action='store_true', help='只校验不写入')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('xlsx' if path.endswith('.xlsx') else 'csv')
+        community = self.get_community(options['community']) if options['community'] else None
+        importer = LayoutImporter(community, batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        start = time.perf_counter()
+
+        def progress(importer):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'已处理{importer.total}行，新增{importer.created}户，'
+                              f'错误{len(importer.errors)}行，{importer.total / elapsed:.0f}行/秒')
+
+        if file_format == 'xlsx':
+            f = open(path, 'rb')
+        else:
+            f = open(path, encoding='utf-8-sig', newline='')
+        with f:
+            try:
+                importer.run(read_rows(f, file_format), progress=progress)
+            except LayoutImportError as exc:
+                raise CommandError(str(exc))
+
+        elapsed = time.perf_counter() - start
+        for line_no, row, message in importer.errors:
+            self.stderr.write(f'第{line_no}行: {message}')
+        if options['errors_file'] and importer.errors:
+            with open(options['errors_file'], 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['line', 'error', 'row'])
+                for line_no, row, message in importer.errors:
+                    writer.writerow([line_no, message, json.dumps(row, ensure_ascii=False)])
+
+        summary = (f'共{importer.total}行，新增{importer.created}户，已存在{importer.skipped}户，'
+                   f'错误{len(importer.errors)}行，耗时{elapsed:.1f}秒')
+        if options['dry_run']:
+            summary = f'[dry-run] 共{importer.total}行，有效{importer.valid}户，错误{len(importer.errors)}行'
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def get_community(self, value):
+        lookup = {'id': value} if value.isdigit() else {'name': value}
+        try:
+            return Community.objects.get(**lookup)
+        except Community.DoesNotExist:
+            raise CommandError(f'小区不存在: {value}')
@@ -0,0 +1,62 @@
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.communities.overdue import sweep_overdue_bills
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    将过了缴费截止日期仍未支付的账单标记为逾期
+
+    默认执行一次后退出，适合cron；--loop时作为常驻进程按--interval秒循环执行，
+    收到SIGTERM/SIGINT后在当前一轮结束后退出。可在多个节点上同时运行。
+    """
+    help = '扫描并标记逾期的物业费账单'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='每个主键区间的大小')
+        parser.add_argument('--loop', action='store_true', help='常驻运行，按间隔循环扫描')
+        parser.add_argument('--interval', type=float, default=300, help='循环扫描的间隔（秒）')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if options['loop']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        while True:
+            if not options['loop']:
+                self.run_once(options['chunk_size'])
+                break
+            try:
+                self.run_once(options['chunk_size'])
+            except Exception:
+                # 常驻模式下单轮失败（如数据库短暂不可用）不退出，下一轮重试
+                logger.exception('逾期账单扫描失败')
+            deadline = time.monotonic() + options['interval']
+            while not self.stopping and time.monotonic() < deadline:
+                time.sleep(min(1, deadline - time.monotonic()))
+            if self.stopping:
+                break
+            # 常驻进程中及时释放超时的数据库连接
+            close_old_connections()
+
+    def run_once(self, chunk_size):
+        start = time.perf_counter()
+        result = sweep_overdue_bills(chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        for community_id, count in sorted(result.community_counts.items()):
+            self.stdout.write(f'小区{community_id}: 逾期{count}张')
+        self.stdout.write(self.style.SUCCESS(
+            f'本轮逾期{result.overdue_count}张，通知{result.notified_count}人，'
+            f'{result.chunks}个区间，耗时{elapsed:.2f}秒'
+        ))
+
+    def stop(self, signum, frame):
+        self.stopping = True
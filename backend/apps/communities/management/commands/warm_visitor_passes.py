@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.communities.gate import warm_passes
+
+
+class Command(BaseCommand):
+    """将当前有效的访客通行证载入门禁热集合，Redis清空或部署后执行"""
+    help = '预热门禁访客通行证热集合'
+
+    def handle(self, *args, **options):
+        count = warm_passes()
+        self.stdout.write(self.style.SUCCESS(f'已载入{count}张有效通行证'))
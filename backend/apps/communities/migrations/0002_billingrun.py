@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-17 12:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('communities', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('billing_period', models.CharField(help_text='格式：YYYY-MM', max_length=7, verbose_name='账期')),
+                ('status', models.CharField(choices=[('running', '进行中'), ('success', '成功'), ('failed', '失败')], default='running', max_length=20, verbose_name='状态')),
+                ('house_count', models.IntegerField(default=0, verbose_name='房屋数')),
+                ('created_count', models.IntegerField(default=0, verbose_name='新生成账单数')),
+                ('skipped_count', models.IntegerField(default=0, verbose_name='已存在账单数')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='新生成账单总金额')),
+                ('duration', models.FloatField(default=0, help_text='秒', verbose_name='耗时')),
+                ('error', models.TextField(blank=True, default='', verbose_name='错误信息')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('community', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='billing_runs', to='communities.community', verbose_name='小区')),
+                ('triggered_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='触发人')),
+            ],
+            options={
+                'verbose_name': '账单生成记录',
+                'verbose_name_plural': '账单生成记录',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0002_billingrun'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='propertyfeebill',
+            index=models.Index(fields=['status', 'due_date'], name='fee_bill_status_due_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-17 12:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0003_fee_bill_status_due_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HouseArrears',
+            fields=[
+                ('house', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='arrears', serialize=False, to='communities.house', verbose_name='房屋')),
+                ('outstanding_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='欠费金额')),
+                ('unpaid_count', models.IntegerField(default=0, verbose_name='未支付账单数')),
+                ('overdue_count', models.IntegerField(default=0, verbose_name='逾期账单数')),
+                ('oldest_unpaid_period', models.CharField(blank=True, max_length=7, null=True, verbose_name='最早未支付账期')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '房屋欠费汇总',
+                'verbose_name_plural': '房屋欠费汇总',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0004_housearrears'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userhouse',
+            index=models.Index(fields=['status', 'house'], name='user_house_status_house_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-17 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0005_user_house_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True, verbose_name='geohash'),
+        ),
+        migrations.AddField(
+            model_name='community',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='纬度'),
+        ),
+        migrations.AddField(
+            model_name='community',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='经度'),
+        ),
+    ]
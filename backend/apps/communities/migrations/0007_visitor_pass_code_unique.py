@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 12:38
+
+import apps.communities.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0006_coordinates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='visitorpass',
+            name='pass_code',
+            field=models.CharField(default=apps.communities.models.generate_pass_code, max_length=32, unique=True, verbose_name='唯一的通行二维码内容'),
+        ),
+    ]
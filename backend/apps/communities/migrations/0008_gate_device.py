@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-17 14:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0007_visitor_pass_code_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GateDevice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gate_id', models.CharField(max_length=64, unique=True, verbose_name='门禁设备编号')),
+                ('token_hash', models.CharField(help_text='设备令牌的SHA-256，令牌本身不保存', max_length=64, unique=True, verbose_name='令牌摘要')),
+                ('is_active', models.BooleanField(default=True, verbose_name='是否启用')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('community', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gate_devices', to='communities.community', verbose_name='小区')),
+            ],
+            options={
+                'verbose_name': '门禁设备',
+                'verbose_name_plural': '门禁设备',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0008_gate_device'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GateScanLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pass_id', models.BigIntegerField(verbose_name='通行证ID')),
+                ('gate_id', models.CharField(max_length=64, verbose_name='门禁设备编号')),
+                ('result', models.CharField(max_length=20, verbose_name='本地核验结果')),
+                ('scanned_at', models.DateTimeField(verbose_name='扫码时间')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True, verbose_name='上传时间')),
+            ],
+            options={
+                'verbose_name': '门禁扫码记录',
+                'verbose_name_plural': '门禁扫码记录',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='visitorpass',
+            index=models.Index(fields=['status', 'valid_to'], name='visitor_pass_status_to_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='gatescanlog',
+            unique_together={('gate_id', 'pass_id', 'scanned_at')},
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
+from apps.common import geo
 from apps.users.models import User
 import uuid
 
@@ -10,6 +11,9 @@ class Community(models.Model):
     address = models.CharField(_('地址'), max_length=200)
     property_phone = models.CharField(_('物业电话'), max_length=20)
     fee_standard = models.DecimalField(_('物业费标准'), max_digits=10, decimal_places=2, help_text='元/平米')
+    latitude = models.DecimalField(_('纬度'), max_digits=9, decimal_places=6, blank=True, null=True)
+    longitude = models.DecimalField(_('经度'), max_digits=9, decimal_places=6, blank=True, null=True)
+    geohash = models.CharField(_('geohash'), max_length=12, blank=True, null=True, db_index=True, editable=False)
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
     updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
     
@@ -20,6 +24,14 @@ class Community(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        # 经纬度变化时同步geohash
+        self.geohash = geo.encode_point(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
 
 
 class Building(models.Model):
@@ -89,6 +101,10 @@ class UserHouse(models.Model):
         verbose_name = _('用户房产绑定')
         verbose_name_plural = _('用户房产绑定')
         unique_together = ('user', 'house')
+        indexes = [
+            # 审核队列：按状态筛选，再按房屋（小区、楼栋）排序或过滤
+            models.Index(fields=['status', 'house'], name='user_house_status_house_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.username} - {self.house}'
@@ -115,11 +131,66 @@ class PropertyFeeBill(models.Model):
         verbose_name = _('物业费账单')
         verbose_name_plural = _('物业费账单')
         unique_together = ('house_id', 'billing_period')
+        indexes = [
+            # 逾期扫描：status='pending' AND due_date < today
+            models.Index(fields=['status', 'due_date'], name='fee_bill_status_due_idx'),
+        ]
     
     def __str__(self):
         return f'{self.billing_period} 账单 - {self.amount}元'
 
 
+class HouseArrears(models.Model):
+    """房屋欠费汇总表，由账单生成、支付、逾期扫描时增量维护"""
+    house = models.OneToOneField(House, on_delete=models.CASCADE, primary_key=True, related_name='arrears', verbose_name=_('房屋'))
+    outstanding_amount = models.DecimalField(_('欠费金额'), max_digits=12, decimal_places=2, default=0)
+    unpaid_count = models.IntegerField(_('未支付账单数'), default=0)
+    overdue_count = models.IntegerField(_('逾期账单数'), default=0)
+    oldest_unpaid_period = models.CharField(_('最早未支付账期'), max_length=7, blank=True, null=True)
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('房屋欠费汇总')
+        verbose_name_plural = _('房屋欠费汇总')
+    
+    def __str__(self):
+        return f'{self.house_id} 欠费{self.outstanding_amount}元'
+
+
+class BillingRun(models.Model):
+    """物业费账单生成记录表"""
+    class RunStatus(models.TextChoices):
+        RUNNING = 'running', _('进行中')
+        SUCCESS = 'success', _('成功')
+        FAILED = 'failed', _('失败')
+    
+    community = models.ForeignKey(Community, on_delete=models.CASCADE, related_name='billing_runs', verbose_name=_('小区'))
+    billing_period = models.CharField(_('账期'), max_length=7, help_text='格式：YYYY-MM')
+    status = models.CharField(_('状态'), max_length=20, choices=RunStatus.choices, default=RunStatus.RUNNING)
+    house_count = models.IntegerField(_('房屋数'), default=0)
+    created_count = models.IntegerField(_('新生成账单数'), default=0)
+    skipped_count = models.IntegerField(_('已存在账单数'), default=0)
+    total_amount = models.DecimalField(_('新生成账单总金额'), max_digits=14, decimal_places=2, default=0)
+    duration = models.FloatField(_('耗时'), default=0, help_text='秒')
+    error = models.TextField(_('错误信息'), blank=True, default='')
+    triggered_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name=_('触发人'))
+    started_at = models.DateTimeField(_('开始时间'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('结束时间'), blank=True, null=True)
+    
+    class Meta:
+        verbose_name = _('账单生成记录')
+        verbose_name_plural = _('账单生成记录')
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f'{self.community_id} {self.billing_period} 账单生成 - {self.status}'
+
+
+def generate_pass_code():
+    """通行码：32位十六进制的uuid4（带连字符的形式超过字段长度）"""
+    return uuid.uuid4().hex
+
+
 class VisitorPass(models.Model):
     """访客通行表"""
     class PassStatus(models.TextChoices):
@@ -133,7 +204,7 @@ class VisitorPass(models.Model):
     house_id = models.BigIntegerField(_('访问的房产ID'))
     visitor_name = models.CharField(_('访客姓名'), max_length=100)
     visitor_phone = models.CharField(_('访客手机号'), max_length=20)
-    pass_code = models.CharField(_('唯一的通行二维码内容'), max_length=32, default=uuid.uuid4)
+    pass_code = models.CharField(_('唯一的通行二维码内容'), max_length=32, unique=True, default=generate_pass_code)
     valid_from = models.DateTimeField(_('有效期开始时间'))
     valid_to = models.DateTimeField(_('有效期结束时间'))
     status = models.CharField(_('状态'), max_length=20, choices=PassStatus.choices, default=PassStatus.ACTIVE)
@@ -142,6 +213,44 @@ class VisitorPass(models.Model):
     class Meta:
         verbose_name = _('访客通行证')
         verbose_name_plural = _('访客通行证')
+        indexes = [
+            # 热集合预热（有效通行证）和门禁吊销列表（已使用/已取消且未过期的通行证）
+            models.Index(fields=['status', 'valid_to'], name='visitor_pass_status_to_idx'),
+        ]
     
     def __str__(self):
         return f'{self.visitor_name} 的通行证 - {self.status}'
+
+
+class GateDevice(models.Model):
+    """门禁设备表，设备使用独立的令牌调用门禁接口，只能核验所属小区的通行证"""
+    gate_id = models.CharField(_('门禁设备编号'), max_length=64, unique=True)
+    community = models.ForeignKey(Community, on_delete=models.CASCADE, related_name='gate_devices', verbose_name=_('小区'))
+    token_hash = models.CharField(_('令牌摘要'), max_length=64, unique=True, help_text='设备令牌的SHA-256，令牌本身不保存')
+    is_active = models.BooleanField(_('是否启用'), default=True)
+    created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('门禁设备')
+        verbose_name_plural = _('门禁设备')
+    
+    def __str__(self):
+        return f'{self.gate_id} - {self.community_id}'
+
+
+class GateScanLog(models.Model):
+    """门禁扫码记录表，离线门禁设备批量上传"""
+    pass_id = models.BigIntegerField(_('通行证ID'))
+    gate_id = models.CharField(_('门禁设备编号'), max_length=64)
+    result = models.CharField(_('本地核验结果'), max_length=20)
+    scanned_at = models.DateTimeField(_('扫码时间'))
+    uploaded_at = models.DateTimeField(_('上传时间'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('门禁扫码记录')
+        verbose_name_plural = _('门禁扫码记录')
+        # 设备重传同一批记录时去重
+        unique_together = ('gate_id', 'pass_id', 'scanned_at')
+    
+    def __str__(self):
+        return f'{self.gate_id} {self.pass_id} {self.result}'
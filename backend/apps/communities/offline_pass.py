@@ -0,0 +1,121 @@
+"""
+离线可验证的访客通行证
+
+二维码内容为紧凑的签名令牌，门禁设备持有签名密钥即可在本地验证，无需访问后端：
+
+    base64url( 版本(1) | 密钥编号(1) | 通行证id(8) | 房屋id(8) | 生效时间(4) | 失效时间(4) | HMAC-SHA256前16字节 )
+
+共42字节，编码后56个字符。时间为Unix秒。
+设备定期同步吊销列表（已取消或已使用且尚未过期的通行证id），扫码记录在本地缓冲后批量上传。
+
+本模块不依赖Django，可直接用于门禁设备和本地模拟器。
+"""
+import base64
+import hashlib
+import hmac
+import struct
+import time
+
+VERSION = 1
+_BODY = struct.Struct('>BBQQII')
+MAC_SIZE = 16
+TOKEN_SIZE = _BODY.size + MAC_SIZE
+
+# 核验结果（与在线核验一致，另增签名无效）
+RESULT_OK = 'ok'
+RESULT_INVALID = 'invalid'
+RESULT_NOT_STARTED = 'not_started'
+RESULT_EXPIRED = 'expired'
+RESULT_UNAVAILABLE = 'unavailable'
+
+
+class PassClaims:
+    """令牌中的通行证信息"""
+    __slots__ = ('key_id', 'pass_id', 'house_id', 'valid_from', 'valid_to')
+
+    def __init__(self, key_id, pass_id, house_id, valid_from, valid_to):
+        self.key_id = key_id
+        self.pass_id = pass_id
+        self.house_id = house_id
+        self.valid_from = valid_from
+        self.valid_to = valid_to
+
+
+def _mac(key, body):
+    if isinstance(key, str):
+        key = key.encode()
+    return hmac.new(key, body, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def encode_token(key_id, key, pass_id, house_id, valid_from, valid_to):
+    """签发令牌，时间为Unix秒"""
+    body = _BODY.pack(VERSION, key_id, pass_id, house_id, int(valid_from), int(valid_to))
+    return base64.urlsafe_b64encode(body + _mac(key, body)).decode().rstrip('=')
+
+
+def decode_token(token, keys):
+    """校验签名并解析令牌，keys为{密钥编号: 密钥}，签名无效时返回None"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except (ValueError, TypeError):
+        return None
+    if len(raw) != TOKEN_SIZE:
+        return None
+    body, mac = raw[:_BODY.size], raw[_BODY.size:]
+    version, key_id, pass_id, house_id, valid_from, valid_to = _BODY.unpack(body)
+    key = keys.get(key_id)
+    if version != VERSION or key is None or not hmac.compare_digest(mac, _mac(key, body)):
+        return None
+    return PassClaims(key_id, pass_id, house_id, valid_from, valid_to)
+
+
+def verify_token(token, keys, revoked=(), now=None):
+    """本地核验令牌，返回(结果, PassClaims或None)"""
+    claims = decode_token(token, keys)
+    if claims is None:
+        return RESULT_INVALID, None
+    now = time.time() if now is None else now
+    if now < claims.valid_from:
+        return RESULT_NOT_STARTED, claims
+    if now > claims.valid_to:
+        return RESULT_EXPIRED, claims
+    if claims.pass_id in revoked:
+        return RESULT_UNAVAILABLE, claims
+    return RESULT_OK, claims
+
+
+class OfflineGate:
+    """
+    门禁设备的本地核验逻辑
+
+    持有签名密钥和吊销列表，本地记录已使用的通行证（同一设备上一次性有效），
+    扫码结果缓冲在内存中，由设备在网络可用时批量上传。
+    """
+
+    def __init__(self, keys, gate_id='gate'):
+        self.keys = keys
+        self.gate_id = gate_id
+        self.revoked = set()
+        self.used = set()
+        self.pending = []
+
+    def sync_revocations(self, pass_ids):
+        """用后端下发的吊销列表替换本地列表"""
+        self.revoked = set(pass_ids)
+
+    def scan(self, token, now=None):
+        now = time.time() if now is None else now
+        result, claims = verify_token(token, self.keys, self.revoked, now)
+        if result == RESULT_OK and claims.pass_id in self.used:
+            result = RESULT_UNAVAILABLE
+        if claims is not None:
+            if result == RESULT_OK:
+                self.used.add(claims.pass_id)
+            self.pending.append({'pass_id': claims.pass_id, 'scanned_at': int(now), 'result': result})
+        return result, claims
+
+    def drain(self, limit=None):
+        """取出待上传的扫码记录"""
+        limit = len(self.pending) if limit is None else limit
+        batch, self.pending = self.pending[:limit], self.pending[limit:]
+        return batch
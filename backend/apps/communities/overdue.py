@@ -0,0 +1,91 @@
+"""
+逾期账单扫描
+
+将过了缴费截止日期仍未支付的账单批量标记为逾期：
+- 候选行通过(status, due_date)索引定位，按主键区间分块，每块一个短事务，避免长时间锁表；
+- 每块先以SELECT ... FOR UPDATE SKIP LOCKED锁定候选行（多个节点同时运行时各自处理不同的行），
+  再执行带status条件的UPDATE，同一账单只会被标记一次；
+- 同一事务中更新涉及房屋的欠费汇总；
+- 按小区统计逾期数量，并为每个绑定了相关房屋的居民生成一条汇总通知，与状态更新在同一事务中批量写入。
+"""
+import logging
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.notifications.services import create_notifications
+from .arrears import refresh_house_arrears
+from .models import House, PropertyFeeBill, UserHouse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepResult:
+    """一次扫描的结果"""
+    overdue_count: int = 0
+    notified_count: int = 0
+    chunks: int = 0
+    # 小区id -> 本次逾期的账单数
+    community_counts: Counter = field(default_factory=Counter)
+
+
+def sweep_overdue_bills(today=None, chunk_size=5000):
+    """将截止日期早于today的待支付账单标记为逾期，返回SweepResult"""
+    today = today or timezone.localdate()
+    candidates = PropertyFeeBill.objects.filter(status=PropertyFeeBill.BillStatus.PENDING, due_date__lt=today)
+    result = SweepResult()
+
+    lower = None
+    while True:
+        # 每块从剩余候选的最小主键开始，跳过主键空洞
+        remaining = candidates if lower is None else candidates.filter(id__gte=lower)
+        start = remaining.aggregate(start=Min('id'))['start']
+        if start is None:
+            break
+        lower = start + chunk_size
+        _sweep_chunk(candidates.filter(id__gte=start, id__lt=lower), result)
+        result.chunks += 1
+    return result
+
+
+def _sweep_chunk(queryset, result):
+    with transaction.atomic():
+        bills = list(queryset.select_for_update(skip_locked=True).values_list('id', 'house_id'))
+        if not bills:
+            return
+        updated = PropertyFeeBill.objects.filter(
+            id__in=[bill_id for bill_id, _ in bills], status=PropertyFeeBill.BillStatus.PENDING
+        ).update(status=PropertyFeeBill.BillStatus.OVERDUE, updated_at=timezone.now())
+
+        house_bills = defaultdict(list)
+        for bill_id, house_id in bills:
+            house_bills[house_id].append(bill_id)
+        communities = dict(House.objects.filter(id__in=house_bills).values_list('id', 'building__community_id'))
+        for house_id, bill_ids in house_bills.items():
+            community_id = communities.get(house_id)
+            if community_id is not None:
+                result.community_counts[community_id] += len(bill_ids)
+
+        refresh_house_arrears(house_bills)
+        result.overdue_count += updated
+        result.notified_count += _notify_residents(house_bills)
+
+
+def _notify_residents(house_bills):
+    """为每个居民生成一条汇总通知（一个居民可能绑定多套房屋）"""
+    user_bills = defaultdict(list)
+    bindings = UserHouse.objects.filter(
+        house_id__in=house_bills, status=UserHouse.StatusType.APPROVED
+    ).values_list('user_id', 'house_id')
+    for user_id, house_id in bindings:
+        user_bills[user_id].extend(house_bills[house_id])
+    # 扫描在后台命令中运行，通知与状态更新在同一事务中同步写入
+    return create_notifications(
+        (user_id, '物业费账单已逾期', f'您有{len(bill_ids)}张物业费账单已超过缴费截止日期，请尽快缴纳。',
+         bill_ids[0] if len(bill_ids) == 1 else None)
+        for user_id, bill_ids in user_bills.items()
+    )
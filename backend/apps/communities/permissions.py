@@ -0,0 +1,10 @@
+from rest_framework import permissions
+
+from .models import GateDevice
+
+
+class IsGateDevice(permissions.BasePermission):
+    """已通过门禁设备令牌认证的请求，request.auth为对应的GateDevice"""
+
+    def has_permission(self, request, view):
+        return isinstance(request.auth, GateDevice)
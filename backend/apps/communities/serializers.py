@@ -1,13 +1,16 @@
 from rest_framework import serializers
-from .models import Community, Building, House, UserHouse
+from apps.common.serializers import SparseFieldsetMixin
+from .models import BillingRun, Community, Building, House, UserHouse
+
+# 字段列表显式声明，并在系统检查中与模型核对（见checks.py），避免序列化器与模型不一致
 
 
 class CommunitySerializer(serializers.ModelSerializer):
     """小区序列化器"""
     class Meta:
         model = Community
-        fields = ['id', 'name', 'address', 'property_company', 'contact_phone',
-                  'total_buildings', 'description', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'address', 'property_phone', 'fee_standard', 'latitude', 'longitude',
+                  'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
@@ -15,25 +18,94 @@ class BuildingSerializer(serializers.ModelSerializer):
     """楼栋序列化器"""
     class Meta:
         model = Building
-        fields = ['id', 'community', 'name', 'unit_count', 'floor_count',
-                  'description', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'community', 'name', 'unit_count']
+        read_only_fields = ['id']
 
 
-class HouseSerializer(serializers.ModelSerializer):
-    """房屋序列化器"""
+class HouseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """房屋序列化器，读取时支持?fields=稀疏字段，业主姓名只返回给管理员"""
+    # 个人信息字段，非管理员请求时移除
+    staff_only_fields = ['owner_name']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None and not request.user.is_staff:
+            for name in self.staff_only_fields:
+                self.fields.pop(name, None)
+    
     class Meta:
         model = House
-        fields = ['id', 'building', 'unit', 'floor', 'room_number', 'area',
-                  'house_type', 'owner_name', 'owner_phone', 'status',
-                  'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'building', 'unit', 'number', 'area', 'owner_name']
+        # 主键由号段分配
+        read_only_fields = ['id']
 
 
 class UserHouseSerializer(serializers.ModelSerializer):
     """用户房产绑定序列化器"""
     class Meta:
         model = UserHouse
-        fields = ['id', 'user', 'house', 'relation_type', 'start_date',
-                  'end_date', 'status', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
+        fields = ['id', 'user', 'house', 'relationship', 'status', 'certificate_image', 'approved_by', 'approved_at']
+        read_only_fields = ['id', 'user', 'status', 'approved_by', 'approved_at']
+
+
+class UserHouseReviewSerializer(serializers.ModelSerializer):
+    """房产绑定审核队列序列化器，需配合select_related('user', 'house__building__community')使用"""
+    username = serializers.CharField(source='user.username', read_only=True)
+    user_phone = serializers.CharField(source='user.phone', read_only=True)
+    community_id = serializers.IntegerField(source='house.building.community_id', read_only=True)
+    community_name = serializers.CharField(source='house.building.community.name', read_only=True)
+    building_name = serializers.CharField(source='house.building.name', read_only=True)
+    unit = serializers.CharField(source='house.unit', read_only=True)
+    number = serializers.CharField(source='house.number', read_only=True)
+    
+    class Meta:
+        model = UserHouse
+        fields = [
+            'id', 'user', 'house', 'relationship', 'status', 'certificate_image', 'approved_by', 'approved_at',
+            'username', 'user_phone', 'community_id', 'community_name', 'building_name', 'unit', 'number'
+        ]
+        read_only_fields = fields
+
+
+class BindingReviewSerializer(serializers.Serializer):
+    """批量审核参数序列化器"""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=5000)
+    action = serializers.ChoiceField(choices=['approve', 'reject'])
+
+
+class GateVerifySerializer(serializers.Serializer):
+    """门禁核验参数序列化器"""
+    pass_code = serializers.CharField(max_length=32)
+
+
+class GateScanSerializer(serializers.Serializer):
+    """门禁设备上传的单条扫码记录"""
+    pass_id = serializers.IntegerField()
+    scanned_at = serializers.IntegerField(help_text='Unix秒')
+    result = serializers.CharField(max_length=20)
+
+
+class GateScanUploadSerializer(serializers.Serializer):
+    """门禁设备批量上传扫码记录参数序列化器，设备编号取自设备令牌"""
+    scans = serializers.ListField(child=GateScanSerializer(), max_length=5000)
+
+
+class BillingRunSerializer(serializers.ModelSerializer):
+    """账单生成记录序列化器"""
+    class Meta:
+        model = BillingRun
+        fields = ['id', 'community', 'billing_period', 'status', 'house_count', 'created_count', 'skipped_count',
+                  'total_amount', 'duration', 'error', 'triggered_by', 'started_at', 'finished_at']
+
+
+class GenerateBillsSerializer(serializers.Serializer):
+    """账单生成参数序列化器"""
+    period = serializers.RegexField(r'^\d{4}-(0[1-9]|1[0-2])$', help_text='账期，格式YYYY-MM')
+    due_date = serializers.DateField(required=False, help_text='缴费截止日期，默认账期最后一天')
+
+
+MODEL_SERIALIZERS = [
+    CommunitySerializer, BuildingSerializer, HouseSerializer, UserHouseSerializer, UserHouseReviewSerializer,
+    BillingRunSerializer,
+]
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from apps.payments.models import PaymentOrder
+from .arrears import refresh_house_arrears
+from .cache import invalidate_tree
+from .gate import publish_pass
+from .models import Building, Community, House, PropertyFeeBill, VisitorPass
+
+# 批量审核房产绑定后发送（queryset.update不触发post_save），参数：bindings=[(user_id, house_id)], approved
+bindings_reviewed = Signal()
+
+
+def _invalidate_on_commit(community_id):
+    # 事务提交后再失效，避免并发读取在提交前用旧数据重建
+    transaction.on_commit(lambda: invalidate_tree(community_id))
+
+
+@receiver(post_save, sender=Community)
+@receiver(post_delete, sender=Community)
+def invalidate_community_tree(sender, instance, **kwargs):
+    """小区变更后使其房屋树失效"""
+    _invalidate_on_commit(instance.id)
+
+
+@receiver(post_save, sender=Building)
+@receiver(post_delete, sender=Building)
+def invalidate_building_tree(sender, instance, **kwargs):
+    """楼栋变更后使所属小区的房屋树失效"""
+    _invalidate_on_commit(instance.community_id)
+
+
+@receiver(post_save, sender=House)
+@receiver(post_delete, sender=House)
+def invalidate_house_tree(sender, instance, **kwargs):
+    """房屋变更后使所属小区的房屋树失效"""
+    if House.building.is_cached(instance):
+        _invalidate_on_commit(instance.building.community_id)
+        return
+    community_id = Building.objects.filter(pk=instance.building_id).values_list('community_id', flat=True).first()
+    if community_id is not None:
+        _invalidate_on_commit(community_id)
+
+
+@receiver(post_save, sender=PropertyFeeBill)
+@receiver(post_delete, sender=PropertyFeeBill)
+def refresh_bill_arrears(sender, instance, **kwargs):
+    """单张账单变更后更新房屋欠费汇总（批量生成和逾期扫描自行批量更新）"""
+    refresh_house_arrears([instance.house_id])
+
+
+@receiver(post_save, sender=PaymentOrder)
+def settle_paid_bill(sender, instance, **kwargs):
+    """支付成功后将关联账单标记为已支付，并更新房屋欠费汇总"""
+    if instance.status != PaymentOrder.STATUS_PAID or not instance.bill_id:
+        return
+    bill = PropertyFeeBill.objects.filter(pk=instance.bill_id).values('house_id').first()
+    if bill is None:
+        return
+    settled = PropertyFeeBill.objects.filter(
+        pk=instance.bill_id,
+        status__in=[PropertyFeeBill.BillStatus.PENDING, PropertyFeeBill.BillStatus.OVERDUE],
+    ).update(status=PropertyFeeBill.BillStatus.PAID, paid_at=instance.paid_at or timezone.now(), updated_at=timezone.now())
+    if settled:
+        refresh_house_arrears([bill['house_id']])
+
+
+@receiver(post_save, sender=VisitorPass)
+def sync_visitor_pass(sender, instance, **kwargs):
+    """通行证创建、取消、修改有效期后同步门禁热集合"""
+    transaction.on_commit(lambda: publish_pass(instance))
@@ -1,3 +1,638 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+from apps.common.ids import allocate_ids
+from apps.notifications.models import Notification
+from apps.payments.models import PaymentOrder
+from apps.common.serializers import check_serializer_fields
+from apps.users.models import User
+from apps.users.serializers import CustomTokenObtainPairSerializer
+from .arrears import get_house_arrears
+from .checks import check_visitor_pass_keys
+from .billing import generate_bills
+from . import offline_pass
+from .gate import RESULT_OK, sign_pass, verify_pass
+from .models import (
+    BillingRun, Building, Community, GateDevice, GateScanLog, House, PropertyFeeBill, UserHouse, VisitorPass
+)
+from .overdue import sweep_overdue_bills
+from .serializers import MODEL_SERIALIZERS, HouseSerializer
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+import json
+import os
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+
+class CommunityLayoutImportTests(TestCase):
+    """小区楼栋房屋导入测试类"""
+    
+    def setUp(self):
+        self.community = Community.objects.create(
+            name='阳光小区', address='幸福路1号', property_phone='010-12345678', fee_standard=Decimal('2.50')
+        )
+    
+    def write_csv(self, content):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+    
+    def test_import_csv(self):
+        """测试导入楼栋房屋，重复导入跳过已存在的房屋"""
+        path = self.write_csv(
+            '小区,楼栋,单元,房号,面积,业主\n'
+            '阳光小区,1号楼,1,101,89.5,张三\n'
+            '阳光小区,1号楼,2,101,120,\n'
+            '阳光小区,2号楼,1,101,abc,\n'
+            '不存在小区,1号楼,1,102,80,\n'
+        )
+        out = StringIO()
+        call_command('import_community_layout', path, '--batch-size', '2', stdout=out, stderr=StringIO())
+        
+        self.assertEqual(House.objects.count(), 2)
+        building = Building.objects.get(community=self.community, name='1号楼')
+        self.assertEqual(building.unit_count, 2)
+        house = House.objects.get(building=building, unit='1', number='101')
+        self.assertEqual(house.area, Decimal('89.50'))
+        self.assertEqual(house.owner_name, '张三')
+        
+        out = StringIO()
+        call_command('import_community_layout', path, stdout=out, stderr=StringIO())
+        self.assertEqual(House.objects.count(), 2)
+        self.assertIn('已存在2户', out.getvalue())
+    
+    def test_import_with_default_community(self):
+        """测试指定小区后文件可以省略小区列"""
+        rows = ''.join(f'{b}号楼,{u},{n},100\n' for b in range(1, 4) for u in range(1, 3) for n in range(101, 111))
+        path = self.write_csv('building,unit,number,area\n' + rows)
+        call_command('import_community_layout', path, '--community', str(self.community.id),
+                     '--batch-size', '7', stdout=StringIO())
+        self.assertEqual(House.objects.filter(building__community=self.community).count(), 60)
+        self.assertEqual(len(set(House.objects.values_list('id', flat=True))), 60)
+        # 第2单元出现在楼栋创建之后的批次中
+        self.assertEqual(set(Building.objects.values_list('unit_count', flat=True)), {2})
+        
+        path = self.write_csv('building,unit,number,area\n1号楼,3,101,100\n')
+        call_command('import_community_layout', path, '--community', str(self.community.id), stdout=StringIO())
+        self.assertEqual(Building.objects.get(name='1号楼').unit_count, 3)
+    
+    def test_upload_endpoint(self):
+        """测试管理员上传导入接口"""
+        admin = User.objects.create_user(username='admin', phone='13900000400', password=None, is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        upload = SimpleUploadedFile('layout.csv', '楼栋,单元,房号,面积\n1号楼,1,101,90\n1号楼,1,102,x\n'.encode())
+        response = client.post(reverse('community-layout-import'),
+                               {'file': upload, 'community': self.community.id}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+    
+    def test_allocate_ids_after_existing_rows(self):
+        """测试号段从已有最大主键之后开始分配且不重叠"""
+        building = Building.objects.create(community=self.community, name='9号楼')
+        House.objects.create(id=500, building=building, unit='1', number='101', area=Decimal('1'))
+        first = allocate_ids(House, 10)
+        second = allocate_ids(House, 5)
+        self.assertEqual(first.start, 501)
+        self.assertEqual(second.start, 511)
+
+
+class CommunityTreeTests(TestCase):
+    """小区房屋树缓存测试类"""
+    
+    def setUp(self):
+        cache.clear()
+        self.community = Community.objects.create(
+            name='阳光小区', address='幸福路1号', property_phone='010-12345678', fee_standard=Decimal('2.50')
+        )
+        self.building = Building.objects.create(community=self.community, name='1号楼', unit_count=2)
+        House.objects.create(id=1, building=self.building, unit='1', number='101', area=Decimal('90'))
+        House.objects.create(id=2, building=self.building, unit='2', number='101', area=Decimal('90'))
+        user = User.objects.create_user(username='resident', phone='13900000500', password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.url = reverse('community-tree', args=[self.community.id])
+    
+    def test_tree_and_not_modified(self):
+        """测试返回房屋树，携带ETag再次请求返回304且不查询数据库"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tree = json.loads(response.content)
+        self.assertEqual(tree['buildings'][0]['units'][1], {'unit': '2', 'houses': [[2, '101']]})
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_change_invalidates_tree(self):
+        """测试房屋变更后ETag变化"""
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            House.objects.create(id=3, building=self.building, unit='1', number='102', area=Decimal('80'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(json.loads(response.content)['buildings'][0]['units'][0]['houses']), 2)
+    
+    def test_missing_community(self):
+        """测试小区不存在"""
+        response = self.client.get(reverse('community-tree', args=[999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SerializerSchemaTests(TestCase):
+    """序列化器与模型一致性测试类"""
+    
+    def test_serializers_match_models(self):
+        """测试communities序列化器字段全部存在于模型上"""
+        self.assertEqual(check_serializer_fields(MODEL_SERIALIZERS, 'communities'), [])
+    
+    def test_drift_detected(self):
+        """测试引用不存在的字段时系统检查报错"""
+        class DriftedSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = House
+                fields = ['id', 'room_number']
+        
+        errors = check_serializer_fields([DriftedSerializer], 'communities')
+        self.assertEqual([error.id for error in errors], ['communities.E001'])
+        self.assertIn('room_number', errors[0].msg)
+    
+    def test_implicit_fields_rejected(self):
+        """测试未显式列出字段（__all__）时系统检查报错，新增的模型字段不会自动暴露"""
+        class AllFieldsSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = House
+                fields = '__all__'
+        
+        errors = check_serializer_fields([AllFieldsSerializer], 'communities')
+        self.assertEqual([error.id for error in errors], ['communities.E001'])
+
+
+class HouseListTests(TestCase):
+    """房屋列表测试类"""
+    
+    def setUp(self):
+        community = Community.objects.create(
+            name='阳光小区', address='幸福路1号', property_phone='010-12345678', fee_standard=Decimal('2.50')
+        )
+        self.building = Building.objects.create(community=community, name='1号楼')
+        for i in range(3):
+            House.objects.create(id=i + 1, building=self.building, unit='1', number=f'10{i}',
+                                 area=Decimal('88.8'), owner_name='张三' if i else None)
+        self.admin = User.objects.create_user(username='admin', phone='13900000600', password=None, is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_values_list_matches_serializer(self):
+        """测试快速列表与模型序列化器输出一致"""
+        response = self.client.get(reverse('house-list') + f'?building={self.building.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = HouseSerializer(House.objects.order_by('id'), many=True).data
+        self.assertEqual(response.data['results'], expected)
+    
+    def test_sparse_fields(self):
+        """测试?fields=只返回部分字段"""
+        response = self.client.get(reverse('house-list') + '?fields=id,number')
+        self.assertEqual(response.data['results'][0], {'id': 1, 'number': '100'})
+    
+    def test_owner_name_staff_only(self):
+        """测试业主姓名只返回给管理员"""
+        self.assertEqual(self.client.get(reverse('house-detail', args=[2])).data['owner_name'], '张三')
+        resident = User.objects.create_user(username='resident', phone='13900000601', password=None)
+        client = APIClient()
+        client.force_authenticate(user=resident)
+        results = client.get(reverse('house-list')).data['results']
+        self.assertEqual(len(results), 3)
+        self.assertNotIn('owner_name', results[0])
+        self.assertNotIn('owner_name', client.get(reverse('house-list') + '?fields=id,owner_name').data['results'][0])
+        self.assertNotIn('owner_name', client.get(reverse('house-detail', args=[2])).data)
+    
+    def test_invalid_filter(self):
+        """测试筛选参数不是整数时返回400"""
+        for query in ['?building=abc', '?community=1.5']:
+            response = self.client.get(reverse('house-list') + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('building-list') + '?community=x').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+    
+    def test_create_allocates_id(self):
+        """测试管理员创建房屋时自动分配主键"""
+        response = self.client.post(reverse('house-list'), {
+            'building': self.building.id, 'unit': '2', 'number': '201', 'area': '90.00'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['id'], 4)
+
+
+class FeeBillGenerationTests(TestCase):
+    """物业费账单批量生成测试类"""
+    
+    def setUp(self):
+        self.community = Community.objects.create(
+            name='阳光小区', address='幸福路1号', property_phone='010-12345678', fee_standard=Decimal('2.35')
+        )
+        building = Building.objects.create(community=self.community, name='1号楼')
+        for i, area in enumerate(['89.50', '120.33', '60.01']):
+            House.objects.create(id=i + 1, building=building, unit='1', number=f'10{i}', area=Decimal(area))
+    
+    def test_generate_bills_is_exact_and_idempotent(self):
+        """测试金额按分四舍五入，重复执行只补齐缺失账单"""
+        run = generate_bills(self.community, '2024-02', batch_size=2)
+        self.assertEqual(run.status, BillingRun.RunStatus.SUCCESS)
+        self.assertEqual((run.house_count, run.created_count, run.skipped_count), (3, 3, 0))
+        amounts = dict(PropertyFeeBill.objects.values_list('house_id', 'amount'))
+        # 89.50*2.35=210.325, 120.33*2.35=282.7755, 60.01*2.35=141.0235
+        self.assertEqual(amounts, {1: Decimal('210.33'), 2: Decimal('282.78'), 3: Decimal('141.02')})
+        self.assertEqual(run.total_amount, Decimal('634.13'))
+        self.assertEqual(PropertyFeeBill.objects.first().due_date, date(2024, 2, 29))
+        
+        PropertyFeeBill.objects.filter(house_id=2).delete()
+        run = generate_bills(self.community, '2024-02')
+        self.assertEqual((run.created_count, run.skipped_count), (1, 2))
+        self.assertEqual(PropertyFeeBill.objects.count(), 3)
+    
+    def test_concurrent_insert_not_counted(self):
+        """测试并发执行先写入的账单不计入本次的生成数和金额"""
+        def allocate_after_concurrent_insert(model, count):
+            PropertyFeeBill.objects.create(id=100, house_id=1, billing_period='2024-02', amount=Decimal('1.00'),
+                                           due_date=date(2024, 2, 29))
+            return allocate_ids(model, count)
+        
+        with mock.patch('apps.communities.billing.allocate_ids', side_effect=allocate_after_concurrent_insert):
+            run = generate_bills(self.community, '2024-02')
+        self.assertEqual((run.house_count, run.created_count, run.skipped_count), (3, 2, 1))
+        self.assertEqual(run.total_amount, Decimal('423.80'))
+    
+    def test_command(self):
+        """测试账单生成命令"""
+        out = StringIO()
+        call_command('generate_fee_bills', '2024-03', '--community', self.community.name, stdout=out)
+        self.assertIn('新生成3张', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_fee_bills', '2024-13', stdout=StringIO())
+    
+    def test_admin_trigger(self):
+        """测试管理员通过接口触发账单生成"""
+        admin = User.objects.create_user(username='admin', phone='13900000700', password=None, is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        url = reverse('community-generate-bills', args=[self.community.id])
+        response = client.post(url, {'period': '2024-04', 'due_date': '2024-05-15'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 3)
+        self.assertEqual(response.data['triggered_by'], admin.id)
+        self.assertEqual(PropertyFeeBill.objects.filter(due_date=date(2024, 5, 15)).count(), 3)
+        
+        response = client.post(url, {'period': '2024/04'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_admin_trigger_with_jwt(self):
+        """测试经JWT认证（request.user为令牌用户而非User实例）触发账单生成"""
+        admin = User.objects.create_user(username='admin', phone='13900000701', password=None, is_staff=True)
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(admin).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        url = reverse('community-generate-bills', args=[self.community.id])
+        response = client.post(url, {'period': '2024-05'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(BillingRun.objects.get(billing_period='2024-05').triggered_by_id, admin.id)
+
+
+class OverdueSweepTests(TestCase):
+    """逾期账单扫描测试类"""
+    
+    def setUp(self):
+        community = Community.objects.create(
+            name='阳光小区', address='幸福路1号', property_phone='010-12345678', fee_standard=Decimal('2.00')
+        )
+        self.community_id = community.id
+        building = Building.objects.create(community=community, name='1号楼')
+        self.resident = User.objects.create_user(username='resident', phone='13900000800', password=None)
+        for i in range(1, 6):
+            House.objects.create(id=i, building=building, unit='1', number=f'10{i}', area=Decimal('50'))
+        UserHouse.objects.create(id=1, user=self.resident, house_id=1, status=UserHouse.StatusType.APPROVED)
+        UserHouse.objects.create(id=2, user=self.resident, house_id=2, status=UserHouse.StatusType.APPROVED)
+        # 主键不连续，验证区间跳过空洞
+        for bill_id, house_id, due in [(1, 1, 1), (2, 2, 1), (50, 3, 1), (51, 4, 20), (900, 5, 1)]:
+            PropertyFeeBill.objects.create(id=bill_id, house_id=house_id, billing_period='2024-01',
+                                           amount=Decimal('100'), due_date=date(2024, 2, due))
+        PropertyFeeBill.objects.filter(id=900).update(status=PropertyFeeBill.BillStatus.PAID)
+    
+    def test_sweep(self):
+        """测试只标记到期未支付的账单，按小区计数，每个居民一条通知"""
+        result = sweep_overdue_bills(today=date(2024, 2, 10), chunk_size=10)
+        self.assertEqual(result.overdue_count, 3)
+        self.assertEqual(result.chunks, 2)
+        self.assertEqual(result.community_counts, {self.community_id: 3})
+        self.assertEqual(
+            set(PropertyFeeBill.objects.filter(status=PropertyFeeBill.BillStatus.OVERDUE).values_list('id', flat=True)),
+            {1, 2, 50}
+        )
+        notification = Notification.objects.get(user_id=self.resident.id)
+        self.assertIn('2张', notification.content)
+        
+        # 再次扫描不重复处理
+        result = sweep_overdue_bills(today=date(2024, 2, 10), chunk_size=10)
+        self.assertEqual((result.overdue_count, result.notified_count), (0, 0))
+    
+    def test_command(self):
+        """测试扫描命令输出小区统计"""
+        out = StringIO()
+        call_command('sweep_overdue_bills', stdout=out)
+        self.assertIn(f'小区{self.community_id}: 逾期4张', out.getvalue())
+
+
+class HouseArrearsTests(TestCase):
+    """房屋欠费汇总测试类"""
+    
+    def setUp(self):
+        cache.clear()
+        self.community = Community.objects.create(
+            name='阳光小区', address='幸福路1号', property_phone='010-12345678', fee_standard=Decimal('2.00')
+        )
+        building = Building.objects.create(community=self.community, name='1号楼')
+        House.objects.create(id=1, building=building, unit='1', number='101', area=Decimal('50'))
+        House.objects.create(id=2, building=building, unit='1', number='102', area=Decimal('60'))
+        self.resident = User.objects.create_user(username='resident', phone='13900000900', password=None)
+        UserHouse.objects.create(id=1, user=self.resident, house_id=1, status=UserHouse.StatusType.APPROVED)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.resident)
+    
+    def get_arrears(self):
+        response = self.client.get(reverse('my-arrears'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data[0]
+    
+    def test_maintained_by_generation_sweep_and_payment(self):
+        """测试账单生成、逾期扫描、支付后汇总同步更新"""
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_bills(self.community, '2024-01', due_date=date(2024, 1, 31))
+            generate_bills(self.community, '2024-02', due_date=date(2024, 2, 29))
+        arrears = self.get_arrears()
+        self.assertEqual(arrears['outstanding_amount'], '200.00')
+        self.assertEqual((arrears['unpaid_count'], arrears['overdue_count']), (2, 0))
+        self.assertEqual(arrears['oldest_unpaid_period'], '2024-01')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            sweep_overdue_bills(today=date(2024, 2, 10))
+        self.assertEqual(self.get_arrears()['overdue_count'], 1)
+        
+        bill = PropertyFeeBill.objects.get(house_id=1, billing_period='2024-01')
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentOrder.objects.create(user_id=self.resident.id, bill_id=bill.id, amount=bill.amount,
+                                        status=PaymentOrder.STATUS_PAID)
+        bill.refresh_from_db()
+        self.assertEqual(bill.status, PropertyFeeBill.BillStatus.PAID)
+        arrears = self.get_arrears()
+        self.assertEqual(arrears['outstanding_amount'], '100.00')
+        self.assertEqual((arrears['unpaid_count'], arrears['overdue_count']), (1, 0))
+        self.assertEqual(arrears['oldest_unpaid_period'], '2024-02')
+    
+    def test_cached_lookup(self):
+        """测试缓存命中时不查询汇总表，缓存缺失时回退到数据库"""
+        PropertyFeeBill.objects.create(id=1, house_id=1, billing_period='2024-01',
+                                       amount=Decimal('88.00'), due_date=date(2024, 1, 31))
+        cache.clear()
+        self.assertEqual(get_house_arrears([1])[1]['outstanding_amount'], '88.00')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_house_arrears([1])[1]['unpaid_count'], 1)
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False)
+class BindingReviewTests(TestCase):
+    """房产绑定审核队列测试类"""
+    
+    def setUp(self):
+        community = Community.objects.create(
+            name='阳光小区', address='幸福路1号', property_phone='010-12345678', fee_standard=Decimal('2.00')
+        )
+        building = Building.objects.create(community=community, name='1号楼')
+        self.residents = []
+        for i in range(1, 6):
+            House.objects.create(id=i, building=building, unit='1', number=f'10{i}', area=Decimal('50'))
+            user = User.objects.create_user(username=f'resident{i}', phone=f'1390000100{i}', password=None)
+            UserHouse.objects.create(id=i, user=user, house_id=i)
+            self.residents.append(user)
+        UserHouse.objects.filter(id=5).update(status=UserHouse.StatusType.APPROVED)
+        self.admin = User.objects.create_user(username='admin', phone='13900001000', password=None, is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_queue_query_count(self):
+        """测试待审核列表的查询次数与条数无关"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('binding-list'))
+        self.assertEqual(response.data['count'], 4)
+        first = response.data['results'][0]
+        self.assertEqual((first['username'], first['community_name'], first['building_name'], first['number']),
+                         ('resident1', '阳光小区', '1号楼', '101'))
+    
+    def test_bulk_review(self):
+        """测试批量审核只处理待审核的绑定并通知居民"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('binding-review'), {'ids': [1, 2, 3, 5], 'action': 'approve'},
+                                        format='json')
+        self.assertEqual(response.data, {'updated': 3, 'skipped': 1})
+        approved = UserHouse.objects.filter(status=UserHouse.StatusType.APPROVED, approved_by=self.admin)
+        self.assertEqual(set(approved.values_list('id', flat=True)), {1, 2, 3})
+        self.assertEqual(
+            set(Notification.objects.values_list('user_id', flat=True)), {user.id for user in self.residents[:3]}
+        )
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('binding-review'), {'ids': [4], 'action': 'reject'}, format='json')
+        self.assertEqual(UserHouse.objects.get(id=4).status, UserHouse.StatusType.REJECTED)
+        self.assertEqual(self.client.get(reverse('binding-list')).data['count'], 0)
+
+
+def create_gate_house(house_id, name):
+    """创建一个小区及其中的一套房屋，返回小区"""
+    community = Community.objects.create(
+        name=name, address='幸福路1号', property_phone='010-12345678', fee_standard=Decimal('2.00')
+    )
+    building = Building.objects.create(community=community, name='1号楼')
+    House.objects.create(id=house_id, building=building, unit='1', number='101', area=Decimal('50'))
+    return community
+
+
+def gate_client(community, gate_id):
+    """登记门禁设备，返回携带设备令牌的客户端"""
+    out = StringIO()
+    call_command('create_gate_device', gate_id, str(community.id), stdout=out)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Gate {out.getvalue().strip()}')
+    return client
+
+
+class GateVerifyTests(TestCase):
+    """门禁核验测试类"""
+    
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.community = create_gate_house(7, '阳光小区')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.visitor_pass = VisitorPass.objects.create(
+                id=1, user_id=1, house_id=7, visitor_name='李四', visitor_phone='13900001200',
+                valid_from=now - timedelta(hours=1), valid_to=now + timedelta(hours=1)
+            )
+            VisitorPass.objects.create(
+                id=2, user_id=1, house_id=7, visitor_name='王五', visitor_phone='13900001201', pass_code='later',
+                valid_from=now + timedelta(hours=1), valid_to=now + timedelta(hours=2)
+            )
+        self.client = gate_client(self.community, 'east')
+    
+    def verify(self, code):
+        return self.client.post(reverse('gate-verify'), {'pass_code': code}, format='json')
+    
+    def test_gate_device_only(self):
+        """测试门禁接口只接受门禁设备令牌，其他小区的设备核验不了本小区的通行证"""
+        admin = User.objects.create_user(username='gate_admin', phone='13900001203', password=None,
+                                         is_staff=True, is_active=True)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(admin).access_token}')
+        response = client.post(reverse('gate-verify'), {'pass_code': self.visitor_pass.pass_code}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        client.credentials(HTTP_AUTHORIZATION='Gate wrong-token')
+        self.assertEqual(client.get(reverse('gate-revocations')).status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        other = gate_client(create_gate_house(8, '月亮小区'), 'west')
+        response = other.post(reverse('gate-verify'), {'pass_code': self.visitor_pass.pass_code}, format='json')
+        self.assertEqual(response.data['result'], 'not_found')
+        self.assertEqual(VisitorPass.objects.get(id=1).status, VisitorPass.PassStatus.ACTIVE)
+        
+        GateDevice.objects.filter(gate_id='east').update(is_active=False)
+        self.assertEqual(self.verify(self.visitor_pass.pass_code).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_verify_once(self):
+        """测试通行证只能核验通过一次，命中热集合时只执行一条UPDATE"""
+        self.assertEqual(len(self.visitor_pass.pass_code), 32)
+        with self.assertNumQueries(1):
+            result, data = verify_pass(self.visitor_pass.pass_code)
+        self.assertEqual((result, data['house_id']), (RESULT_OK, 7))
+        self.assertEqual(VisitorPass.objects.get(id=1).status, VisitorPass.PassStatus.USED)
+        
+        response = self.verify(self.visitor_pass.pass_code)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['result'], 'unavailable')
+    
+    def test_validity_window_and_unknown_code(self):
+        """测试未生效、过期和无效通行码"""
+        self.assertEqual(self.verify('later').data['result'], 'not_started')
+        self.assertEqual(self.verify('nope').data['result'], 'not_found')
+        result, _ = verify_pass(self.visitor_pass.pass_code, now=timezone.now() + timedelta(hours=2))
+        self.assertEqual(result, 'expired')
+    
+    def test_cache_miss_falls_back_to_index(self):
+        """测试热集合未命中时查询数据库"""
+        cache.clear()
+        response = self.verify(self.visitor_pass.pass_code)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['visitor_name'], '李四')
+    
+    def test_benchmark_command(self):
+        """测试门禁核验基准命令"""
+        out = StringIO()
+        call_command('benchmark_gate_verify', '--passes', '50', stdout=out)
+        self.assertIn('失败: 0', out.getvalue())
+        self.assertEqual(VisitorPass.objects.count(), 2)
+
+
+@override_settings(VISITOR_PASS_KEYS={1: 'test-visitor-pass-key'}, VISITOR_PASS_KEY_ID=1)
+class OfflinePassTests(TestCase):
+    """离线通行证令牌测试类"""
+    
+    def setUp(self):
+        now = timezone.now()
+        self.owner = User.objects.create_user(username='owner', phone='13900001300', password=None)
+        self.community = create_gate_house(7, '阳光小区')
+        self.visitor_pass = VisitorPass.objects.create(
+            id=11, user_id=self.owner.id, house_id=7, visitor_name='李四', visitor_phone='13900001301',
+            valid_from=now - timedelta(hours=1), valid_to=now + timedelta(hours=1)
+        )
+        self.token = sign_pass(self.visitor_pass)
+        self.keys = settings.VISITOR_PASS_KEYS
+        self.gate_client = gate_client(self.community, 'east')
+    
+    def test_token_verify_and_tamper(self):
+        """测试令牌本地核验，篡改或密钥不符时无效"""
+        self.assertEqual(len(self.token), 56)
+        result, claims = offline_pass.verify_token(self.token, self.keys)
+        self.assertEqual((result, claims.pass_id, claims.house_id), ('ok', 11, 7))
+        tampered = self.token[:10] + ('A' if self.token[10] != 'A' else 'B') + self.token[11:]
+        self.assertEqual(offline_pass.verify_token(tampered, self.keys)[0], 'invalid')
+        self.assertEqual(offline_pass.verify_token(self.token, {1: 'other'})[0], 'invalid')
+        self.assertEqual(offline_pass.verify_token(self.token, self.keys, now=time.time() + 7200)[0], 'expired')
+    
+    def test_offline_gate_single_use_and_revocation(self):
+        """测试离线门禁同一通行证只通过一次，吊销列表生效"""
+        gate = offline_pass.OfflineGate(self.keys)
+        self.assertEqual(gate.scan(self.token)[0], 'ok')
+        self.assertEqual(gate.scan(self.token)[0], 'unavailable')
+        self.assertEqual([scan['result'] for scan in gate.drain()], ['ok', 'unavailable'])
+        
+        other = offline_pass.OfflineGate(self.keys)
+        other.sync_revocations(self.gate_client.get(reverse('gate-revocations')).data['revoked'])
+        self.assertEqual(other.scan(self.token)[0], 'ok')
+        VisitorPass.objects.filter(id=11).update(status=VisitorPass.PassStatus.CANCELLED)
+        other = offline_pass.OfflineGate(self.keys)
+        other.sync_revocations(self.gate_client.get(reverse('gate-revocations')).data['revoked'])
+        self.assertEqual(other.scan(self.token)[0], 'unavailable')
+    
+    def test_token_endpoint_owner_only(self):
+        """测试只有通行证创建者可以获取令牌"""
+        url = reverse('visitor-pass-token', args=[11])
+        client = APIClient()
+        client.force_authenticate(user=self.owner)
+        self.assertEqual(client.get(url).data['token'], self.token)
+        stranger = User.objects.create_user(username='stranger', phone='13900001303', password=None)
+        client.force_authenticate(user=stranger)
+        self.assertEqual(client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_token_disabled_without_dedicated_key(self):
+        """测试未配置独立签名密钥时不签发令牌，密钥与SECRET_KEY相同时启动检查报错"""
+        client = APIClient()
+        client.force_authenticate(user=self.owner)
+        with override_settings(VISITOR_PASS_KEYS={}):
+            response = client.get(reverse('visitor-pass-token', args=[11]))
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual([e.id for e in check_visitor_pass_keys()], ['communities.W001'])
+        with override_settings(VISITOR_PASS_KEYS={1: settings.SECRET_KEY}):
+            self.assertEqual([e.id for e in check_visitor_pass_keys()], ['communities.E002'])
+    
+    def test_scan_upload_marks_used(self):
+        """测试批量上传扫码记录标记通行证已使用，重复上传去重"""
+        gate = offline_pass.OfflineGate(self.keys, gate_id='east')
+        gate.scan(self.token)
+        payload = {'scans': gate.drain()}
+        # 其他小区的设备上传的记录不会使本小区的通行证失效
+        other = gate_client(create_gate_house(8, '月亮小区'), 'west')
+        self.assertEqual(other.post(reverse('gate-scans'), payload, format='json').data['used'], 0)
+        response = self.gate_client.post(reverse('gate-scans'), payload, format='json')
+        self.assertEqual(response.data, {'received': 1, 'used': 1})
+        self.assertEqual(VisitorPass.objects.get(id=11).status, VisitorPass.PassStatus.USED)
+        self.gate_client.post(reverse('gate-scans'), payload, format='json')
+        self.assertEqual(GateScanLog.objects.filter(gate_id='east').count(), 1)
+        self.assertIn(11, self.gate_client.get(reverse('gate-revocations')).data['revoked'])
+        # 吊销列表只包含设备所在小区的通行证
+        self.assertEqual(other.get(reverse('gate-revocations')).data['revoked'], [])
+    
+    def test_simulate_command(self):
+        """测试门禁模拟器命令"""
+        out = StringIO()
+        call_command('simulate_gate', '--passes', '200', '--tampered', '0.5', stdout=out)
+        self.assertIn('invalid', out.getvalue())
+        self.assertIn('ok', out.getvalue())
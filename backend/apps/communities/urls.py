@@ -1,5 +1,25 @@
-from django.urls import path
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from .views import (
+    BindingReviewViewSet, BuildingViewSet, CommunityLayoutImportView, CommunityTreeView, CommunityViewSet,
+    GateRevocationView, GateScanUploadView, GateVerifyView, HouseViewSet, MyArrearsView, VisitorPassTokenView
+)
+
+# 创建路由器，小区注册在根路径，需放在最后以免其详情路由匹配到buildings/、houses/等前缀
+router = DefaultRouter()
+router.register(r'buildings', BuildingViewSet, basename='building')
+router.register(r'houses', HouseViewSet, basename='house')
+router.register(r'bindings', BindingReviewViewSet, basename='binding')
+router.register(r'', CommunityViewSet, basename='community')
 
 urlpatterns = [
-    # 视图将在后续开发中添加
-]
\ No newline at end of file
+    path('<int:community_id>/tree/', CommunityTreeView.as_view(), name='community-tree'),
+    path('my-arrears/', MyArrearsView.as_view(), name='my-arrears'),
+    path('gate/verify/', GateVerifyView.as_view(), name='gate-verify'),
+    path('gate/revocations/', GateRevocationView.as_view(), name='gate-revocations'),
+    path('gate/scans/', GateScanUploadView.as_view(), name='gate-scans'),
+    path('visitor-passes/<int:pass_id>/token/', VisitorPassTokenView.as_view(), name='visitor-pass-token'),
+    path('import/', CommunityLayoutImportView.as_view(), name='community-layout-import'),
+    path('', include(router.urls)),
+]
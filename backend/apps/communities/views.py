@@ -1,3 +1,307 @@
-from django.shortcuts import render
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from apps.common.ids import allocate_ids
+from apps.common.serializers import ValuesSerializer, get_requested_fields
+from apps.notifications.services import notify_users_async
+from .arrears import get_house_arrears
+from .authentication import GateDeviceAuthentication
+from .billing import generate_bills
+from .cache import get_tree, get_tree_etag
+from .gate import (
+    RESULT_MESSAGES, RESULT_OK, get_revoked_pass_ids, offline_pass_enabled, record_scans, sign_pass, verify_pass
+)
+from .importers import LayoutImportError, LayoutImporter, read_rows
+from .models import Building, Community, House, UserHouse, VisitorPass
+from .permissions import IsGateDevice
+from .signals import bindings_reviewed
+from .serializers import (
+    BillingRunSerializer, BindingReviewSerializer, BuildingSerializer, CommunitySerializer,
+    GateScanUploadSerializer, GateVerifySerializer, GenerateBillsSerializer, HouseSerializer, UserHouseReviewSerializer
+)
+
+
+def _int_param(request, name):
+    """读取整数查询参数，未提供时返回None，不是整数时返回400"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: '必须是整数'})
+
+
+class AdminWriteMixin:
+    """登录用户可读，管理员可写"""
+    
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            return [permissions.IsAuthenticated()]
+        return [permissions.IsAdminUser()]
+
+
+class CommunityViewSet(AdminWriteMixin, viewsets.ModelViewSet):
+    """小区视图集"""
+    queryset = Community.objects.all()
+    serializer_class = CommunitySerializer
+    
+    @action(detail=True, methods=['post'], url_path='generate-bills')
+    def generate_bills(self, request, pk=None):
+        """管理员触发生成该小区指定账期的物业费账单，已存在的账单跳过"""
+        community = self.get_object()
+        serializer = GenerateBillsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        run = generate_bills(
+            community,
+            serializer.validated_data['period'],
+            due_date=serializer.validated_data.get('due_date'),
+            triggered_by_id=request.user.id,
+        )
+        return Response(BillingRunSerializer(run).data, status=status.HTTP_201_CREATED)
+
+
+class BuildingViewSet(AdminWriteMixin, viewsets.ModelViewSet):
+    """楼栋视图集，支持?community=按小区筛选"""
+    queryset = Building.objects.order_by('community_id', 'name')
+    serializer_class = BuildingSerializer
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        community = _int_param(self.request, 'community')
+        if community is not None:
+            queryset = queryset.filter(community_id=community)
+        return queryset
+
+
+class HouseViewSet(AdminWriteMixin, viewsets.ModelViewSet):
+    """房屋视图集，支持?building=、?community=筛选和?fields=稀疏字段"""
+    queryset = House.objects.order_by('id')
+    serializer_class = HouseSerializer
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        building = _int_param(self.request, 'building')
+        if building is not None:
+            queryset = queryset.filter(building_id=building)
+        community = _int_param(self.request, 'community')
+        if community is not None:
+            queryset = queryset.filter(building__community_id=community)
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        """房屋列表：直接从values()行构造返回数据，不实例化模型"""
+        queryset = self.filter_queryset(self.get_queryset())
+        exclude = () if request.user.is_staff else HouseSerializer.staff_only_fields
+        serializer = ValuesSerializer(HouseSerializer, get_requested_fields(request), exclude=exclude)
+        rows = queryset.values(*serializer.value_names)
+        
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.many(page))
+        return Response(serializer.many(rows))
+    
+    def perform_create(self, serializer):
+        serializer.save(id=allocate_ids(House, 1)[0])
+
+
+class BindingReviewViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    房产绑定审核队列（管理员）
+
+    列表默认只返回待审核的绑定，支持?status=、?community=筛选；
+    用户和房屋路径（小区-楼栋-单元-房号）通过select_related在同一查询中取得。
+    """
+    serializer_class = UserHouseReviewSerializer
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get_queryset(self):
+        queryset = UserHouse.objects.select_related('user', 'house__building__community').order_by('id')
+        if self.action != 'list':
+            return queryset
+        queryset = queryset.filter(status=self.request.query_params.get('status', UserHouse.StatusType.PENDING))
+        community = _int_param(self.request, 'community')
+        if community is not None:
+            queryset = queryset.filter(house__building__community_id=community)
+        return queryset
+    
+    @action(detail=False, methods=['post'])
+    def review(self, request):
+        """批量通过或拒绝待审核的绑定，已审核过的绑定跳过，事务提交后异步通知居民"""
+        serializer = BindingReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        approve = serializer.validated_data['action'] == 'approve'
+        new_status = UserHouse.StatusType.APPROVED if approve else UserHouse.StatusType.REJECTED
+        
+        with transaction.atomic():
+            pending = UserHouse.objects.filter(
+                id__in=serializer.validated_data['ids'], status=UserHouse.StatusType.PENDING
+            ).select_for_update()
+            bindings = list(pending.values_list('id', 'user_id', 'house_id'))
+            UserHouse.objects.filter(id__in=[binding_id for binding_id, _, _ in bindings]).update(
+                status=new_status, approved_by_id=request.user.id, approved_at=timezone.now()
+            )
+            title = '房产绑定审核通过' if approve else '房产绑定审核未通过'
+            content = '您提交的房产绑定申请已通过审核。' if approve else '您提交的房产绑定申请未通过审核，如有疑问请联系物业。'
+            notify_users_async((user_id, title, content, binding_id) for binding_id, user_id, _ in bindings)
+            bindings_reviewed.send(
+                sender=UserHouse, bindings=[(user_id, house_id) for _, user_id, house_id in bindings], approved=approve
+            )
+        
+        return Response({
+            'updated': len(bindings),
+            'skipped': len(set(serializer.validated_data['ids'])) - len(bindings),
+        })
+
+
+class CommunityLayoutImportView(APIView):
+    """管理员上传CSV/Excel文件批量导入楼栋房屋"""
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+    # 响应中最多返回的错误行数
+    max_errors = 100
+    
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': '请上传文件'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        community = None
+        community_id = request.data.get('community')
+        if community_id:
+            community = Community.objects.filter(pk=community_id).first()
+            if community is None:
+                return Response({'detail': '小区不存在'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        file_format = 'xlsx' if upload.name.lower().endswith('.xlsx') else 'csv'
+        importer = LayoutImporter(community, dry_run=request.data.get('dry_run') in ('1', 'true'))
+        try:
+            importer.run(read_rows(upload, file_format))
+        except LayoutImportError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'total': importer.total,
+            'created': importer.created,
+            'skipped': importer.skipped,
+            'error_count': len(importer.errors),
+            'errors': [
+                {'line': line_no, 'error': message}
+                for line_no, _, message in importer.errors[:self.max_errors]
+            ],
+        })
+
+
+class CommunityTreeView(APIView):
+    """
+    小区楼栋房屋树，供居民绑定房产时逐级选择
+
+    返回预先生成的JSON：{"id", "name", "buildings": [{"id", "name", "units": [{"unit", "houses": [[id, 房号]]}]}]}，
+    请求头If-None-Match与当前ETag一致时返回304。
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, community_id):
+        tags = {tag.strip() for tag in request.headers.get('If-None-Match', '').split(',') if tag.strip()}
+        if tags:
+            # 只读取版本号和ETag，不读取整棵树
+            etag = get_tree_etag(community_id)
+            if etag is not None and etag in tags:
+                return self.not_modified(etag)
+        
+        data, etag = get_tree(community_id)
+        if data is None:
+            return Response({'detail': '小区不存在'}, status=status.HTTP_404_NOT_FOUND)
+        if etag in tags:
+            return self.not_modified(etag)
+        
+        response = HttpResponse(data, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    
+    def not_modified(self, etag):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class MyArrearsView(APIView):
+    """当前居民已绑定房屋的欠费汇总"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        house_ids = UserHouse.objects.filter(
+            user_id=request.user.id, status=UserHouse.StatusType.APPROVED
+        ).values_list('house_id', flat=True)
+        arrears = get_house_arrears(list(house_ids))
+        return Response(list(arrears.values()))
+
+
+class GateDeviceView(APIView):
+    """门禁设备接口：只接受门禁设备令牌，request.auth为设备，只能访问设备所在小区的通行证"""
+    authentication_classes = [GateDeviceAuthentication]
+    permission_classes = [IsGateDevice]
+
+
+class GateVerifyView(GateDeviceView):
+    """门禁扫码核验访客通行证，核验通过即标记为已使用"""
+    
+    def post(self, request):
+        serializer = GateVerifySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result, data = verify_pass(serializer.validated_data['pass_code'], community_id=request.auth.community_id)
+        body = {'result': result, 'detail': RESULT_MESSAGES[result]}
+        if data is not None:
+            body.update(pass_id=data['id'], house_id=data['house_id'], visitor_name=data['visitor_name'])
+        return Response(body, status=status.HTTP_200_OK if result == RESULT_OK else status.HTTP_403_FORBIDDEN)
+
+
+class VisitorPassTokenView(APIView):
+    """获取访客通行证的离线核验令牌（二维码内容），仅限通行证的创建者"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, pass_id):
+        visitor_pass = VisitorPass.objects.filter(pk=pass_id).first()
+        if visitor_pass is None or (visitor_pass.user_id != request.user.id and not request.user.is_staff):
+            return Response({'detail': '通行证不存在'}, status=status.HTTP_404_NOT_FOUND)
+        if visitor_pass.status != VisitorPass.PassStatus.ACTIVE:
+            return Response({'detail': RESULT_MESSAGES['unavailable']}, status=status.HTTP_400_BAD_REQUEST)
+        if not offline_pass_enabled():
+            return Response({'detail': '离线通行证未启用'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({
+            'token': sign_pass(visitor_pass),
+            'valid_from': visitor_pass.valid_from,
+            'valid_to': visitor_pass.valid_to,
+        })
+
+
+class GateRevocationView(GateDeviceView):
+    """门禁设备定期同步的吊销列表（设备所在小区）"""
+    
+    def get(self, request):
+        generated_at = timezone.now()
+        return Response({
+            'generated_at': int(generated_at.timestamp()),
+            'revoked': get_revoked_pass_ids(request.auth.community_id, generated_at),
+        })
+
+
+class GateScanUploadView(GateDeviceView):
+    """门禁设备批量上传离线扫码记录，设备重传时按(设备, 通行证, 扫码时间)去重"""
+    
+    def post(self, request):
+        serializer = GateScanUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        scans = serializer.validated_data['scans']
+        used = record_scans(request.auth.gate_id, request.auth.community_id, scans)
+        return Response({'received': len(scans), 'used': used})
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MerchantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.merchants'
+
+    def ready(self):
+        # 注册信号处理器
+        from . import signals  # noqa: F401
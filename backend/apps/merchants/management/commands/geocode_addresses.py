@@ -0,0 +1,89 @@
+import csv
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.common import geo
+from apps.communities.models import Community
+from apps.merchants.models import Merchant
+from apps.merchants.nearby import invalidate_nearby
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_address(address):
+    return _SPACES.sub('', address or '')
+
+
+class Command(BaseCommand):
+    """
+    离线地理编码：从本地CSV（address, latitude, longitude）按地址匹配，为小区和商户补全经纬度
+
+    没有可用的外部地理编码服务时，由运营整理地址坐标表后导入；地址比较时忽略空白字符。
+    """
+    help = '从本地CSV导入小区和商户的经纬度'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV文件，列为address, latitude, longitude')
+        parser.add_argument('--model', choices=['community', 'merchant', 'all'], default='all', help='要补全的对象')
+        parser.add_argument('--overwrite', action='store_true', help='覆盖已有的坐标')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批更新的行数')
+
+    def handle(self, *args, **options):
+        coordinates = self.load_csv(options['path'])
+        self.stdout.write(f'读取{len(coordinates)}个地址坐标')
+
+        models = {'community': [Community], 'merchant': [Merchant], 'all': [Community, Merchant]}[options['model']]
+        for model in models:
+            updated, missing = self.geocode(model, coordinates, options['overwrite'], options['batch_size'])
+            self.stdout.write(f'{model._meta.verbose_name}: 更新{updated}个，未匹配{missing}个')
+
+        # 坐标批量变化，全部小区的附近商户列表重新计算
+        invalidate_nearby(list(Community.objects.values_list('id', flat=True)))
+        self.stdout.write(self.style.SUCCESS('导入完成'))
+
+    def load_csv(self, path):
+        coordinates = {}
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    latitude = Decimal(row.get('latitude') or row.get('lat')).quantize(Decimal('0.000001'))
+                    longitude = Decimal(row.get('longitude') or row.get('lng')).quantize(Decimal('0.000001'))
+                except (InvalidOperation, TypeError):
+                    self.stderr.write(f'第{line_no}行: 坐标格式错误')
+                    continue
+                if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                    self.stderr.write(f'第{line_no}行: 坐标超出范围')
+                    continue
+                coordinates[normalize_address(row.get('address'))] = (latitude, longitude)
+        if not coordinates:
+            raise CommandError('CSV中没有有效的地址坐标')
+        return coordinates
+
+    def geocode(self, model, coordinates, overwrite, batch_size):
+        queryset = model.objects.all()
+        if not overwrite:
+            queryset = queryset.filter(latitude__isnull=True)
+        updated = 0
+        missing = 0
+        batch = []
+        for obj in queryset.only('id', 'address').iterator(chunk_size=batch_size):
+            point = coordinates.get(normalize_address(obj.address))
+            if point is None:
+                missing += 1
+                continue
+            obj.latitude, obj.longitude = point
+            obj.geohash = geo.encode(*point)
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                updated += self.save_batch(model, batch)
+                batch = []
+        if batch:
+            updated += self.save_batch(model, batch)
+        return updated, missing
+
+    def save_batch(self, model, batch):
+        # bulk_update不触发信号，附近商户列表在导入结束后统一失效
+        model.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+        return len(batch)
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchant',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True, verbose_name='geohash'),
+        ),
+        migrations.AddField(
+            model_name='merchant',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='纬度'),
+        ),
+        migrations.AddField(
+            model_name='merchant',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='经度'),
+        ),
+        migrations.AddIndex(
+            model_name='merchant',
+            index=models.Index(fields=['status', 'geohash'], name='merchant_status_geohash_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
+from apps.common import geo
 from apps.users.models import User
 
 
@@ -30,6 +31,9 @@ class Merchant(models.Model):
     )
     
     address = models.CharField(_('地址'), max_length=200)
+    latitude = models.DecimalField(_('纬度'), max_digits=9, decimal_places=6, blank=True, null=True)
+    longitude = models.DecimalField(_('经度'), max_digits=9, decimal_places=6, blank=True, null=True)
+    geohash = models.CharField(_('geohash'), max_length=12, blank=True, null=True, editable=False)
     phone = models.CharField(_('联系电话'), max_length=20)
     business_hours = models.CharField(_('营业时间'), max_length=100)
     description = models.TextField(_('服务介绍'))
@@ -47,9 +51,21 @@ class Merchant(models.Model):
     class Meta:
         verbose_name = _('商户')
         verbose_name_plural = _('商户')
+        indexes = [
+            # 附近商户：只查已通过审核的商户，按geohash前缀区间定位
+            models.Index(fields=['status', 'geohash'], name='merchant_status_geohash_idx'),
+        ]
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        # 经纬度变化时同步geohash
+        self.geohash = geo.encode_point(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
 
 
 # 移除不在function-table.md中的MerchantService、MerchantOrder和ServiceReview表
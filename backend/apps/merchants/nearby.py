@@ -0,0 +1,118 @@
+"""
+附近商户
+
+商户和小区按经纬度计算geohash并建立索引。查找某点最近的N个商户时，从较小的格子开始，
+查询“所在格子+周围8个格子”内已通过审核的商户并计算实际距离：格子较短边以内的商户一定已被覆盖，
+数量足够即返回，否则逐级放大格子，不需要扫描全部商户。
+
+每个小区的附近商户列表（商户id和距离）预先计算并缓存，商户新增、移动、删除或审核状态变化时，
+只使其周围一定范围内小区的列表失效，下次读取时重新计算。按服务分类筛选时带分类条件查询格子，不使用缓存列表
+（该分类最近的商户可能不在全部商户的前N个中）。
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from apps.common import geo
+from apps.communities.models import Community
+from .models import Merchant
+
+logger = logging.getLogger(__name__)
+
+NEARBY_CACHE_KEY = 'merchants:nearby:{}'
+NEARBY_CACHE_TIMEOUT = 24 * 60 * 60
+# 每个小区预先计算的附近商户数
+NEARBY_MERCHANT_LIMIT = getattr(settings, 'NEARBY_MERCHANT_LIMIT', 50)
+# 逐级放宽的搜索精度：6位约1.2km×0.6km，5位约4.9km×4.9km，4位约39km×20km，3位约156km×156km
+SEARCH_PRECISIONS = (6, 5, 4, 3)
+# 商户变化时，使该精度格子及邻格内小区的列表失效（与最大搜索范围一致）
+INVALIDATE_PRECISION = SEARCH_PRECISIONS[-1]
+
+
+def _cells_condition(cells):
+    condition = Q()
+    for cell in cells:
+        start, end = geo.prefix_range(cell)
+        cell_condition = Q(geohash__gte=start)
+        if end is not None:
+            cell_condition &= Q(geohash__lt=end)
+        condition |= cell_condition
+    return condition
+
+
+def find_nearest_merchants(latitude, longitude, limit=NEARBY_MERCHANT_LIMIT, category=None):
+    """返回距离指定点最近的已审核商户[(商户id, 距离米)]，按距离升序，category不为空时只查该服务分类"""
+    center = geo.encode(latitude, longitude)
+    approved = Merchant.objects.filter(status=Merchant.MerchantStatus.APPROVED)
+    if category:
+        approved = approved.filter(service_categories=category)
+    for precision in SEARCH_PRECISIONS:
+        cell = center[:precision]
+        rows = approved.filter(_cells_condition(geo.neighbors(cell))).values_list('id', 'latitude', 'longitude')
+        results = sorted(
+            (geo.distance(latitude, longitude, lat, lng), merchant_id) for merchant_id, lat, lng in rows
+        )
+        radius = geo.cell_radius(cell)
+        covered = [item for item in results if item[0] <= radius]
+        if len(covered) >= limit:
+            results = covered
+            break
+    return [(merchant_id, round(meters)) for meters, merchant_id in results[:limit]]
+
+
+def _community_point(community_id):
+    """小区的(纬度, 经度)，小区不存在或没有坐标时返回None"""
+    community = Community.objects.filter(pk=community_id).values('latitude', 'longitude').first()
+    if community is None or community['latitude'] is None or community['longitude'] is None:
+        return None
+    return community['latitude'], community['longitude']
+
+
+def get_nearby_merchants(community_id, category=None):
+    """
+    获取小区的附近商户[(商户id, 距离米)]，小区不存在或没有坐标时返回None
+    不筛选分类时使用预先计算的列表，筛选分类时按格子实时查询该分类的商户
+    """
+    if category:
+        point = _community_point(community_id)
+        return None if point is None else find_nearest_merchants(*point, category=category)
+
+    key = NEARBY_CACHE_KEY.format(community_id)
+    try:
+        cached = cache.get(key)
+    except Exception:
+        logger.warning('读取附近商户缓存失败，回退到数据库', exc_info=True)
+        cached = None
+    if cached is not None:
+        return [tuple(item) for item in cached]
+
+    point = _community_point(community_id)
+    if point is None:
+        return None
+    nearby = find_nearest_merchants(*point)
+    try:
+        cache.set(key, nearby, NEARBY_CACHE_TIMEOUT)
+    except Exception:
+        logger.warning('写入附近商户缓存失败', exc_info=True)
+    return nearby
+
+
+def invalidate_nearby(community_ids):
+    try:
+        cache.delete_many([NEARBY_CACHE_KEY.format(community_id) for community_id in community_ids])
+    except Exception:
+        logger.warning('删除附近商户缓存失败', exc_info=True)
+
+
+def invalidate_nearby_around(geohashes):
+    """使指定位置附近小区的附近商户列表失效"""
+    cells = set()
+    for value in geohashes:
+        if value:
+            cells.update(geo.neighbors(value[:INVALIDATE_PRECISION]))
+    if not cells:
+        return
+    community_ids = Community.objects.filter(_cells_condition(cells)).values_list('id', flat=True)
+    invalidate_nearby(list(community_ids))
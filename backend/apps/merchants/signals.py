@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.communities.models import Community
+from .models import Merchant
+from .nearby import invalidate_nearby, invalidate_nearby_around
+
+
+@receiver(pre_save, sender=Merchant)
+def remember_merchant_location(sender, instance, **kwargs):
+    """记录商户修改前的位置，移动后新旧位置附近的小区都需要刷新"""
+    instance._previous_geohash = Merchant.objects.filter(pk=instance.pk).values_list('geohash', flat=True).first()
+
+
+@receiver(post_save, sender=Merchant)
+@receiver(post_delete, sender=Merchant)
+def refresh_nearby_merchants(sender, instance, **kwargs):
+    """商户变更后使附近小区的商户列表失效"""
+    geohashes = {instance.geohash, getattr(instance, '_previous_geohash', None)}
+    transaction.on_commit(lambda: invalidate_nearby_around(geohashes))
+
+
+@receiver(post_save, sender=Community)
+def refresh_community_nearby(sender, instance, update_fields=None, **kwargs):
+    """小区坐标变化后重新计算其附近商户"""
+    if update_fields is None or {'latitude', 'longitude', 'geohash'} & set(update_fields):
+        transaction.on_commit(lambda: invalidate_nearby([instance.id]))
@@ -1,3 +1,116 @@
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.common import geo
+from apps.communities.models import Community
+from apps.users.models import User
+from .models import Merchant
+from .nearby import NEARBY_MERCHANT_LIMIT, find_nearest_merchants
+from decimal import Decimal
+from io import StringIO
+import os
+import random
+import tempfile
 
-# Create your tests here.
+
+class GeoTests(TestCase):
+    """geohash工具测试类"""
+    
+    def test_encode(self):
+        """测试geohash编码与公开参考值一致"""
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+    
+    def test_neighbors(self):
+        """测试邻近格子包含自身且互不重复"""
+        cells = geo.neighbors('wx4g0')
+        self.assertEqual(len(cells), 9)
+        self.assertIn('wx4g0', cells)
+    
+    def test_prefix_range(self):
+        """测试前缀区间上界取下一个BASE32前缀并进位，不依赖数据库排序规则中符号的位置"""
+        self.assertEqual(geo.prefix_range('wx4g0'), ('wx4g0', 'wx4g1'))
+        self.assertEqual(geo.prefix_range('wx4gz'), ('wx4gz', 'wx4h'))
+        self.assertEqual(geo.prefix_range('wzz'), ('wzz', 'x'))
+        self.assertEqual(geo.prefix_range('zz'), ('zz', None))
+        start, end = geo.prefix_range('wx4g0')
+        self.assertTrue(start <= geo.encode(39.9042, 116.4074, 5) + 'zzzz' < end)
+
+
+class NearbyMerchantTests(TestCase):
+    """附近商户测试类"""
+    
+    def setUp(self):
+        cache.clear()
+        self.community = Community.objects.create(
+            name='阳光小区', address='北京市东城区幸福路1号', property_phone='010-12345678',
+            fee_standard=Decimal('2.00'), latitude=Decimal('39.904200'), longitude=Decimal('116.407400')
+        )
+        self.next_id = 1
+        user = User.objects.create_user(username='resident', phone='13900001100', password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+    
+    def add_merchant(self, lat, lng, status=Merchant.MerchantStatus.APPROVED, category=None):
+        merchant = Merchant.objects.create(
+            id=self.next_id, name=f'商户{self.next_id}', address='地址', phone='1', business_hours='9-18',
+            description='', status=status, service_categories=category,
+            latitude=Decimal(str(round(lat, 6))), longitude=Decimal(str(round(lng, 6)))
+        )
+        self.next_id += 1
+        return merchant
+    
+    def test_nearest_matches_brute_force(self):
+        """测试geohash分桶查询的结果与全量计算一致"""
+        rng = random.Random(7)
+        for _ in range(300):
+            self.add_merchant(39.9042 + rng.uniform(-0.5, 0.5), 116.4074 + rng.uniform(-0.5, 0.5))
+        expected = sorted(
+            (geo.distance(39.9042, 116.4074, m.latitude, m.longitude), m.id) for m in Merchant.objects.all()
+        )[:20]
+        nearest = find_nearest_merchants(Decimal('39.9042'), Decimal('116.4074'), limit=20)
+        self.assertEqual([merchant_id for merchant_id, _ in nearest], [merchant_id for _, merchant_id in expected])
+    
+    def test_endpoint_refreshes_on_merchant_change(self):
+        """测试商户变更后小区的附近商户列表刷新"""
+        far = self.add_merchant(39.95, 116.45, category=Merchant.ServiceCategory.FOOD_BEVERAGE)
+        url = reverse('merchant-nearby') + f'?community={self.community.id}'
+        response = self.client.get(url)
+        self.assertEqual([row['id'] for row in response.data], [far.id])
+        self.assertGreater(response.data[0]['distance'], 5000)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            near = self.add_merchant(39.9043, 116.4075)
+            self.add_merchant(39.9041, 116.4073, status=Merchant.MerchantStatus.PENDING)
+        response = self.client.get(url)
+        self.assertEqual([row['id'] for row in response.data], [near.id, far.id])
+        
+        response = self.client.get(url + '&category=FOOD_BEVERAGE')
+        self.assertEqual([row['id'] for row in response.data], [far.id])
+        for limit in ['0', '-1', 'abc']:
+            self.assertEqual(self.client.get(url + f'&limit={limit}').status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_category_beyond_precomputed_list(self):
+        """测试分类筛选不受预先计算的前N个商户限制"""
+        for i in range(NEARBY_MERCHANT_LIMIT + 5):
+            self.add_merchant(39.9042 + i * 0.0001, 116.4074)
+        food = self.add_merchant(39.96, 116.46, category=Merchant.ServiceCategory.FOOD_BEVERAGE)
+        url = reverse('merchant-nearby') + f'?community={self.community.id}'
+        self.assertNotIn(food.id, [row['id'] for row in self.client.get(url + '&limit=50').data])
+        response = self.client.get(url + '&category=FOOD_BEVERAGE')
+        self.assertEqual([row['id'] for row in response.data], [food.id])
+    
+    def test_geocode_import(self):
+        """测试从本地CSV补全坐标"""
+        Merchant.objects.create(id=99, name='便利店', address='北京市 东城区 幸福路2号', phone='1',
+                                business_hours='24h', description='')
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write('address,latitude,longitude\n北京市东城区幸福路2号,39.9050,116.4080\n')
+        self.addCleanup(os.remove, path)
+        call_command('geocode_addresses', path, stdout=StringIO())
+        merchant = Merchant.objects.get(id=99)
+        self.assertEqual(merchant.latitude, Decimal('39.905000'))
+        self.assertEqual(merchant.geohash, geo.encode(39.905, 116.408))
@@ -1,5 +1,7 @@
 from django.urls import path
 
+from .views import NearbyMerchantsView
+
 urlpatterns = [
-    # 视图将在后续开发中添加
-]
\ No newline at end of file
+    path('nearby/', NearbyMerchantsView.as_view(), name='merchant-nearby'),
+]
@@ -1,3 +1,47 @@
-from django.shortcuts import render
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .models import Merchant
+from .nearby import NEARBY_MERCHANT_LIMIT, get_nearby_merchants
+
+# 附近商户列表返回的商户字段
+NEARBY_FIELDS = ['id', 'name', 'service_categories', 'address', 'phone', 'business_hours', 'images']
+
+
+class NearbyMerchantsView(APIView):
+    """小区附近的商户，按距离排序，支持?category=按服务分类筛选、?limit=限制条数"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        try:
+            community_id = int(request.query_params['community'])
+        except (KeyError, ValueError):
+            return Response({'detail': '请指定小区'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({'detail': 'limit必须是正整数'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, NEARBY_MERCHANT_LIMIT)
+        
+        category = request.query_params.get('category')
+        nearby = get_nearby_merchants(community_id, category)
+        if nearby is None:
+            return Response({'detail': '小区不存在或未设置坐标'}, status=status.HTTP_404_NOT_FOUND)
+        
+        distances = dict(nearby)
+        merchants = Merchant.objects.filter(id__in=distances, status=Merchant.MerchantStatus.APPROVED)
+        if category:
+            merchants = merchants.filter(service_categories=category)
+        rows = {row['id']: row for row in merchants.values(*NEARBY_FIELDS)}
+        
+        results = []
+        for merchant_id, meters in nearby:
+            row = rows.get(merchant_id)
+            if row is not None:
+                results.append(dict(row, distance=meters))
+                if len(results) >= limit:
+                    break
+        return Response(results)
@@ -0,0 +1,65 @@
+"""
+批量通知
+
+业务操作（如批量审核）一次涉及成百上千个用户时，通知在事务提交后交给后台线程批量写入，
+不占用请求时间；NOTIFICATIONS_ASYNC为False时（如测试）在提交后同步写入。
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from apps.common.ids import allocate_ids
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'NOTIFICATIONS_WORKERS', 2),
+                                       thread_name_prefix='notifications')
+    return _executor
+
+
+def create_notifications(messages, notification_type=Notification.NotificationType.SYSTEM, batch_size=1000):
+    """批量写入通知，messages为(user_id, 标题, 内容, 关联业务ID)的列表，返回写入条数"""
+    messages = list(messages)
+    if not messages:
+        return 0
+    ids = allocate_ids(Notification, len(messages))
+    Notification.objects.bulk_create([
+        Notification(id=notification_id, user_id=user_id, title=title, content=content,
+                     notification_type=notification_type, related_id=related_id)
+        for notification_id, (user_id, title, content, related_id) in zip(ids, messages)
+    ], batch_size=batch_size)
+    return len(messages)
+
+
+def _run_in_thread(messages, notification_type):
+    close_old_connections()
+    try:
+        create_notifications(messages, notification_type)
+    except Exception:
+        logger.exception('批量写入通知失败')
+    finally:
+        connection.close()
+
+
+def notify_users_async(messages, notification_type=Notification.NotificationType.SYSTEM):
+    """在当前事务提交后批量写入通知，事务回滚时不写入"""
+    messages = list(messages)
+    if not messages:
+        return
+
+    def dispatch():
+        if getattr(settings, 'NOTIFICATIONS_ASYNC', True):
+            _get_executor().submit(_run_in_thread, messages, notification_type)
+        else:
+            create_notifications(messages, notification_type)
+
+    transaction.on_commit(dispatch)
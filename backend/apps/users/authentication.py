@@ -0,0 +1,91 @@
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import get_user_state
+from .models import User
+
+
+class ClaimsUser(TokenUser):
+    """
+    基于令牌声明构造的轻量用户对象
+
+    id、角色、员工/超级用户、黑名单等常用字段直接取自令牌声明，
+    访问声明中没有的字段（如openid、avatar_url）时才按需查询数据库。
+    """
+
+    def __str__(self):
+        return self.username or self.phone or f'用户-{self.id}'
+
+    @cached_property
+    def phone(self):
+        return self.token.get('phone')
+
+    @cached_property
+    def role_id(self):
+        return self.token.get('role_id')
+
+    @cached_property
+    def is_blacklisted(self):
+        return self.token.get('is_blacklisted', False)
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', True)
+
+    def apply_state(self, state):
+        """用缓存中的最新账号状态覆盖令牌声明"""
+        self.__dict__.update(state)
+
+    @cached_property
+    def db_user(self):
+        """对应的数据库用户对象，首次访问时才查询"""
+        try:
+            return User.objects.get(pk=self.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+    def __getattr__(self, attr):
+        # 声明中没有的字段回退到数据库用户对象
+        if attr.startswith('_') or attr == 'token':
+            raise AttributeError(attr)
+        return getattr(self.db_user, attr)
+
+    def save(self, *args, **kwargs):
+        return self.db_user.save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self.db_user.delete(*args, **kwargs)
+
+    def set_password(self, raw_password):
+        return self.db_user.set_password(raw_password)
+
+    def check_password(self, raw_password):
+        return self.db_user.check_password(raw_password)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    无状态JWT认证，不在每个请求上查询用户表
+
+    账号被拉黑、停用或删除后，状态通过缓存覆盖令牌声明，数秒内即可生效。
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = ClaimsUser(validated_token)
+        state = get_user_state(user.id)
+        if state:
+            user.apply_state(state)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if user.is_blacklisted:
+            raise AuthenticationFailed('用户已被加入黑名单', code='user_blacklisted')
+
+        return user
@@ -0,0 +1,38 @@
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+from .models import User
+from .phone import phone_lookup_key
+
+
+class UsernameOrPhoneBackend(ModelBackend):
+    """
+    用户名或手机号登录认证后端
+
+    通过一次查询同时匹配用户名和手机号查询键（两者均有唯一索引），
+    username参数中填写手机号同样可以登录。
+    """
+
+    def authenticate(self, request, username=None, password=None, phone=None, **kwargs):
+        identifier = username or phone
+        if not identifier or password is None:
+            return None
+
+        condition = Q()
+        if username:
+            condition |= Q(username=username)
+        lookup_key = phone_lookup_key(phone or username)
+        if lookup_key:
+            condition |= Q(phone_hash=lookup_key)
+
+        candidates = list(User.objects.filter(condition)[:2])
+        if not candidates:
+            # 与ModelBackend一致，运行一次哈希以减小存在/不存在用户之间的时间差
+            User().set_password(password)
+            return None
+
+        # 用户名与另一用户的手机号相同时，优先匹配用户名
+        user = next((c for c in candidates if username and c.username == username), candidates[0])
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,228 @@
+"""
+角色权限缓存
+
+权限检查在每个请求上都需要读取用户角色，这里做两级缓存：
+进程内LRU（零网络开销） -> CACHES['default']（Redis） -> 数据库。
+角色保存/删除时通过信号失效缓存，JWT中携带的role_version可在不查询的情况下识别过期的本地缓存。
+
+另外维护用户账号状态覆盖表：用户被拉黑、停用或修改角色后，将最新状态写入Redis，
+无状态JWT认证据此在数秒内让已签发令牌中的声明失效。
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserRole
+
+logger = logging.getLogger(__name__)
+
+# Redis缓存键前缀
+ROLE_CACHE_KEY = 'users:role:{}'
+# Redis中角色缓存的过期时间（秒）
+ROLE_CACHE_TIMEOUT = getattr(settings, 'ROLE_CACHE_TIMEOUT', 60 * 60)
+# 进程内缓存的过期时间（秒），兜底其他进程修改角色后本进程未收到信号的情况
+ROLE_LOCAL_CACHE_TIMEOUT = getattr(settings, 'ROLE_LOCAL_CACHE_TIMEOUT', 30)
+# 进程内缓存的最大条目数
+ROLE_LOCAL_CACHE_SIZE = getattr(settings, 'ROLE_LOCAL_CACHE_SIZE', 256)
+
+# 角色类型 -> 默认角色id 的缓存键前缀
+ROLE_TYPE_CACHE_KEY = 'users:role_type:{}'
+
+# 用户账号状态缓存键前缀
+USER_STATE_KEY = 'users:state:{}'
+# 进程内账号状态的过期时间（秒），即拉黑/停用生效的最大延迟
+USER_STATE_LOCAL_TIMEOUT = getattr(settings, 'USER_STATE_LOCAL_TIMEOUT', 5)
+# 进程内账号状态缓存的最大条目数
+USER_STATE_LOCAL_CACHE_SIZE = getattr(settings, 'USER_STATE_LOCAL_CACHE_SIZE', 10000)
+
+# 角色不存在时写入缓存的占位值，避免无效role_id反复穿透到数据库
+_MISSING = {}
+
+
+class LocalLRUCache:
+    """线程安全的进程内LRU缓存，条目带过期时间"""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_role_cache = LocalLRUCache(ROLE_LOCAL_CACHE_SIZE, ROLE_LOCAL_CACHE_TIMEOUT)
+local_user_state_cache = LocalLRUCache(USER_STATE_LOCAL_CACHE_SIZE, USER_STATE_LOCAL_TIMEOUT)
+
+
+def serialize_role(role):
+    """将角色对象转换为可缓存的字典"""
+    return {
+        'id': role.id,
+        'name': role.name,
+        'role_type': role.role_type,
+        'permissions': role.permissions or {},
+        'version': role.version,
+    }
+
+
+def _load_role(role_id):
+    """从Redis或数据库加载角色，返回字典，不存在时返回_MISSING"""
+    key = ROLE_CACHE_KEY.format(role_id)
+    try:
+        data = cache.get(key)
+    except Exception:
+        # Redis不可用时直接查库，不影响权限判断
+        logger.warning('读取角色缓存失败，回退到数据库', exc_info=True)
+        data = None
+    if data is not None:
+        return data
+
+    role = UserRole.objects.filter(id=role_id).first()
+    data = serialize_role(role) if role else _MISSING
+    try:
+        cache.set(key, data, ROLE_CACHE_TIMEOUT)
+    except Exception:
+        logger.warning('写入角色缓存失败', exc_info=True)
+    return data
+
+
+def get_role(role_id, min_version=None):
+    """
+    获取角色信息字典，角色不存在时返回None
+
+    min_version通常取自JWT中的role_version声明：本地缓存的版本低于它时，
+    说明角色在其他进程中已被修改，需要跳过本地缓存重新加载。
+    """
+    if not role_id:
+        return None
+
+    data = local_role_cache.get(role_id)
+    if data is not None and min_version is not None and data.get('version', 0) < min_version:
+        data = None
+    if data is None:
+        data = _load_role(role_id)
+        if min_version is not None and data.get('version', 0) < min_version:
+            # Redis中的数据同样过期，直接以数据库为准
+            invalidate_role(role_id)
+            data = _load_role(role_id)
+        local_role_cache.set(role_id, data)
+    return data or None
+
+
+def get_request_role(request):
+    """获取当前请求用户的角色信息，优先使用令牌中的角色版本"""
+    user = request.user
+    min_version = None
+    token = getattr(request, 'auth', None)
+    if token is not None and hasattr(token, 'get'):
+        if token.get('role_id') == user.role_id:
+            min_version = token.get('role_version')
+    return get_role(user.role_id, min_version)
+
+
+def get_default_role_id(role_type):
+    """获取指定类型的默认角色id（id最小的角色），不存在时返回None"""
+    local_key = ('role_type', role_type)
+    role_id = local_role_cache.get(local_key)
+    if role_id is not None:
+        return role_id or None
+
+    key = ROLE_TYPE_CACHE_KEY.format(role_type)
+    try:
+        role_id = cache.get(key)
+    except Exception:
+        logger.warning('读取角色缓存失败，回退到数据库', exc_info=True)
+        role_id = None
+    if role_id is None:
+        # 0表示该类型没有角色
+        role_id = UserRole.objects.filter(role_type=role_type).order_by('id').values_list('id', flat=True).first() or 0
+        try:
+            cache.set(key, role_id, ROLE_CACHE_TIMEOUT)
+        except Exception:
+            logger.warning('写入角色缓存失败', exc_info=True)
+    local_role_cache.set(local_key, role_id)
+    return role_id or None
+
+
+def invalidate_role(role_id, role_type=None):
+    """使指定角色的两级缓存失效"""
+    local_role_cache.delete(role_id)
+    keys = [ROLE_CACHE_KEY.format(role_id)]
+    # 角色类型可能被修改，所有类型的默认角色都需要重新解析
+    for value in set(UserRole.RoleType.values) | ({role_type} if role_type else set()):
+        local_role_cache.delete(('role_type', value))
+        keys.append(ROLE_TYPE_CACHE_KEY.format(value))
+    try:
+        cache.delete_many(keys)
+    except Exception:
+        logger.warning('删除角色缓存失败', exc_info=True)
+
+
+def _user_state_timeout():
+    """账号状态只需保留到此前签发的访问令牌全部过期为止"""
+    lifetime = settings.SIMPLE_JWT.get('ACCESS_TOKEN_LIFETIME')
+    return int(lifetime.total_seconds()) if lifetime else None
+
+
+def serialize_user_state(user):
+    """提取令牌声明中可能过期的账号字段"""
+    return {
+        'is_active': user.is_active and not user.is_deleted,
+        'is_blacklisted': user.is_blacklisted,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'role_id': user.role_id,
+    }
+
+
+def publish_user_state(user_id, state):
+    """写入用户最新的账号状态，覆盖已签发令牌中的声明"""
+    local_user_state_cache.delete(user_id)
+    try:
+        cache.set(USER_STATE_KEY.format(user_id), state, _user_state_timeout())
+    except Exception:
+        logger.warning('写入账号状态缓存失败', exc_info=True)
+
+
+def get_user_state(user_id):
+    """获取用户账号状态覆盖值，令牌签发后账号未变更时返回None"""
+    state = local_user_state_cache.get(user_id)
+    if state is None:
+        try:
+            state = cache.get(USER_STATE_KEY.format(user_id)) or _MISSING
+        except Exception:
+            # Redis不可用时以令牌声明为准
+            logger.warning('读取账号状态缓存失败', exc_info=True)
+            return None
+        local_user_state_cache.set(user_id, state)
+    return state or None
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register(checks.Tags.security)
+def check_phone_hash_key(app_configs=None, **kwargs):
+    """手机号查询键的HMAC密钥必须单独配置"""
+    if not settings.PHONE_HASH_KEY:
+        return [checks.Error('未配置PHONE_HASH_KEY', hint='在环境变量或.env中配置独立的密钥', id='users.E001')]
+    if settings.PHONE_HASH_KEY == settings.SECRET_KEY:
+        return [checks.Error(
+            'PHONE_HASH_KEY与SECRET_KEY相同', hint='轮换SECRET_KEY会使所有手机号查询键失效，请配置独立的密钥',
+            id='users.E002',
+        )]
+    return []
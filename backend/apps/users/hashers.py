@@ -0,0 +1,53 @@
+"""
+密码哈希策略
+
+按用户身份选择不同强度的哈希配置（PASSWORD_HASH_PROFILES）：员工、管理员始终使用strong，
+其他用户按角色类型在PASSWORD_HASH_ROLE_PROFILES中查找，未配置时使用strong。
+哈希中记录了迭代次数，任意配置生成的哈希都能被校验；登录成功时如果用户当前适用的配置与
+已存储哈希不一致，会透明地按新配置重新哈希。
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+
+DEFAULT_PROFILE = 'strong'
+
+
+class ProfilePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """迭代次数可按实例配置的PBKDF2哈希器，算法标识与Django默认的pbkdf2_sha256一致"""
+
+    def __init__(self, iterations=None):
+        if iterations:
+            self.iterations = iterations
+
+
+def get_profile_hasher(profile):
+    """按配置名获取哈希器"""
+    profiles = settings.PASSWORD_HASH_PROFILES
+    return ProfilePBKDF2PasswordHasher(profiles.get(profile, profiles[DEFAULT_PROFILE])['iterations'])
+
+
+def hash_password(item):
+    """
+    按(明文密码, 迭代次数)生成哈希，密码为空时生成不可用密码，供批量导入的进程池调用
+    不读取配置、不依赖应用注册表，以spawn方式启动的子进程（Windows）中也能直接执行
+    """
+    password, iterations = item
+    if not password:
+        return make_password(None)
+    return make_password(password, hasher=ProfilePBKDF2PasswordHasher(iterations))
+
+
+def get_user_profile(user):
+    """获取用户适用的哈希配置名"""
+    if user.is_staff or user.is_superuser or not user.role_id:
+        return DEFAULT_PROFILE
+    from .cache import get_role
+    role = get_role(user.role_id)
+    if role is None:
+        return DEFAULT_PROFILE
+    return settings.PASSWORD_HASH_ROLE_PROFILES.get(role['role_type'], DEFAULT_PROFILE)
+
+
+def get_user_hasher(user):
+    """获取用户适用的哈希器"""
+    return get_profile_hasher(get_user_profile(user))
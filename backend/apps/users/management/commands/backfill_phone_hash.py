@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.models import User
+from apps.users.phone import backfill_phone_hash
+
+
+class Command(BaseCommand):
+    """按主键分批回填用户的手机号查询键"""
+    help = '回填users.User.phone_hash（轮换PHONE_HASH_KEY后执行；新增字段时的回填由数据迁移完成）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批处理的用户数')
+        parser.add_argument('--all', action='store_true', help='重新计算所有用户（轮换密钥后使用），默认只处理未回填的用户')
+
+    def handle(self, *args, **options):
+        queryset = User.all_with_deleted.all()
+        if not options['all']:
+            queryset = queryset.filter(phone_hash__isnull=True)
+        updated, conflicts = backfill_phone_hash(queryset, options['batch_size'])
+
+        for user in conflicts:
+            self.stderr.write(f'手机号规范化后与其他用户重复，未回填: id={user.id} phone={user.phone}')
+        self.stdout.write(self.style.SUCCESS(f'回填完成：更新{updated}个用户，冲突{len(conflicts)}个'))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.common.redis_client import get_redis_client
+from apps.users.throttling import LoginRateThrottle
+
+
+class Command(BaseCommand):
+    """测量登录限流对每个请求增加的耗时（IP、用户名、手机号三个维度一次检查）"""
+    help = '报告登录限流每次检查的平均及P99耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='模拟的登录请求数')
+        parser.add_argument('--users', type=int, default=1000, help='轮换使用的不同用户名/IP数量')
+        parser.add_argument('--threshold-ms', type=float, default=1.0, help='单次检查允许的P99耗时（毫秒）')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        users = options['users']
+        requests = []
+        for i in range(users):
+            request = factory.post('/api/users/auth/login/', {'username': f'bench_{i}', 'phone': f'139{i:08d}'},
+                                   format='json', REMOTE_ADDR=f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}')
+            request = Request(request, parsers=[JSONParser()])
+            request.data  # 预先解析请求体，只测量限流本身
+            requests.append(request)
+
+        throttle = LoginRateThrottle()
+        # 预热：加载Lua脚本、建立连接
+        throttle.allow_request(requests[0], None)
+
+        timings = []
+        rejected = 0
+        for i in range(options['requests']):
+            start = time.perf_counter()
+            if not throttle.allow_request(requests[i % users], None):
+                rejected += 1
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        mean = sum(timings) / len(timings) * 1000
+        p99 = timings[int(len(timings) * 0.99) - 1] * 1000
+        backend = 'redis' if get_redis_client() is not None else 'local'
+        self.stdout.write(f'后端: {backend}，请求数: {len(timings)}，被限流: {rejected}')
+        self.stdout.write(f'平均: {mean:.3f}ms，P50: {timings[len(timings) // 2] * 1000:.3f}ms，P99: {p99:.3f}ms')
+        if p99 < options['threshold_ms']:
+            self.stdout.write(self.style.SUCCESS(f'P99低于{options["threshold_ms"]}ms'))
+        else:
+            self.stdout.write(self.style.WARNING(f'P99超过{options["threshold_ms"]}ms'))
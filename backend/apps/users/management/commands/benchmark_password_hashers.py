@@ -0,0 +1,43 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.users.hashers import get_profile_hasher
+
+
+def _measure(profile, seconds):
+    """在当前进程中持续校验密码，返回每秒校验次数"""
+    hasher = get_profile_hasher(profile)
+    encoded = hasher.encode('benchmark-password', hasher.salt())
+    count = 0
+    start = time.perf_counter()
+    while True:
+        hasher.verify('benchmark-password', encoded)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+class Command(BaseCommand):
+    """测量各密码哈希配置在本机上的登录吞吐量（每次登录一次密码校验）"""
+    help = '报告每种密码哈希配置在本机上的登录次数/秒'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0, help='每种配置的测量时长')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='并行测量的进程数，用于估算整机吞吐量')
+
+    def handle(self, *args, **options):
+        seconds = options['seconds']
+        processes = options['processes']
+
+        self.stdout.write(f'{"配置":<10}{"迭代次数":>10}{"单核 登录/秒":>16}{f"{processes}进程 登录/秒":>18}')
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for profile, config in settings.PASSWORD_HASH_PROFILES.items():
+                single = _measure(profile, seconds)
+                total = sum(executor.map(_measure, [profile] * processes, [seconds] * processes))
+                self.stdout.write(f'{profile:<10}{config["iterations"]:>10}{single:>16.1f}{total:>18.1f}')
@@ -0,0 +1,75 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.users.models import User, UserRole
+
+
+class Command(BaseCommand):
+    """对比微信登录用户写入的新旧实现：每次登录的SQL查询数和耗时（在事务中执行并回滚）"""
+    help = '对比微信登录用户upsert新旧实现的每次登录查询数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200, help='每种场景模拟的登录次数')
+
+    def handle(self, *args, **options):
+        logins = options['logins']
+        with transaction.atomic():
+            if not UserRole.objects.filter(role_type=UserRole.RoleType.RESIDENT).exists():
+                UserRole.objects.create(
+                    id=(UserRole.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1,
+                    name=f'benchmark_resident_{uuid.uuid4().hex[:6]}',
+                    role_type=UserRole.RoleType.RESIDENT
+                )
+            prefix = f'bench_{uuid.uuid4().hex[:8]}'
+            openids = [f'{prefix}_{i}' for i in range(logins)]
+
+            rows = []
+            for label, login in (('旧实现', self.legacy_login), ('upsert_wechat_user', self.upsert_login)):
+                # 首次登录（新用户）和再次登录（老用户，头像未变化）
+                ids = [f'{openid}_{label[:3]}' for openid in openids]
+                avatar = 'https://example.com/avatar.jpg'
+                for scenario in ('首次登录', '再次登录'):
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        for openid in ids:
+                            login(openid, avatar)
+                        elapsed = time.perf_counter() - start
+                    # 外层基准事务产生的SAVEPOINT语句在生产的自动提交模式下不存在，不计入
+                    queries = [q for q in ctx.captured_queries if not self.is_savepoint(q['sql'])]
+                    rows.append((label, scenario, len(queries) / logins, logins / elapsed))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"实现":<20}{"场景":<10}{"查询数/次":>10}{"登录/秒":>12}')
+        for label, scenario, queries, rate in rows:
+            self.stdout.write(f'{label:<20}{scenario:<10}{queries:>10.1f}{rate:>12.0f}')
+
+    @staticmethod
+    def is_savepoint(sql):
+        return sql.upper().startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'))
+
+    @staticmethod
+    def legacy_login(openid, avatar_url):
+        """原WeChatLoginView中的写入逻辑（原代码phone=''无法通过create_user校验，这里直接构造）"""
+        try:
+            user = User.objects.get(openid=openid)
+        except User.DoesNotExist:
+            user = User(username=f'wx_{openid[:10]}_{str(uuid.uuid4())[:8]}', openid=openid,
+                        avatar_url=avatar_url, is_active=True)
+            user.set_password(None)
+            user.save()
+            resident_role = UserRole.objects.filter(role_type='resident').first()
+            if resident_role:
+                user.role_id = resident_role.id
+                user.save()
+        if avatar_url and not user.avatar_url:
+            user.avatar_url = avatar_url
+            user.save()
+        return user
+
+    @staticmethod
+    def upsert_login(openid, avatar_url):
+        return User.objects.upsert_wechat_user(openid, avatar_url=avatar_url)[0]
@@ -0,0 +1,253 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from apps.users.hashers import get_user_hasher, hash_password
+from apps.users.models import User, UserRole
+from apps.users.phone import phone_lookup_key
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', '是'}
+
+
+def _parse_bool(value, default=False):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+class RowError(Exception):
+    """单行数据校验失败"""
+
+
+class Command(BaseCommand):
+    """
+    批量导入用户（物业员工、居民）
+
+    流式读取CSV/JSONL文件，按块校验、在进程池中并行哈希密码、bulk_create分批写入，
+    单行错误只跳过该行并记录，不中断整个导入。--dry-run只校验，不哈希密码。
+    字段：username, phone, password, role（角色id/名称/类型）, openid, avatar_url, is_staff, is_active
+    """
+    help = '从CSV或JSONL文件批量导入用户'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV或JSONL文件路径')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='文件格式，默认按扩展名判断')
+        parser.add_argument('--default-role',
+                            help='行中未指定role时使用的角色（id/名称/类型），默认使用居民角色（如果存在）')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每次读取并校验的行数')
+        parser.add_argument('--batch-size', type=int, default=500, help='bulk_create每条INSERT的行数')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='密码哈希进程数')
+        parser.add_argument('--errors-file', help='将出错行写入该CSV文件')
+        parser.add_argument('--dry-run', action='store_true', help='只校验不写入')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+
+        # 角色只在开始时解析一次
+        self.roles = self.load_roles()
+        if options['default_role']:
+            self.default_role_id = self.resolve_role(options['default_role'])
+        else:
+            self.default_role_id = self.roles.get(UserRole.RoleType.RESIDENT)
+
+        created = 0
+        errors = []
+        total = 0
+        start = time.perf_counter()
+
+        # 子进程只做哈希计算，不访问数据库；dry-run不需要哈希，不启动进程池
+        self.workers = options['workers']
+        pool = nullcontext() if self.dry_run else ProcessPoolExecutor(max_workers=self.workers)
+        with pool as executor, open(path, encoding='utf-8-sig', newline='') as f:
+            rows = self.read_csv(f) if file_format == 'csv' else self.read_jsonl(f)
+            while True:
+                chunk = list(islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                total += len(chunk)
+                chunk_created, chunk_errors = self.import_chunk(chunk, executor)
+                created += chunk_created
+                errors.extend(chunk_errors)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'已处理{total}行，导入{created}行，错误{len(errors)}行，{total / elapsed:.0f}行/秒')
+
+        elapsed = time.perf_counter() - start
+        for line_no, row, message in errors:
+            self.stderr.write(f'第{line_no}行: {message}')
+        if options['errors_file'] and errors:
+            self.write_errors(options['errors_file'], errors)
+
+        summary = f'共{total}行，导入{created}行，错误{len(errors)}行，耗时{elapsed:.1f}秒（{total / elapsed if elapsed else 0:.0f}行/秒）'
+        if self.dry_run:
+            summary = '[dry-run] ' + summary
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def read_csv(self, f):
+        reader = csv.DictReader(f)
+        for line_no, row in enumerate(reader, start=2):
+            yield line_no, row
+
+    def read_jsonl(self, f):
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError:
+                yield line_no, None
+
+    def load_roles(self):
+        roles = {}
+        for role in UserRole.objects.order_by('-id'):
+            # 按id倒序写入，同一类型保留id最小的角色
+            roles[str(role.id)] = role.id
+            roles[role.name] = role.id
+            roles[role.role_type] = role.id
+        return roles
+
+    def resolve_role(self, value):
+        if value in (None, ''):
+            return None
+        role_id = self.roles.get(str(value).strip())
+        if role_id is None:
+            raise CommandError(f'角色不存在: {value}')
+        return role_id
+
+    def validate_row(self, row):
+        """校验单行并构造未保存的用户对象"""
+        if not isinstance(row, dict):
+            raise RowError('无法解析该行')
+        username = _clean(row.get('username'))
+        phone = _clean(row.get('phone'))
+        openid = _clean(row.get('openid'))
+        if not phone and not openid:
+            raise RowError('必须提供手机号或openid')
+        if phone and not phone_lookup_key(phone):
+            raise RowError(f'手机号格式错误: {phone}')
+        if username and len(username) > 64:
+            raise RowError('用户名超过64个字符')
+
+        role = _clean(row.get('role'))
+        if role:
+            try:
+                role_id = self.resolve_role(role)
+            except CommandError as exc:
+                raise RowError(str(exc))
+        else:
+            role_id = self.default_role_id
+
+        return User(
+            username=username,
+            phone=phone,
+            phone_hash=phone_lookup_key(phone),
+            openid=openid,
+            avatar_url=_clean(row.get('avatar_url')),
+            role_id=role_id,
+            is_staff=_parse_bool(row.get('is_staff')),
+            is_active=_parse_bool(row.get('is_active'), default=True),
+        ), _clean(row.get('password'))
+
+    def import_chunk(self, chunk, executor):
+        errors = []
+        users = []
+        passwords = []
+        seen = {'username': set(), 'phone_hash': set(), 'openid': set()}
+        line_numbers = []
+
+        for line_no, row in chunk:
+            try:
+                user, password = self.validate_row(row)
+                for field, values in seen.items():
+                    value = getattr(user, field)
+                    if value and value in values:
+                        raise RowError(f'{field}在文件中重复: {value}')
+            except RowError as exc:
+                errors.append((line_no, row, str(exc)))
+                continue
+            for field, values in seen.items():
+                if getattr(user, field):
+                    values.add(getattr(user, field))
+            users.append(user)
+            passwords.append(password)
+            line_numbers.append((line_no, row))
+
+        # 每块一次查询检查与已有用户（含已删除用户）的唯一字段冲突
+        existing = self.find_existing(seen)
+        valid = []
+        for user, password, (line_no, row) in zip(users, passwords, line_numbers):
+            conflict = next((field for field in existing if getattr(user, field) in existing[field]), None)
+            if conflict:
+                errors.append((line_no, row, f'{conflict}已存在: {getattr(user, conflict)}'))
+            else:
+                valid.append((user, password, line_no, row))
+
+        if not valid or self.dry_run:
+            return len(valid), errors
+
+        # 迭代次数在主进程中确定（依赖配置和角色缓存），子进程只拿到密码和迭代次数做哈希计算
+        items = [(password, get_user_hasher(user).iterations) for user, password, _, _ in valid]
+        chunksize = max(1, len(items) // (self.workers * 4))
+        for (user, _, _, _), encoded in zip(valid, executor.map(hash_password, items, chunksize=chunksize)):
+            user.password = encoded
+
+        return self.save_users(valid, errors)
+
+    def find_existing(self, seen):
+        existing = {field: set() for field in seen}
+        condition = Q()
+        for field, values in seen.items():
+            if values:
+                condition |= Q(**{f'{field}__in': values})
+        if condition:
+            for row in User.all_with_deleted.filter(condition).values(*seen):
+                for field in seen:
+                    if row[field] in seen[field]:
+                        existing[field].add(row[field])
+        return existing
+
+    def save_users(self, valid, errors):
+        created = 0
+        for start in range(0, len(valid), self.batch_size):
+            batch = valid[start:start + self.batch_size]
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create([user for user, _, _, _ in batch])
+                created += len(batch)
+            except IntegrityError:
+                # 并发写入等原因导致批量失败时逐行写入，定位出错行
+                for user, _, line_no, row in batch:
+                    try:
+                        with transaction.atomic():
+                            user.pk = None
+                            User.objects.bulk_create([user])
+                        created += 1
+                    except IntegrityError as exc:
+                        errors.append((line_no, row, f'写入失败: {exc}'))
+        return created, errors
+
+    def write_errors(self, path, errors):
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['line', 'error', 'row'])
+            for line_no, row, message in errors:
+                writer.writerow([line_no, message, json.dumps(row, ensure_ascii=False)])
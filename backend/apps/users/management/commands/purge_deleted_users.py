@@ -0,0 +1,68 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from apps.users.models import User, UserArchive
+
+
+class Command(BaseCommand):
+    """
+    将软删除超过保留期的用户分批移入归档表
+
+    每批在独立事务中完成“写归档表 + 删除用户”，批次之间可休眠以降低对线上库的压力，
+    适合放在定时任务中执行，中途中断后重新执行即可继续。
+    """
+    help = '归档并清理软删除超过保留期的用户'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='软删除后保留的天数')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批处理的用户数')
+        parser.add_argument('--sleep', type=float, default=0, help='批次之间休眠的秒数')
+        parser.add_argument('--max-batches', type=int, help='最多处理的批数，默认处理完为止')
+        parser.add_argument('--dry-run', action='store_true', help='只统计不清理')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        queryset = User.all_with_deleted.filter(is_deleted=True, deleted_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'[dry-run] 待归档用户: {queryset.count()}')
+            return
+
+        archived = 0
+        batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            with transaction.atomic():
+                users = list(queryset.order_by('id').select_for_update(skip_locked=True)[:options['batch_size']])
+                if not users:
+                    break
+                UserArchive.objects.bulk_create([self.to_archive(user) for user in users], ignore_conflicts=True)
+                User.all_with_deleted.filter(id__in=[user.id for user in users]).delete()
+            archived += len(users)
+            batches += 1
+            self.stdout.write(f'已归档{archived}个用户')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'归档完成：共{archived}个用户'))
+
+    @staticmethod
+    def to_archive(user):
+        data = model_to_dict(user, exclude=['password', 'groups', 'user_permissions'])
+        data['created_at'] = user.created_at
+        return UserArchive(
+            id=user.id,
+            username=user.username,
+            phone=user.phone,
+            openid=user.openid,
+            role_id=user.role_id,
+            data=json.loads(json.dumps(data, cls=DjangoJSONEncoder)),
+            created_at=user.created_at,
+            deleted_at=user.deleted_at,
+        )
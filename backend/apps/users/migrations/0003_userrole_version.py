@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_userrole_remove_userprofile_user_alter_user_managers_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userrole',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='每次保存自增，用于识别缓存/令牌中的过期角色', verbose_name='版本号'),
+        ),
+    ]
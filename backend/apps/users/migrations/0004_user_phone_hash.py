@@ -0,0 +1,72 @@
+# Generated by Django 4.2 on 2026-10-17 12:20
+
+import hashlib
+import hmac
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, migrations, models, transaction
+
+# 规范化和查询键的计算在此固定一份，不引用apps.users.phone，后者以后修改不影响本迁移
+_NON_DIGITS = re.compile(r'\D')
+BATCH_SIZE = 1000
+
+
+def _lookup_key(phone, key):
+    digits = _NON_DIGITS.sub('', phone)
+    for prefix in ('0086', '86'):
+        if digits.startswith(prefix) and len(digits) == len(prefix) + 11:
+            digits = digits[len(prefix):]
+            break
+    if not digits:
+        return None
+    return hmac.new(key, digits.encode(), hashlib.sha256).hexdigest()
+
+
+def backfill(apps, schema_editor):
+    # 部署前已存在的用户phone_hash为空，不回填则无法用手机号登录；
+    # 规范化后重复的手机号保持为空，可执行backfill_phone_hash查看冲突
+    if not settings.PHONE_HASH_KEY:
+        raise ImproperlyConfigured('未配置PHONE_HASH_KEY')
+    key = settings.PHONE_HASH_KEY.encode()
+    User = apps.get_model('users', 'User')
+    users = User._base_manager.filter(phone_hash__isnull=True).exclude(phone__isnull=True).exclude(phone='')
+    last_id = 0
+    while True:
+        batch = list(users.filter(id__gt=last_id).order_by('id').only('id', 'phone')[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        changed = []
+        for user in batch:
+            user.phone_hash = _lookup_key(user.phone, key)
+            if user.phone_hash:
+                changed.append(user)
+        try:
+            with transaction.atomic():
+                User._base_manager.bulk_update(changed, ['phone_hash'])
+        except IntegrityError:
+            # 批内存在规范化后重复的手机号，逐条更新，冲突的保持为空
+            for user in changed:
+                try:
+                    with transaction.atomic():
+                        User._base_manager.filter(id=user.id).update(phone_hash=user.phone_hash)
+                except IntegrityError:
+                    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_userrole_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='phone_hash',
+            field=models.CharField(blank=True, editable=False, help_text='规范化手机号的HMAC-SHA256，用于加密存储下的索引查询', max_length=64, null=True, unique=True, verbose_name='手机号查询键'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
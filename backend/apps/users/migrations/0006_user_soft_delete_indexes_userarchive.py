@@ -0,0 +1,51 @@
+# Generated by Django 4.2 on 2026-10-17 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_created_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='原用户ID')),
+                ('username', models.CharField(blank=True, max_length=64, null=True, verbose_name='用户名')),
+                ('phone', models.CharField(blank=True, max_length=20, null=True, verbose_name='手机号')),
+                ('openid', models.CharField(blank=True, max_length=64, null=True, verbose_name='微信OpenID')),
+                ('role_id', models.IntegerField(blank=True, null=True, verbose_name='角色id')),
+                ('data', models.JSONField(default=dict, verbose_name='用户完整数据')),
+                ('created_at', models.DateTimeField(verbose_name='用户创建时间')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='删除时间')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='归档时间')),
+            ],
+            options={
+                'verbose_name': '已归档用户',
+                'verbose_name_plural': '已归档用户',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='users_user_created_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_deleted', 'openid'], name='users_user_del_openid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_deleted', 'phone_hash'], name='users_user_del_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_deleted', 'role_id'], name='users_user_del_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_deleted', 'created_at', 'id'], name='users_user_del_created_idx'),
+        ),
+    ]
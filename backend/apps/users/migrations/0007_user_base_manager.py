@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 13:54
+
+from django.db import migrations
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_soft_delete_indexes_userarchive'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='user',
+            options={'base_manager_name': 'all_with_deleted', 'ordering': ['-created_at'], 'verbose_name': '用户', 'verbose_name_plural': '用户'},
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_with_deleted', django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
@@ -1,7 +1,14 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction, IntegrityError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
+from .hashers import get_user_hasher
+from .phone import phone_lookup_key
+
 
 class UserRole(models.Model):
     """角色权限表，符合function-table.md设计"""
@@ -18,6 +25,7 @@ class UserRole(models.Model):
         choices=RoleType.choices
     )
     permissions = models.JSONField(_('权限列表（菜单+操作）'), default=dict, blank=True, null=True)
+    version = models.PositiveIntegerField(_('版本号'), default=1, help_text='每次保存自增，用于识别缓存/令牌中的过期角色')
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
     
     class Meta:
@@ -26,9 +34,41 @@ class UserRole(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        """更新已有角色时递增版本号"""
+        if not self._state.adding:
+            self.version = (self.version or 0) + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+        super().save(*args, **kwargs)
+
+
+class UserQuerySet(models.QuerySet):
+    def soft_delete(self):
+        """批量软删除，与User.soft_delete一样同步账号状态，使已签发的令牌失效"""
+        from .cache import publish_user_state, serialize_user_state
+        users = list(self.only('id', 'is_active', 'is_blacklisted', 'is_staff', 'is_superuser', 'role_id'))
+        count = self.update(is_deleted=True, deleted_at=timezone.now())
+        for user in users:
+            user.is_deleted = True
+            publish_user_state(user.id, serialize_user_state(user))
+        return count
+
 
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    """用户管理器，默认排除已软删除的用户；include_deleted=True时返回全部用户"""
+
+    def __init__(self, include_deleted=False):
+        super().__init__()
+        self.include_deleted = include_deleted
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.include_deleted:
+            return queryset
+        return queryset.filter(is_deleted=False)
 
-class UserManager(BaseUserManager):
     def create_user(self, username, phone, password=None, **extra_fields):
         """创建普通用户"""
         if not phone:
@@ -38,6 +78,41 @@ class UserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    def upsert_wechat_user(self, openid, avatar_url=None):
+        """
+        按openid获取或创建微信用户，返回(user, created)
+
+        老用户只需一次查询，头像变化时才追加一次更新；新用户一次INSERT写入默认居民角色，
+        角色id取自缓存，不查询角色表。并发首次登录时以openid唯一约束去重。
+        """
+        # 已注销的用户同样占用openid，由调用方决定是否允许登录
+        user = self.model.all_with_deleted.using(self._db).filter(openid=openid).first()
+        if user is None:
+            from .cache import get_default_role_id
+            user = self.model(
+                # 生成唯一用户名
+                username=f'wx_{openid[:10]}_{str(uuid.uuid4())[:8]}',
+                phone=None,
+                openid=openid,
+                avatar_url=avatar_url or None,
+                role_id=get_default_role_id(UserRole.RoleType.RESIDENT),
+                is_active=True
+            )
+            # 微信登录用户不需要密码
+            user.set_unusable_password()
+            try:
+                with transaction.atomic(using=self._db):
+                    user.save(using=self._db, force_insert=True)
+                return user, True
+            except IntegrityError:
+                # 同一openid的并发请求已创建用户
+                user = self.model.all_with_deleted.using(self._db).get(openid=openid)
+        
+        if avatar_url and user.avatar_url != avatar_url:
+            user.avatar_url = avatar_url
+            user.save(using=self._db, update_fields=['avatar_url', 'updated_at'])
+        return user, False
+
     def create_superuser(self, username, phone, password=None, **extra_fields):
         """创建超级用户"""
         extra_fields.setdefault('is_active', True)
@@ -55,6 +130,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     # 账号信息
     username = models.CharField(_('用户名'), max_length=64, blank=True, null=True, unique=True)
     phone = models.CharField(_('手机号'), max_length=20, blank=True, null=True, unique=True)
+    phone_hash = models.CharField(_('手机号查询键'), max_length=64, blank=True, null=True, unique=True, editable=False,
+                                  help_text='规范化手机号的HMAC-SHA256，用于加密存储下的索引查询')
     avatar_url = models.CharField(_('头像URL'), max_length=255, blank=True, null=True)
     
     # 角色关联
@@ -76,14 +153,73 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['phone']
     
+    # 默认管理器排除已软删除的用户，需要包含已删除用户时使用all_with_deleted
     objects = UserManager()
+    all_with_deleted = UserManager(include_deleted=True)
     
     class Meta:
         verbose_name = _('用户')
         verbose_name_plural = _('用户')
         ordering = ['-created_at']
+        # 外键等关联访问需要能取到已注销的用户
+        base_manager_name = 'all_with_deleted'
+        # 默认管理器的查询都带is_deleted=False条件，常用查询的联合索引以is_deleted开头
+        indexes = [
+            models.Index(fields=['is_deleted', 'openid'], name='users_user_del_openid_idx'),
+            models.Index(fields=['is_deleted', 'phone_hash'], name='users_user_del_phone_idx'),
+            models.Index(fields=['is_deleted', 'role_id'], name='users_user_del_role_idx'),
+            # 用户列表键集分页
+            models.Index(fields=['is_deleted', 'created_at', 'id'], name='users_user_del_created_idx'),
+        ]
     
+    def __str__(self):
+        return self.username or self.phone or f'用户-{self.id}'
+    
+    def soft_delete(self):
+        """软删除用户，已签发的令牌随账号状态同步失效"""
+        self.is_deleted = True
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+    
+    def save(self, *args, **kwargs):
+        """保存时同步手机号查询键"""
+        self.phone_hash = phone_lookup_key(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'phone_hash'}
+        super().save(*args, **kwargs)
+    
+    def set_password(self, raw_password):
+        """按用户适用的哈希配置生成密码哈希"""
+        self.password = make_password(raw_password, hasher=get_user_hasher(self))
+        self._password = raw_password
+    
+    def check_password(self, raw_password):
+        """校验密码，哈希配置与当前适用的不一致时透明地重新哈希"""
+        def setter(raw_password):
+            self.set_password(raw_password)
+            # 哈希升级不视为修改密码
+            self._password = None
+            self.save(update_fields=['password'])
+        
+        return check_password(raw_password, self.password, setter, preferred=get_user_hasher(self))
 
+
+class UserArchive(models.Model):
+    """已清理用户归档表，保存软删除超过保留期后从用户表移出的数据"""
+    id = models.BigIntegerField(_('原用户ID'), primary_key=True)
+    username = models.CharField(_('用户名'), max_length=64, blank=True, null=True)
+    phone = models.CharField(_('手机号'), max_length=20, blank=True, null=True)
+    openid = models.CharField(_('微信OpenID'), max_length=64, blank=True, null=True)
+    role_id = models.IntegerField(_('角色id'), blank=True, null=True)
+    data = models.JSONField(_('用户完整数据'), default=dict)
+    created_at = models.DateTimeField(_('用户创建时间'))
+    deleted_at = models.DateTimeField(_('删除时间'), blank=True, null=True)
+    archived_at = models.DateTimeField(_('归档时间'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('已归档用户')
+        verbose_name_plural = _('已归档用户')
     
     def __str__(self):
         return self.username or self.phone or f'用户-{self.id}'
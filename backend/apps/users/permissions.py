@@ -1,5 +1,5 @@
 from rest_framework import permissions
-from .models import UserRole
+from .cache import get_request_role
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -42,21 +42,20 @@ class RoleBasedPermission(permissions.BasePermission):
         if not request.user.role_id:
             return False
         
-        try:
-            # 获取用户角色
-            role = UserRole.objects.get(id=request.user.role_id)
-            
-            # 检查角色类型
-            if self.required_role_type and role.role_type != self.required_role_type:
-                return False
-            
-            # 检查特定权限
-            if self.required_permission:
-                return role.permissions.get(self.required_permission, False)
-            
-            return True
-        except UserRole.DoesNotExist:
+        # 获取用户角色（走缓存，不直接查询数据库）
+        role = get_request_role(request)
+        if role is None:
+            return False
+        
+        # 检查角色类型
+        if self.required_role_type and role['role_type'] != self.required_role_type:
             return False
+        
+        # 检查特定权限
+        if self.required_permission:
+            return role['permissions'].get(self.required_permission, False)
+        
+        return True
 
 
 class IsCommunityManager(RoleBasedPermission):
@@ -0,0 +1,75 @@
+"""
+手机号规范化与查询键
+
+手机号按规范要求加密存储，密文无法直接建索引查询，因此另存一个确定性的带密钥哈希（HMAC-SHA256）
+作为查询键：同一手机号的不同写法（"+86 138..."、"0086-138..."、"138..."）规范化后得到相同的键，
+且不掌握PHONE_HASH_KEY无法由键反推手机号。
+"""
+import hashlib
+import hmac
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_phone(phone):
+    """规范化手机号：去除空格、横线等分隔符以及+86/0086/86国家码前缀"""
+    if not phone:
+        return ''
+    digits = _NON_DIGITS.sub('', phone)
+    for prefix in ('0086', '86'):
+        if digits.startswith(prefix) and len(digits) == len(prefix) + 11:
+            return digits[len(prefix):]
+    return digits
+
+
+def phone_lookup_key(phone):
+    """计算手机号查询键，手机号为空时返回None"""
+    normalized = normalize_phone(phone)
+    if not normalized:
+        return None
+    if not settings.PHONE_HASH_KEY:
+        raise ImproperlyConfigured('未配置PHONE_HASH_KEY')
+    key = settings.PHONE_HASH_KEY.encode()
+    return hmac.new(key, normalized.encode(), hashlib.sha256).hexdigest()
+
+
+def backfill_phone_hash(queryset, batch_size=1000):
+    """
+    按主键分批回填queryset中用户的手机号查询键，返回(更新的用户数, 冲突的用户列表)
+    """
+    model = queryset.model
+    queryset = queryset.exclude(phone__isnull=True).exclude(phone='')
+    updated = 0
+    conflicts = []
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id').only('id', 'phone', 'phone_hash')[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        changed = []
+        for user in batch:
+            lookup_key = phone_lookup_key(user.phone)
+            if lookup_key != user.phone_hash:
+                user.phone_hash = lookup_key
+                changed.append(user)
+        try:
+            with transaction.atomic():
+                model._base_manager.bulk_update(changed, ['phone_hash'])
+            updated += len(changed)
+        except IntegrityError:
+            # 批内存在规范化后重复的手机号，逐条更新以定位冲突
+            for user in changed:
+                try:
+                    with transaction.atomic():
+                        model._base_manager.filter(id=user.id).update(phone_hash=user.phone_hash)
+                    updated += 1
+                except IntegrityError:
+                    conflicts.append(user)
+    return updated, conflicts
@@ -1,10 +1,13 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from apps.common.serializers import SparseFieldsetMixin
 from .models import User, UserRole
+from .cache import get_role
+from .phone import phone_lookup_key
 
 
-class UserSerializer(serializers.ModelSerializer):
-    """用户序列化器"""
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """用户序列化器，读取时支持?fields=稀疏字段"""
     
     class Meta:
         model = User
@@ -39,6 +42,19 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         model = User
         fields = ['username', 'phone', 'password', 'password_confirm']
     
+    def validate_username(self, value):
+        # 默认管理器排除已注销用户，其用户名仍占用唯一索引
+        if value and User.all_with_deleted.filter(username=value).exists():
+            raise serializers.ValidationError('该用户名已被使用')
+        return value
+    
+    def validate_phone(self, value):
+        # 同一手机号的不同写法视为重复
+        lookup_key = phone_lookup_key(value)
+        if lookup_key and User.all_with_deleted.filter(phone_hash=lookup_key).exists():
+            raise serializers.ValidationError('该手机号已注册')
+        return value
+    
     def validate(self, attrs):
         if attrs['password'] != attrs['password_confirm']:
             raise serializers.ValidationError({'password_confirm': '两次输入的密码不一致'})
@@ -85,6 +101,12 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['username'] = user.username
         token['phone'] = user.phone
         token['role_id'] = user.role_id
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        token['is_blacklisted'] = user.is_blacklisted
+        # 角色版本号，权限检查时用于识别过期的角色缓存
+        role = get_role(user.role_id)
+        token['role_version'] = role['version'] if role else None
         
         return token
     
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_role, publish_user_state, serialize_user_state
+from .models import User, UserRole
+
+# 会影响令牌声明有效性的用户字段
+USER_STATE_FIELDS = {'is_active', 'is_blacklisted', 'is_deleted', 'is_staff', 'is_superuser', 'role_id'}
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def invalidate_role_cache(sender, instance, **kwargs):
+    """角色变更后清除权限缓存"""
+    invalidate_role(instance.id, instance.role_type)
+
+
+@receiver(post_save, sender=User)
+def sync_user_state(sender, instance, created, update_fields=None, **kwargs):
+    """用户状态变更后同步到缓存，使已签发的令牌及时失效"""
+    if created:
+        return
+    if update_fields is not None and not USER_STATE_FIELDS.intersection(update_fields):
+        # 例如登录时只更新last_login，无需同步
+        return
+    publish_user_state(instance.id, serialize_user_state(instance))
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user(sender, instance, **kwargs):
+    """用户被删除后拒绝其已签发的令牌"""
+    state = serialize_user_state(instance)
+    state['is_active'] = False
+    publish_user_state(instance.id, state)
@@ -1,11 +1,38 @@
-from django.test import TestCase, Client
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
-from .models import User, UserRole
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from .models import User, UserArchive, UserRole
+from .authentication import ClaimsJWTAuthentication
+from .backends import UsernameOrPhoneBackend
+from .checks import check_phone_hash_key
+from .cache import get_default_role_id, get_role, local_role_cache, local_user_state_cache
+from .hashers import get_profile_hasher, hash_password
+from .phone import normalize_phone, phone_lookup_key
+from .serializers import CustomTokenObtainPairSerializer, UserSerializer
+from .throttling import limiter
+from .wechat import (
+    AsyncWeChatClient, CircuitBreaker, FakeWeChatServer, WeChatAPIError,
+    WeChatClient, WeChatUnavailable
+)
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from io import StringIO
+import asyncio
+import importlib
 import json
+import multiprocessing
 import os
+import tempfile
+import time
 import unittest
+from unittest import mock
 
 
 class UserAuthenticationTests(TestCase):
@@ -184,3 +211,557 @@ class UserAuthenticationTests(TestCase):
         self.client.force_authenticate(user=self.admin_user)
         response = self.client.post(user_list_url, create_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class RoleCacheTests(TestCase):
+    """角色权限缓存测试类"""
+    
+    def setUp(self):
+        cache.clear()
+        local_role_cache.clear()
+        self.role = UserRole.objects.create(
+            id=10,
+            name='维修工',
+            role_type='property',
+            permissions={'can_manage_work_orders': True}
+        )
+    
+    def test_role_cached_after_first_lookup(self):
+        """测试角色首次加载后不再查询数据库"""
+        self.assertEqual(get_role(self.role.id)['name'], '维修工')
+        with self.assertNumQueries(0):
+            role = get_role(self.role.id)
+        self.assertTrue(role['permissions']['can_manage_work_orders'])
+    
+    def test_role_cache_invalidated_on_save(self):
+        """测试角色修改后缓存失效且版本号递增"""
+        old_version = get_role(self.role.id)['version']
+        self.role.permissions = {'can_manage_work_orders': False}
+        self.role.save()
+        role = get_role(self.role.id)
+        self.assertEqual(role['version'], old_version + 1)
+        self.assertFalse(role['permissions']['can_manage_work_orders'])
+    
+    def test_role_cache_invalidated_on_delete(self):
+        """测试角色删除后缓存失效"""
+        get_role(self.role.id)
+        self.role.delete()
+        self.assertIsNone(get_role(10))
+    
+    def test_newer_token_version_bypasses_local_cache(self):
+        """测试令牌中的角色版本更新时跳过本地缓存"""
+        stale = dict(get_role(self.role.id), permissions={})
+        local_role_cache.set(self.role.id, stale)
+        UserRole.objects.filter(id=self.role.id).update(version=stale['version'] + 1)
+        cache.clear()
+        role = get_role(self.role.id, min_version=stale['version'] + 1)
+        self.assertTrue(role['permissions']['can_manage_work_orders'])
+    
+    def test_token_contains_role_version(self):
+        """测试JWT令牌携带角色版本号"""
+        user = User.objects.create_user(
+            username='worker', phone='13800138009', password='worker123', role_id=self.role.id
+        )
+        token = CustomTokenObtainPairSerializer.get_token(user)
+        self.assertEqual(token['role_version'], self.role.version)
+
+
+class ClaimsJWTAuthenticationTests(TestCase):
+    """无状态JWT认证测试类"""
+    
+    def setUp(self):
+        cache.clear()
+        local_role_cache.clear()
+        local_user_state_cache.clear()
+        self.client = APIClient()
+        self.role = UserRole.objects.create(
+            id=20,
+            name='物业客服',
+            role_type='property',
+            permissions={'can_manage_announcements': True}
+        )
+        self.user = User.objects.create_user(
+            username='staff',
+            phone='13800138010',
+            password='staff123',
+            role_id=self.role.id,
+            is_active=True
+        )
+        token = CustomTokenObtainPairSerializer.get_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+    
+    def test_authenticated_request_skips_user_query(self):
+        """测试已认证请求不查询用户表"""
+        url = reverse('user-get-user-permissions')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['role_name'], '物业客服')
+    
+    def test_missing_claim_loads_user_lazily(self):
+        """测试访问声明外的字段时才查询数据库"""
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        user = ClaimsJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.role_id, self.role.id)
+            self.assertEqual(user.phone, '13800138010')
+        with self.assertNumQueries(1):
+            self.assertIsNone(user.openid)
+        self.assertEqual(user, self.user)
+    
+    def test_blacklisted_user_rejected(self):
+        """测试用户被拉黑后已签发的令牌失效"""
+        url = reverse('user-get-user-permissions')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.user.is_blacklisted = True
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_deactivated_user_rejected(self):
+        """测试用户被停用后已签发的令牌失效"""
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        response = self.client.get(reverse('user-get-user-permissions'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class WeChatClientTests(TestCase):
+    """微信接口客户端测试类"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeWeChatServer().start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+    
+    def setUp(self):
+        self.server.responses = {}
+        self.server.fail_status = None
+        self.server.request_count = 0
+        self.client = WeChatClient('appid', 'secret', base_url=self.server.url)
+    
+    def tearDown(self):
+        self.client.close()
+    
+    def test_code2session(self):
+        """测试换取openid"""
+        result = self.client.code2session('abc')
+        self.assertEqual(result['openid'], 'openid_abc')
+    
+    def test_invalid_code(self):
+        """测试code无效时返回业务错误且不重试"""
+        self.server.responses['bad'] = {'errcode': 40029, 'errmsg': 'invalid code'}
+        with self.assertRaises(WeChatAPIError) as ctx:
+            self.client.code2session('bad')
+        self.assertEqual(ctx.exception.errcode, 40029)
+        self.assertEqual(self.server.request_count, 1)
+    
+    def test_circuit_breaker_opens(self):
+        """测试上游持续故障时熔断，不再发起请求"""
+        self.server.fail_status = 502
+        self.client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        for _ in range(2):
+            with self.assertRaises(WeChatUnavailable):
+                self.client.code2session('abc')
+        count = self.server.request_count
+        with self.assertRaises(WeChatUnavailable):
+            self.client.code2session('abc')
+        self.assertEqual(self.server.request_count, count)
+    
+    def test_async_client(self):
+        """测试asyncio客户端"""
+        async_client = AsyncWeChatClient(self.client, max_workers=2)
+        result = asyncio.run(async_client.code2session('xyz'))
+        async_client.close()
+        self.assertEqual(result['openid'], 'openid_xyz')
+    
+    def test_wechat_login_view(self):
+        """测试微信登录视图使用注入的模拟服务器"""
+        User.objects.create_user(username='wx_user', phone='13800138011', openid='openid_login')
+        with override_settings(WECHAT_API_BASE=self.server.url):
+            response = APIClient().post(reverse('wechat-login'), {'code': 'login'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['openid'], 'openid_login')
+
+
+class WeChatUserUpsertTests(TestCase):
+    """微信用户upsert测试类"""
+    
+    def setUp(self):
+        cache.clear()
+        local_role_cache.clear()
+        self.resident_role = UserRole.objects.create(id=30, name='居民', role_type='resident')
+    
+    def test_new_user_gets_resident_role(self):
+        """测试新用户一次写入即带默认居民角色"""
+        user, created = User.objects.upsert_wechat_user('openid_new', avatar_url='https://example.com/a.jpg')
+        self.assertTrue(created)
+        self.assertTrue(user.is_active)
+        self.assertIsNone(user.phone)
+        user.refresh_from_db()
+        self.assertEqual(user.role_id, self.resident_role.id)
+        self.assertEqual(user.avatar_url, 'https://example.com/a.jpg')
+    
+    def test_existing_user_single_query(self):
+        """测试老用户头像未变化时只查询一次"""
+        User.objects.upsert_wechat_user('openid_old', avatar_url='https://example.com/a.jpg')
+        with self.assertNumQueries(1):
+            user, created = User.objects.upsert_wechat_user('openid_old', avatar_url='https://example.com/a.jpg')
+        self.assertFalse(created)
+    
+    def test_avatar_written_only_when_changed(self):
+        """测试头像变化时才更新"""
+        User.objects.upsert_wechat_user('openid_avatar', avatar_url='https://example.com/a.jpg')
+        with self.assertNumQueries(2):
+            user, _ = User.objects.upsert_wechat_user('openid_avatar', avatar_url='https://example.com/b.jpg')
+        self.assertEqual(User.objects.get(pk=user.pk).avatar_url, 'https://example.com/b.jpg')
+    
+    def test_resident_role_lookup_cached(self):
+        """测试默认居民角色id走缓存"""
+        User.objects.upsert_wechat_user('openid_a')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_default_role_id('resident'), self.resident_role.id)
+
+
+@override_settings(PASSWORD_HASH_PROFILES={'strong': {'iterations': 2000}, 'tuned': {'iterations': 1000}})
+class PasswordHashProfileTests(TestCase):
+    """按角色的密码哈希配置测试类"""
+    
+    def setUp(self):
+        cache.clear()
+        local_role_cache.clear()
+        self.merchant_role = UserRole.objects.create(id=40, name='商户', role_type='merchant')
+    
+    @staticmethod
+    def iterations(user):
+        return int(user.password.split('$')[1])
+    
+    def test_profile_by_role(self):
+        """测试商户使用tuned配置，员工使用strong配置"""
+        merchant = User.objects.create_user(
+            username='shop', phone='13800138020', password='shop123', role_id=self.merchant_role.id
+        )
+        staff = User.objects.create_user(
+            username='shop_admin', phone='13800138021', password='admin123',
+            role_id=self.merchant_role.id, is_staff=True
+        )
+        self.assertEqual(self.iterations(merchant), 1000)
+        self.assertEqual(self.iterations(staff), 2000)
+    
+    def test_rehash_on_successful_login(self):
+        """测试登录成功时按当前配置重新哈希"""
+        user = User.objects.create_user(
+            username='shop', phone='13800138020', password='shop123', role_id=self.merchant_role.id
+        )
+        User.objects.filter(pk=user.pk).update(password=make_password('shop123', hasher=get_profile_hasher('strong')))
+        user.refresh_from_db()
+        self.assertFalse(user.check_password('wrong'))
+        self.assertEqual(self.iterations(user), 2000)
+        self.assertTrue(user.check_password('shop123'))
+        user.refresh_from_db()
+        self.assertEqual(self.iterations(user), 1000)
+
+
+@override_settings(PASSWORD_HASH_PROFILES={'strong': {'iterations': 1000}})
+class PhoneLookupTests(TestCase):
+    """手机号查询键与登录测试类"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='owner', phone='13800138030', password='owner123', is_active=True
+        )
+    
+    def test_normalize_phone(self):
+        """测试手机号规范化"""
+        for phone in ('13800138030', '+86 138 0013 8030', '0086-138-0013-8030', '86 13800138030'):
+            self.assertEqual(normalize_phone(phone), '13800138030')
+        self.assertEqual(self.user.phone_hash, phone_lookup_key('+86 13800138030'))
+    
+    def test_login_with_phone_variant(self):
+        """测试不同写法的手机号都能登录"""
+        response = APIClient().post(
+            reverse('user-login'), {'phone': '+86 138-0013-8030', 'password': 'owner123'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user_id'], self.user.id)
+    
+    def test_backend_single_query(self):
+        """测试用户名或手机号一次查询完成认证"""
+        backend = UsernameOrPhoneBackend()
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.authenticate(None, username='13800138030', password='owner123'), self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.authenticate(None, username='owner', password='owner123'), self.user)
+        self.assertIsNone(backend.authenticate(None, phone='13800138030', password='wrong'))
+    
+    def test_backfill_phone_hash(self):
+        """测试回填命令"""
+        User.objects.filter(pk=self.user.pk).update(phone_hash=None)
+        call_command('backfill_phone_hash', stdout=StringIO())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.phone_hash, phone_lookup_key('13800138030'))
+    
+    def test_backfill_migration(self):
+        """测试数据迁移为部署前已存在的用户回填查询键，回填后即可用手机号登录"""
+        User.objects.filter(pk=self.user.pk).update(phone_hash=None)
+        backend = UsernameOrPhoneBackend()
+        self.assertIsNone(backend.authenticate(None, phone='13800138030', password='owner123'))
+        migration = importlib.import_module('apps.users.migrations.0004_user_phone_hash')
+        migration.backfill(django_apps, None)
+        self.assertEqual(backend.authenticate(None, phone='13800138030', password='owner123'), self.user)
+    
+    def test_phone_hash_key_required(self):
+        """测试未单独配置查询键密钥时启动检查报错"""
+        with override_settings(PHONE_HASH_KEY=None):
+            self.assertEqual([e.id for e in check_phone_hash_key()], ['users.E001'])
+        with override_settings(PHONE_HASH_KEY=settings.SECRET_KEY):
+            self.assertEqual([e.id for e in check_phone_hash_key()], ['users.E002'])
+
+
+@override_settings(PASSWORD_HASH_PROFILES={'strong': {'iterations': 1000}})
+class ImportUsersCommandTests(TestCase):
+    """批量导入用户命令测试类"""
+    
+    def setUp(self):
+        UserRole.objects.create(id=50, name='居民', role_type='resident')
+        UserRole.objects.create(id=51, name='维修工', role_type='property')
+        User.objects.create_user(username='existing', phone='13900000009', password='pass1234')
+    
+    def run_import(self, content, suffix='.csv'):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_users', f.name, '--workers', '1', '--batch-size', '2', stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+    
+    def test_import_csv(self):
+        """测试CSV导入，单行错误不影响其他行"""
+        out, err = self.run_import(
+            'username,phone,password,role,is_staff\n'
+            'worker1,13900000001,pass1234,维修工,1\n'
+            'resident1,+86 139 0000 0002,pass1234,,\n'
+            'resident2,13900000002,pass1234,,\n'
+            'resident3,13900000009,pass1234,,\n'
+            'nobody,,pass1234,,\n'
+        )
+        self.assertIn('导入2行', out)
+        self.assertIn('第4行', err)
+        self.assertIn('第5行', err)
+        self.assertIn('第6行', err)
+        worker = User.objects.get(username='worker1')
+        self.assertEqual(worker.role_id, 51)
+        self.assertTrue(worker.is_staff)
+        self.assertTrue(worker.check_password('pass1234'))
+        resident = User.objects.get(username='resident1')
+        self.assertEqual(resident.role_id, 50)
+        self.assertEqual(resident.phone_hash, phone_lookup_key('13900000002'))
+    
+    def test_import_jsonl(self):
+        """测试JSONL导入"""
+        out, _ = self.run_import(
+            '{"username": "wx1", "openid": "openid_import_1"}\n'
+            'not json\n',
+            suffix='.jsonl'
+        )
+        self.assertIn('导入1行', out)
+        self.assertFalse(User.objects.get(openid='openid_import_1').has_usable_password())
+    
+    def test_dry_run(self):
+        """测试dry-run只校验、不哈希密码也不写入"""
+        with mock.patch('apps.users.management.commands.import_users.ProcessPoolExecutor') as pool:
+            with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+                f.write('username,phone,password\nworker1,13900000001,pass1234\n')
+            self.addCleanup(os.remove, f.name)
+            out = StringIO()
+            call_command('import_users', f.name, '--dry-run', stdout=out)
+        pool.assert_not_called()
+        self.assertIn('[dry-run]', out.getvalue())
+        self.assertIn('导入1行', out.getvalue())
+        self.assertFalse(User.objects.filter(username='worker1').exists())
+    
+    def test_hash_in_spawned_worker(self):
+        """测试以spawn方式启动的子进程（Windows默认）也能执行密码哈希"""
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            encoded, unusable = executor.map(hash_password, [('pass1234', 1000), (None, 1000)])
+        user = User(password=encoded)
+        self.assertTrue(user.check_password('pass1234'))
+        self.assertIn('$1000$', encoded)
+        self.assertFalse(User(password=unusable).has_usable_password())
+
+
+class UserListPaginationTests(TestCase):
+    """用户列表键集分页与稀疏字段测试类"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='list_admin', phone='13900000100', password=None, is_staff=True, is_active=True
+        )
+        for i in range(1, 8):
+            User.objects.create_user(username=f'list_user{i}', phone=f'1390000010{i}', password=None)
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_keyset_pages_cover_all_users(self):
+        """测试键集分页逐页遍历不重复不遗漏"""
+        url = reverse('user-list') + '?pagination=cursor&page_size=3'
+        seen = []
+        pages = 0
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        self.assertEqual(pages, 3)
+        expected = list(User.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+    
+    def test_keyset_previous_link(self):
+        """测试键集分页返回上一页"""
+        first = self.client.get(reverse('user-list') + '?pagination=cursor&page_size=3')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']]
+        )
+    
+    def test_sparse_fields(self):
+        """测试?fields=只返回指定字段，且与完整序列化结果一致"""
+        response = self.client.get(reverse('user-list') + '?fields=id,username,created_at')
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'username', 'created_at'})
+        full = UserSerializer(User.objects.get(pk=row['id'])).data
+        self.assertEqual(row['created_at'], full['created_at'])
+        
+        response = self.client.get(reverse('user-detail', args=[self.admin.id]) + '?fields=id,phone')
+        self.assertEqual(set(response.data), {'id', 'phone'})
+    
+    def test_invalid_cursor(self):
+        """测试无效游标返回404"""
+        response = self.client.get(reverse('user-list') + '?cursor=invalid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SoftDeleteTests(TestCase):
+    """用户软删除与归档测试类"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='leaving', phone='13900000200', password=None)
+    
+    def test_soft_deleted_user_hidden_by_default(self):
+        """测试默认管理器排除已软删除用户"""
+        self.user.soft_delete()
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertTrue(User.all_with_deleted.filter(pk=self.user.pk, is_deleted=True).exists())
+    
+    def test_destroy_soft_deletes(self):
+        """测试删除接口只做软删除"""
+        admin = User.objects.create_user(username='root', phone='13900000201', password=None, is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        response = client.delete(reverse('user-detail', args=[self.user.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertIsNotNone(User.all_with_deleted.get(pk=self.user.pk).deleted_at)
+    
+    def test_bulk_soft_delete_revokes_tokens(self):
+        """测试批量软删除同样使已签发的令牌失效"""
+        user = User.objects.create_user(username='active', phone='13900000204', password=None, is_active=True)
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        url = reverse('user-get-user-permissions')
+        self.assertNotEqual(client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(User.objects.filter(pk=user.pk).soft_delete(), 1)
+        self.assertEqual(client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_register_with_deleted_username(self):
+        """测试已注销用户的用户名不能再注册，关联对象仍能取到已注销用户"""
+        self.user.soft_delete()
+        response = APIClient().post(reverse('user-register'), {
+            'username': 'leaving', 'phone': '13900000203', 'password': 'p@ss1234', 'password_confirm': 'p@ss1234',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+        self.assertTrue(User._base_manager.filter(pk=self.user.pk).exists())
+    
+    def test_purge_archives_old_deleted_users(self):
+        """测试清理命令只归档超过保留期的用户"""
+        recent = User.objects.create_user(username='recent', phone='13900000202', password=None)
+        recent.soft_delete()
+        User.objects.filter(pk=self.user.pk).soft_delete()
+        User.all_with_deleted.filter(pk=self.user.pk).update(deleted_at=timezone.now() - timedelta(days=100))
+        
+        call_command('purge_deleted_users', '--days', '90', '--batch-size', '1', stdout=StringIO())
+        
+        self.assertFalse(User.all_with_deleted.filter(pk=self.user.pk).exists())
+        self.assertTrue(User.all_with_deleted.filter(pk=recent.pk).exists())
+        archive = UserArchive.objects.get(pk=self.user.pk)
+        self.assertEqual(archive.phone, '13900000200')
+        self.assertEqual(archive.data['username'], 'leaving')
+
+
+class LoginThrottleTests(TestCase):
+    """登录限流测试类"""
+    
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='target', phone='13900000300', password='right-password', is_active=True)
+    
+    def login(self, data, ip='10.0.0.1'):
+        return APIClient().post(reverse('user-login'), data, format='json', REMOTE_ADDR=ip)
+    
+    @override_settings(LOGIN_THROTTLE_RATES={'ip': '100/min', 'username': '3/min', 'phone': '3/min'})
+    def test_username_bucket_across_ips(self):
+        """测试同一用户名从不同IP撞库仍被限流"""
+        for i in range(3):
+            response = self.login({'username': 'target', 'password': 'wrong'}, ip=f'10.0.0.{i}')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.login({'username': 'target', 'password': 'right-password'}, ip='10.0.0.9')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        # 其他用户不受影响
+        response = self.login({'username': 'other', 'password': 'x'}, ip='10.0.0.9')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    @override_settings(LOGIN_THROTTLE_RATES={'ip': '100/min', 'username': '3/min', 'phone': '2/min'})
+    def test_phone_bucket_normalized(self):
+        """测试手机号的不同写法计入同一个桶"""
+        self.login({'phone': '13900000300', 'password': 'wrong'})
+        self.login({'phone': '+86 139-0000-0300', 'password': 'wrong'})
+        response = self.login({'phone': '0086 13900000300', 'password': 'right-password'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    @override_settings(LOGIN_THROTTLE_RATES={'ip': '2/min'})
+    def test_ip_bucket_on_token_and_wechat_views(self):
+        """测试JWT和微信登录按IP限流"""
+        for _ in range(2):
+            APIClient().post(reverse('token_obtain_pair'), {'username': 'target', 'password': 'wrong'},
+                             format='json', REMOTE_ADDR='10.0.1.1')
+        response = APIClient().post(reverse('token_obtain_pair'), {'username': 'target', 'password': 'wrong'},
+                                    format='json', REMOTE_ADDR='10.0.1.1')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = APIClient().post(reverse('wechat-login'), {'code': 'abc'}, format='json', REMOTE_ADDR='10.0.1.1')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def test_bucket_refills(self):
+        """测试令牌按速率恢复"""
+        buckets = [('users:throttle:test:refill', 1, 1000.0)]
+        self.assertEqual(limiter.consume(buckets), 0)
+        self.assertGreater(limiter.consume(buckets), 0)
+        time.sleep(0.01)
+        self.assertEqual(limiter.consume(buckets), 0)
+    
+    def test_benchmark_command(self):
+        """测试限流基准命令"""
+        out = StringIO()
+        call_command('benchmark_login_throttle', '--requests', '200', '--users', '50', stdout=out)
+        self.assertIn('P99', out.getvalue())
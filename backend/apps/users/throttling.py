@@ -0,0 +1,167 @@
+"""
+登录限流
+
+登录接口允许匿名访问，每次尝试都要做一次PBKDF2校验，撞库时会耗尽CPU。
+这里按IP、用户名、手机号分别维护令牌桶：桶容量为周期内允许的次数，令牌按速率匀速补充，
+允许短时突发的同时限制持续的请求速率。
+
+所有维度在一个Lua脚本中原子地检查和扣减，每次请求只有一次Redis往返（EVALSHA）；
+缓存后端不是Redis时（如测试环境的locmem）回退到基于Django缓存的等价实现。
+Redis不可用时放行请求并记录告警，避免限流组件故障导致无法登录。
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from apps.common.redis_client import get_redis_client
+from .phone import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+# 令牌桶键前缀
+THROTTLE_KEY = 'users:throttle:{}:{}'
+
+# KEYS为各维度的桶，ARGV为 now, cost, 之后每个桶依次为 容量, 每秒补充的令牌数
+# 任一桶令牌不足则整体拒绝且不扣减，返回需要等待的秒数；否则扣减所有桶并返回'0'
+# 返回字符串是因为Lua数字转换为Redis回复时会被截断为整数
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    local state = redis.call('HMGET', key, 't', 'ts')
+    local value = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    value = math.min(capacity, value + math.max(0, now - ts) * rate)
+    tokens[i] = value
+    if value < cost then
+        wait = math.max(wait, (cost - value) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    redis.call('HSET', key, 't', tokens[i] - cost, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+end
+return '0'
+"""
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """解析'次数/周期'格式的速率（与DRF一致，如'5/min'），返回(容量, 每秒补充的令牌数)"""
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class TokenBucketLimiter:
+    """多维度令牌桶，Redis可用时使用Lua脚本，否则使用Django缓存"""
+
+    def __init__(self):
+        self._script = None
+        self._lock = threading.Lock()
+
+    def consume(self, buckets, cost=1):
+        """
+        buckets为[(桶名, 容量, 每秒补充令牌数)]，全部桶都有足够令牌时扣减并返回0，
+        否则不扣减并返回需要等待的秒数
+        """
+        if not buckets:
+            return 0
+        now = time.time()
+        client = get_redis_client()
+        if client is None:
+            return self._consume_local(buckets, cost, now)
+        try:
+            return self._consume_redis(client, buckets, cost, now)
+        except Exception as exc:
+            logger.warning('登录限流Redis调用失败，本次放行: %s', exc)
+            return 0
+
+    def _consume_redis(self, client, buckets, cost, now):
+        if self._script is None:
+            # register_script使用EVALSHA，脚本未加载时自动回退到EVAL
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        args = [now, cost]
+        for _, capacity, rate in buckets:
+            args.extend((capacity, rate))
+        wait = self._script(keys=[key for key, _, _ in buckets], args=args, client=client)
+        return float(wait)
+
+    def _consume_local(self, buckets, cost, now):
+        # 本地实现只保证单进程内的原子性，用于测试和无Redis的开发环境
+        with self._lock:
+            states = cache.get_many([key for key, _, _ in buckets])
+            wait = 0
+            tokens = {}
+            for key, capacity, rate in buckets:
+                value, ts = states.get(key, (capacity, now))
+                value = min(capacity, value + max(0, now - ts) * rate)
+                tokens[key] = value
+                if value < cost:
+                    wait = max(wait, (cost - value) / rate)
+            if wait > 0:
+                return wait
+            for key, capacity, rate in buckets:
+                cache.set(key, (tokens[key] - cost, now), timeout=max(1, int(capacity / rate) + 1))
+            return 0
+
+
+limiter = TokenBucketLimiter()
+
+
+class LoginRateThrottle(BaseThrottle):
+    """
+    登录限流，按key_fields中的维度各维护一个令牌桶，速率取自settings.LOGIN_THROTTLE_RATES
+
+    维度：ip（客户端地址）、username（请求中的用户名）、phone（请求中的手机号，规范化后计数）
+    """
+    key_fields = ('ip', 'username', 'phone')
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_rates(self):
+        rates = getattr(settings, 'LOGIN_THROTTLE_RATES', {})
+        return {field: parse_rate(rates.get(field)) for field in self.key_fields}
+
+    def get_buckets(self, request):
+        data = request.data if hasattr(request.data, 'get') else {}
+        values = {
+            'ip': self.get_ident(request),
+            'username': str(data.get('username') or '').strip(),
+            'phone': normalize_phone(str(data.get('phone') or '')),
+        }
+        buckets = []
+        for field, rate in self.get_rates().items():
+            if rate is None or not values.get(field):
+                continue
+            buckets.append((THROTTLE_KEY.format(field, values[field]),) + rate)
+        return buckets
+
+    def allow_request(self, request, view):
+        self.wait_seconds = limiter.consume(self.get_buckets(request))
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class WeChatLoginRateThrottle(LoginRateThrottle):
+    """微信登录限流，code一次性有效，只按IP限流"""
+    key_fields = ('ip',)
@@ -5,10 +5,12 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import authenticate, login, logout
 from django.db import IntegrityError
-import os
-import requests
-import uuid
-from .models import User, UserRole
+from apps.common.pagination import KeysetPagination
+from apps.common.serializers import ValuesSerializer, get_requested_fields
+from .models import User
+from .cache import get_request_role
+from .throttling import LoginRateThrottle, WeChatLoginRateThrottle
+from .wechat import get_wechat_client, WeChatAPIError, WeChatUnavailable
 from .serializers import (
     UserSerializer, UserRegisterSerializer, UserLoginSerializer,
     CustomTokenObtainPairSerializer, WeChatLoginSerializer
@@ -18,6 +20,7 @@ from .serializers import (
 class CustomTokenObtainPairView(TokenObtainPairView):
     """自定义JWT令牌获取视图"""
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LoginRateThrottle]
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -34,25 +37,52 @@ class UserViewSet(viewsets.ModelViewSet):
             return [permissions.IsAdminUser()]
         return [permissions.IsAuthenticated()]
     
+    @property
+    def paginator(self):
+        """列表接口传入?cursor=或?pagination=cursor时使用键集分页"""
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params if self.request is not None else {}
+            if self.action == 'list' and ('cursor' in params or params.get('pagination') == 'cursor'):
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+    
+    def list(self, request, *args, **kwargs):
+        """用户列表：直接从values()行构造返回数据，支持?fields=稀疏字段"""
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = ValuesSerializer(UserSerializer, get_requested_fields(request))
+        # 键集分页需要created_at和id定位下一页
+        names = list(dict.fromkeys(serializer.value_names + ['created_at', 'id']))
+        rows = queryset.values(*names)
+        
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.many(page))
+        return Response(serializer.many(rows))
+    
     @action(detail=False, methods=['get'], url_path='permissions')
     def get_user_permissions(self, request):
         """获取当前用户的权限信息"""
         user = request.user
-        try:
-            role = UserRole.objects.get(id=user.role_id)
+        role = get_request_role(request)
+        if role is not None:
             return Response({
                 'role_id': user.role_id,
-                'role_name': role.name,
-                'role_type': role.role_type,
-                'permissions': role.permissions
+                'role_name': role['name'],
+                'role_type': role['role_type'],
+                'permissions': role['permissions']
             })
-        except UserRole.DoesNotExist:
-            return Response({
-                'role_id': None,
-                'role_name': None,
-                'role_type': None,
-                'permissions': {}
-            }, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'role_id': None,
+            'role_name': None,
+            'role_type': None,
+            'permissions': {}
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    def perform_destroy(self, instance):
+        """删除用户时只做软删除，由purge_deleted_users定期归档"""
+        instance.soft_delete()
     
     def retrieve(self, request, *args, **kwargs):
         """获取用户详情"""
@@ -95,6 +125,7 @@ class UserRegisterView(APIView):
 class UserLoginView(APIView):
     """用户登录视图"""
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginRateThrottle]
     
     def post(self, request):
         serializer = UserLoginSerializer(data=request.data)
@@ -103,16 +134,11 @@ class UserLoginView(APIView):
             phone = serializer.validated_data.get('phone')
             password = serializer.validated_data.get('password')
             
-            # 尝试使用用户名或手机号登录
-            user = None
+            # 尝试使用用户名或手机号登录（认证后端一次查询完成匹配）
             if username:
-                user = authenticate(username=username, password=password)
-            elif phone:
-                try:
-                    user_obj = User.objects.get(phone=phone)
-                    user = authenticate(username=user_obj.username, password=password)
-                except User.DoesNotExist:
-                    pass
+                user = authenticate(request, username=username, password=password)
+            else:
+                user = authenticate(request, phone=phone, password=password)
             
             if user is not None:
                 login(request, user)
@@ -129,6 +155,7 @@ class UserLoginView(APIView):
 class WeChatLoginView(APIView):
     """微信登录视图"""
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [WeChatLoginRateThrottle]
     
     def post(self, request):
         serializer = WeChatLoginSerializer(data=request.data)
@@ -137,14 +164,16 @@ class WeChatLoginView(APIView):
             avatar_url = serializer.validated_data.get('avatar_url', '')
             nickname = serializer.validated_data.get('nickname', '')
             
-            # 微信小程序AppID和AppSecret，实际应该从环境变量获取
-            app_id = os.getenv('WECHAT_APPID', 'your_wechat_appid')
-            app_secret = os.getenv('WECHAT_APPSECRET', 'your_wechat_appsecret')
-            
             # 调用微信API获取openid和session_key
-            url = f"https://api.weixin.qq.com/sns/jscode2session?appid={app_id}&secret={app_secret}&js_code={code}&grant_type=authorization_code"
-            response = requests.get(url)
-            result = response.json()
+            try:
+                result = get_wechat_client().code2session(code)
+            except WeChatAPIError as exc:
+                return Response({
+                    'detail': '微信登录失败',
+                    'error': exc.errmsg
+                }, status=status.HTTP_400_BAD_REQUEST)
+            except WeChatUnavailable:
+                return Response({'detail': '微信服务暂不可用，请稍后重试'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
             # 检查是否获取成功
             if 'openid' not in result:
@@ -155,40 +184,17 @@ class WeChatLoginView(APIView):
             
             openid = result.get('openid')
             
-            # 查找是否已有该openid的用户
+            # 按openid获取或创建用户，新用户默认设置为居民角色（如果存在）
             try:
-                user = User.objects.get(openid=openid)
-            except User.DoesNotExist:
-                # 创建新用户
-                try:
-                    # 生成唯一用户名
-                    username = f"wx_{openid[:10]}_{str(uuid.uuid4())[:8]}"
-                    user = User.objects.create_user(
-                        username=username,
-                        phone='',
-                        password=None,  # 微信登录用户不需要密码
-                        openid=openid,
-                        avatar_url=avatar_url,
-                        is_active=True
-                    )
-                    # 默认设置为居民角色（如果存在）
-                    try:
-                        resident_role = UserRole.objects.get(role_type='resident')
-                        user.role_id = resident_role.id
-                        user.save()
-                    except UserRole.DoesNotExist:
-                        pass
-                except IntegrityError:
-                    return Response({'detail': '创建用户失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                user, _ = User.objects.upsert_wechat_user(openid, avatar_url=avatar_url)
+            except IntegrityError:
+                return Response({'detail': '创建用户失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            # 更新用户信息
-            if avatar_url and not user.avatar_url:
-                user.avatar_url = avatar_url
-                user.save()
+            if user.is_deleted:
+                return Response({'detail': '账号已注销'}, status=status.HTTP_403_FORBIDDEN)
             
-            # 生成JWT令牌
-            from rest_framework_simplejwt.tokens import RefreshToken
-            refresh = RefreshToken.for_user(user)
+            # 生成JWT令牌（与账号密码登录携带相同的自定义声明）
+            refresh = CustomTokenObtainPairSerializer.get_token(user)
             
             return Response({
                 'refresh': str(refresh),
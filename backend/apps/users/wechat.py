@@ -0,0 +1,334 @@
+"""
+微信小程序服务端API客户端
+
+登录时需要调用jscode2session换取openid，这里统一封装：
+- 复用keep-alive连接池，避免每次登录重新建立TCP/TLS连接
+- 严格的连接/读取超时
+- 按请求量比例发放的重试额度，避免上游故障时重试放大流量
+- 熔断器，上游持续故障时快速失败，不占用worker
+- asyncio版本，供config.asgi下的异步代码使用
+- 本地模拟服务器，测试时通过WECHAT_API_BASE注入
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 微信返回“系统繁忙”，可以重试
+ERRCODE_BUSY = -1
+
+
+class WeChatError(Exception):
+    """微信接口调用异常基类"""
+
+
+class WeChatAPIError(WeChatError):
+    """微信接口返回业务错误（如code无效）"""
+
+    def __init__(self, errcode, errmsg):
+        super().__init__(f'{errcode}: {errmsg}')
+        self.errcode = errcode
+        self.errmsg = errmsg
+
+
+class WeChatUnavailable(WeChatError):
+    """微信接口暂不可用（超时、网络错误或熔断中）"""
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后进入打开状态，在reset_timeout内直接拒绝请求；
+    超时后放行一个试探请求（半开），成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # 半开状态，只放行一个试探请求
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """
+    重试额度
+
+    每个请求存入ratio个额度，每次重试消耗1个额度，保证重试流量不超过正常流量的一定比例。
+    """
+
+    def __init__(self, ratio=0.1, min_tokens=3, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(min_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class WeChatClient:
+    """微信服务端API同步客户端，线程安全，进程内复用"""
+
+    def __init__(self, app_id, app_secret, base_url='https://api.weixin.qq.com',
+                 timeout=(2, 3), max_retries=1, pool_size=20,
+                 breaker=None, retry_budget=None):
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_budget = retry_budget or RetryBudget()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def code2session(self, code):
+        """用小程序登录code换取openid和session_key"""
+        return self._get('/sns/jscode2session', {
+            'appid': self.app_id,
+            'secret': self.app_secret,
+            'js_code': code,
+            'grant_type': 'authorization_code',
+        })
+
+    def _get(self, path, params):
+        if not self.breaker.allow_request():
+            raise WeChatUnavailable('微信接口熔断中')
+        self.retry_budget.deposit()
+
+        attempt = 0
+        while True:
+            try:
+                result = self._request(path, params)
+            except WeChatUnavailable:
+                if attempt < self.max_retries and self.retry_budget.withdraw():
+                    attempt += 1
+                    continue
+                self.breaker.record_failure()
+                raise
+            except WeChatAPIError:
+                # 业务错误说明上游可用，不计入熔断
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def _request(self, path, params):
+        try:
+            response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        except requests.RequestException as exc:
+            logger.warning('调用微信接口失败: %s', exc)
+            raise WeChatUnavailable(str(exc)) from exc
+
+        if response.status_code >= 500:
+            raise WeChatUnavailable(f'HTTP {response.status_code}')
+        try:
+            result = response.json()
+        except ValueError as exc:
+            raise WeChatUnavailable('微信接口返回内容无法解析') from exc
+
+        errcode = result.get('errcode', 0)
+        if errcode == ERRCODE_BUSY:
+            raise WeChatUnavailable(result.get('errmsg', 'system busy'))
+        if errcode:
+            raise WeChatAPIError(errcode, result.get('errmsg', '未知错误'))
+        return result
+
+
+class AsyncWeChatClient:
+    """
+    微信服务端API的asyncio客户端
+
+    在独立的有界线程池中执行同步客户端的请求，共享其连接池、熔断器和重试额度，
+    在ASGI事件循环中调用不会阻塞其他协程。
+    """
+
+    def __init__(self, client, max_workers=20):
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wechat')
+
+    async def code2session(self, code):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.client.code2session, code)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_wechat_client():
+    """获取进程内共享的微信客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WeChatClient(
+                    app_id=settings.WECHAT_APPID,
+                    app_secret=settings.WECHAT_APPSECRET,
+                    base_url=settings.WECHAT_API_BASE,
+                    timeout=settings.WECHAT_TIMEOUT,
+                    max_retries=settings.WECHAT_MAX_RETRIES,
+                    pool_size=settings.WECHAT_POOL_SIZE,
+                )
+    return _client
+
+
+def get_async_wechat_client():
+    """获取进程内共享的asyncio微信客户端"""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncWeChatClient(get_wechat_client(), settings.WECHAT_POOL_SIZE)
+    return _async_client
+
+
+def reset_wechat_client():
+    """丢弃共享客户端，下次获取时按当前配置重新创建"""
+    global _client, _async_client
+    with _client_lock:
+        if _async_client is not None:
+            _async_client.close()
+        if _client is not None:
+            _client.close()
+        _client = None
+        _async_client = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    # 测试中override_settings修改微信配置时重建客户端
+    if setting.startswith('WECHAT_'):
+        reset_wechat_client()
+
+
+class FakeWeChatServer:
+    """
+    本地模拟的微信接口服务器，供测试注入使用
+
+    用法：
+        with FakeWeChatServer() as server:
+            with override_settings(WECHAT_API_BASE=server.url):
+                ...
+
+    默认为任意code返回openid=f'openid_{code}'；responses可为指定code预设返回内容，
+    fail_status不为None时所有请求返回该HTTP状态码。
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.fail_status = None
+        self.request_count = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                fake.request_count += 1
+                query = parse_qs(urlparse(self.path).query)
+                code = query.get('js_code', [''])[0]
+                if fake.fail_status is not None:
+                    status, payload = fake.fail_status, {}
+                else:
+                    status = 200
+                    payload = fake.responses.get(code) or {
+                        'openid': f'openid_{code}',
+                        'session_key': f'session_{code}',
+                    }
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -44,6 +44,19 @@ ALLOWED_HOSTS = ['*']  # Docker环境中允许所有主机访问
 # 自定义用户模型配置
 AUTH_USER_MODEL = 'users.User'
 
+# 认证后端：一次查询支持用户名或手机号登录
+AUTHENTICATION_BACKENDS = [
+    'apps.users.backends.UsernameOrPhoneBackend',
+]
+
+# 手机号查询键的HMAC密钥，必须单独配置，不能复用SECRET_KEY；轮换后需执行 manage.py backfill_phone_hash --all
+PHONE_HASH_KEY = os.getenv('PHONE_HASH_KEY')
+
+# 访客通行证离线签名密钥 {密钥编号: 密钥}，门禁设备需同步相同的密钥，因此必须是独立的密钥，不能复用SECRET_KEY；
+# 未配置时不签发离线令牌。轮换时新增编号并切换VISITOR_PASS_KEY_ID，旧密钥保留到已签发的通行证全部过期
+VISITOR_PASS_KEYS = {1: os.getenv('VISITOR_PASS_KEY')} if os.getenv('VISITOR_PASS_KEY') else {}
+VISITOR_PASS_KEY_ID = 1
+
 
 # Application definition
 
@@ -131,7 +144,8 @@ CACHES = {
 # REST Framework 配置
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # 基于令牌声明的无状态JWT认证，不在每个请求上查询用户表
+        'apps.users.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',  # 保留session认证用于开发调试
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -141,6 +155,17 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# 批量通知在事务提交后由后台线程写入，设为False时同步写入
+NOTIFICATIONS_ASYNC = True
+NOTIFICATIONS_WORKERS = 2
+
+# 登录限流（令牌桶）：每个维度在周期内允许的次数，超出后按速率恢复
+LOGIN_THROTTLE_RATES = {
+    'ip': '30/min',
+    'username': '5/min',
+    'phone': '5/min',
+}
+
 # JWT配置
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -165,6 +190,14 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# 微信小程序配置
+WECHAT_APPID = os.getenv('WECHAT_APPID', 'your_wechat_appid')
+WECHAT_APPSECRET = os.getenv('WECHAT_APPSECRET', 'your_wechat_appsecret')
+WECHAT_API_BASE = os.getenv('WECHAT_API_BASE', 'https://api.weixin.qq.com')
+WECHAT_TIMEOUT = (2, 3)  # (连接超时, 读取超时)，单位秒
+WECHAT_MAX_RETRIES = 1  # 网络错误/微信系统繁忙时的最大重试次数
+WECHAT_POOL_SIZE = 20  # 与微信接口保持的keep-alive连接数
+
 
 
 # Password validation
@@ -185,6 +218,16 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# 密码哈希强度配置（PBKDF2迭代次数），员工/管理员始终使用strong
+PASSWORD_HASH_PROFILES = {
+    'strong': {'iterations': 600000},
+    'tuned': {'iterations': 150000},  # 高频登录的商户账号
+}
+# 角色类型 -> 哈希配置，未列出的角色类型使用strong
+PASSWORD_HASH_ROLE_PROFILES = {
+    'merchant': 'tuned',
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/